@@ -23,6 +23,7 @@ from .commands import (
     query_role_list,
     statistics_rank,
     statistics_summary,
+    group_rank,
 )
 
 # 导入API模型（便于外部使用）
@@ -110,6 +111,13 @@ __plugin_meta__ = PluginMetadata(
                 'trigger_condition': ' ',
                 'brief_des': '查看角色练度汇总信息',
                 'detail_des': '显示整体练度情况和统计'
+            },
+            {
+                'func': '群排行',
+                'trigger_method': '群排行 <角色名>',
+                'trigger_condition': '群聊',
+                'brief_des': '查看本群指定角色的练度排行',
+                'detail_des': '示例: /群排行 忌炎'
             }
         ],
     },
@@ -5,7 +5,7 @@
 """
 from .refresh_cmd import refresh_all, refresh_single
 from .role_cmd import query_role, query_role_list
-from .stats_cmd import statistics_rank, statistics_summary
+from .stats_cmd import statistics_rank, statistics_summary, group_rank, runtime_status
 
 __all__ = [
     # 刷新命令
@@ -17,4 +17,6 @@ __all__ = [
     # 统计命令
     "statistics_rank",
     "statistics_summary",
+    "group_rank",
+    "runtime_status",
 ]
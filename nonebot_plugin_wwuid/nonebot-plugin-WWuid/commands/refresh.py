@@ -6,25 +6,47 @@ from nonebot import on_command
 from nonebot.adapters import Message, Event
 from nonebot.params import CommandArg
 
-from ..core import get_refresh_manager
+from ..core import get_refresh_manager, get_refresh_scheduler
+from ..core.scheduler import PRIORITY_COMMAND
+from ..plugin_core.config import get_config
 
 
 refresh_all = on_command('刷新面板', aliases={'刷新全部', 'refreshall'}, priority=5, block=True)
 
 
 @refresh_all.handle()
-async def handle_refresh_all(event: Event):
+async def handle_refresh_all(event: Event, args: Message = CommandArg()):
     """
     刷新所有角色数据
-    命令格式: /刷新面板
+    命令格式: /刷新面板 [强制]
+    默认只重新获取练度有变化的角色，加上"强制"则重新获取全部角色
+    刷新任务以最高优先级加入刷新队列，超过等待时间后在后台继续
     """
     user_id = event.get_user_id()
+    force = args.extract_plain_text().strip() in ("强制", "force")
     
     refresh_manager = get_refresh_manager()
+    scheduler = get_refresh_scheduler()
     
-    await refresh_all.send("⏳ 正在刷新角色数据，请稍候...")
+    if scheduler.get_job(user_id) is None:
+        cooldown = refresh_manager.get_refresh_cooldown(user_id)
+        if cooldown > 0:
+            await refresh_all.finish(f"⏳ 刷新过于频繁，请 {cooldown} 秒后再试")
     
-    success, message = await refresh_manager.refresh_all(user_id)
+    job = scheduler.submit(user_id, PRIORITY_COMMAND, force=force)
+    position = scheduler.position(job)
+    if force and not job.force:
+        await refresh_all.send("⏳ 已有一次普通刷新正在进行，本次将等待其结果；如需强制刷新请在完成后再试")
+    elif position > 1:
+        await refresh_all.send(f"⏳ 已加入刷新队列，前面还有 {position - 1} 个任务，请稍候...")
+    else:
+        await refresh_all.send("⏳ 正在刷新角色数据，请稍候...")
+    
+    result = await scheduler.wait(job, get_config().REFRESH_WAIT_TIMEOUT)
+    if result is None:
+        await refresh_all.finish("⏳ 刷新仍在进行中，完成后即可直接查询面板")
+    
+    success, message = result
     
     await refresh_all.finish(message)
 
@@ -5,9 +5,13 @@
 from nonebot import on_command
 from nonebot.adapters import Message, Event
 from nonebot.params import CommandArg
+from nonebot.permission import SUPERUSER
 
 from ..core import get_statistics_manager
 from ..plugin_core.config import get_config
+from ..utils.model_cache import get_role_detail_lru
+from ..wwuid_api import get_waves_api
+from ..wwuid_renderer.executor import get_render_executor
 
 
 statistics_rank = on_command('练度统计', aliases={'练度排行', 'rank'}, priority=5, block=True)
@@ -52,3 +56,64 @@ async def handle_statistics_summary(event: Event):
     success, message = await statistics_manager.get_role_summary_text(user_id)
     
     await statistics_summary.finish(message)
+
+
+group_rank = on_command('群排行', aliases={'群练度排行'}, priority=5, block=True)
+
+
+@group_rank.handle()
+async def handle_group_rank(event: Event, args: Message = CommandArg()):
+    """
+    查看本群指定角色的练度排行
+    命令格式: /群排行 <角色名>
+    例如: /群排行 忌炎
+    """
+    group_id = getattr(event, 'group_id', None)
+    if not group_id:
+        await group_rank.finish("❌ 群排行只能在群聊中使用")
+    
+    role_name = args.extract_plain_text().strip()
+    if not role_name:
+        await group_rank.finish("❌ 请输入角色名，例如: /群排行 忌炎")
+    
+    statistics_manager = get_statistics_manager()
+    success, message = await statistics_manager.get_group_rank_text(
+        str(group_id), event.get_user_id(), role_name, get_config().GROUP_RANK_TOP_N
+    )
+    
+    await group_rank.finish(message)
+
+
+runtime_status = on_command('鸣潮状态', aliases={'wwstatus'}, permission=SUPERUSER, priority=5, block=True)
+
+
+@runtime_status.handle()
+async def handle_runtime_status():
+    """
+    查看缓存命中、渲染耗时与接口熔断状态（超级用户）
+    命令格式: /鸣潮状态
+    """
+    lru = get_role_detail_lru().stats()
+    lines = [
+        "📊 角色详情缓存",
+        f"  条目: {lru['size']}/{lru['max_size']}  淘汰: {lru['evictions']}",
+        f"  命中: {lru['hits']}  未命中: {lru['misses']}  命中率: {lru['hit_rate'] * 100:.1f}%",
+    ]
+    
+    render = get_render_executor().stats.summary()
+    lines.append("🖼️ 卡片渲染")
+    lines.append(f"  完成: {render['count']}  拒绝: {render['rejected']}  失败: {render['failed']}")
+    total = render["stages"].get("total")
+    if total:
+        lines.append(f"  平均耗时: {total['avg_ms']}ms  最大耗时: {total['max_ms']}ms")
+    
+    metrics = get_waves_api().get_metrics()
+    if metrics:
+        lines.append("🌐 接口")
+        for endpoint, item in metrics.items():
+            lines.append(
+                f"  {endpoint}: {item['state']} 请求{item['requests']} 失败{item['failures']} "
+                f"重试{item['retries']} 拒绝{item['rejected']}"
+            )
+    
+    await runtime_status.finish("\n".join(lines))
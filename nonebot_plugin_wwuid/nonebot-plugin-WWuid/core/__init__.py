@@ -6,6 +6,7 @@
 from .bind import bind_ck, query_bind_cmd, delete_ck_cmd, delete_invalid_ck_cmd
 from .query import QueryManager, get_query_manager
 from .refresh import RefreshManager, get_refresh_manager
+from .scheduler import RefreshScheduler, get_refresh_scheduler
 from .statistics import StatisticsManager, get_statistics_manager
 from .auto_delete import auto_delete_all_invalid_cookie
 
@@ -21,6 +22,8 @@ __all__ = [
     # 刷新管理
     "RefreshManager",
     "get_refresh_manager",
+    "RefreshScheduler",
+    "get_refresh_scheduler",
     # 统计管理
     "StatisticsManager",
     "get_statistics_manager",
@@ -2,6 +2,7 @@
 """
 鸣潮CK绑定功能
 """
+import asyncio
 from typing import Optional
 from nonebot import on_command, get_bot
 from nonebot.adapters import Event
@@ -9,10 +10,12 @@ from nonebot.params import CommandArg
 from nonebot_plugin_orm import get_session
 from sqlalchemy import select, delete
 from .wwuid_api.models import WutheringWavesBind
-from .wwuid_api.client import WavesApi
+from .wwuid_api.client import get_waves_api
+from .wwuid_api.token_manager import get_token_manager
+from .wwuid_api.bind_cache import get_bind_cache
 from ..constants import WAVES_GAME_ID
 
-waves_api = WavesApi()
+waves_api = get_waves_api()
 
 
 def get_ck_and_devcode(text: str, split_str: str = ",") -> tuple[str, str]:
@@ -44,23 +47,31 @@ async def add_cookie(event: Event, ck: str, did: str = "", is_login: bool = Fals
     if not waves_roles:
         return "登录失败\n未找到可用角色"
     
+    waves_roles = [
+        role_data for role_data in waves_roles
+        if role_data.get("gameId") == WAVES_GAME_ID and role_data.get("roleId", "")
+    ]
+    
+    # 新的CK对应新的令牌，所有角色的令牌并发获取，写库时随绑定记录一起保存
+    token_manager = get_token_manager()
+    for role_data in waves_roles:
+        token_manager.invalidate(role_data["roleId"], did)
+    token_results = await asyncio.gather(*(
+        token_manager.get_token(
+            role_data["roleId"], ck, did, server_id=role_data.get("serverId", ""), persist=False
+        )
+        for role_data in waves_roles
+    ))
+    for success, bat in token_results:
+        if not success:
+            return f"获取令牌失败: {bat}"
+    
     role_list = []
     
     async with get_session() as session:
-        for role_data in waves_roles:
-            if role_data.get("gameId") != WAVES_GAME_ID:
-                continue
-            
-            role_id = role_data.get("roleId", "")
+        for role_data, (_, bat) in zip(waves_roles, token_results):
+            role_id = role_data["roleId"]
             role_name = role_data.get("roleName", "未知角色")
-            server_id = role_data.get("serverId", "")
-            
-            if not role_id:
-                continue
-            
-            success, bat = await waves_api.get_request_token(role_id, ck, did, server_id)
-            if not success:
-                return f"获取令牌失败: {bat}"
             
             existing_bind = await session.execute(
                 select(WutheringWavesBind).where(
@@ -112,6 +123,9 @@ async def add_cookie(event: Event, ck: str, did: str = "", is_login: bool = Fals
         
         await session.commit()
     
+    # update_token_by_login 可能改动了其他用户的同一特征码记录，整体失效
+    get_bind_cache().invalidate()
+    
     if not role_list:
         return "登录失败\n"
     
@@ -133,6 +147,7 @@ async def delete_cookie(user_id: str, uid: str, bot_id: str = "") -> str:
         
         result = await session.execute(stmt)
         await session.commit()
+        get_bind_cache().invalidate(user_id)
         
         if result.rowcount == 0:
             return f"[鸣潮] 特征码[{uid}]的token删除失败!\n❌不存在该特征码的token!\n"
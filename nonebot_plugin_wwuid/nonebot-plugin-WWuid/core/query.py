@@ -13,8 +13,10 @@ from ..utils import (
     format_role_detail,
 )
 from .refresh import get_refresh_manager
-from ..errors import error_reply, WAVES_CODE_103
-from .wwuid_renderer.card_drawer import render_role_card
+from ..errors import error_reply, WAVES_CODE_103, WAVES_CODE_104
+from .wwuid_renderer.executor import RenderBusyError, get_render_executor
+from .wwuid_renderer.output_cache import card_cache_key, get_card_cache
+from .wwuid_renderer.prefetch import prefetch_role_icons
 
 
 class QueryManager:
@@ -99,9 +101,21 @@ class QueryManager:
         if not role_detail:
             return False, "❌ 角色数据为空"
         
+        card_cache = get_card_cache()
+        role_id = str(role_detail.role.roleId)
+        cache_key = card_cache_key(role_detail)
+        image_bytes = await card_cache.get(user_id, role_id, cache_key)
+        if image_bytes is not None:
+            return True, image_bytes
+        
         try:
-            image_bytes = render_role_card(role_detail)
+            icons = await prefetch_role_icons(role_detail)
+            image_bytes = await get_render_executor().render(role_detail, icons=icons)
+            await card_cache.put(user_id, role_id, cache_key, image_bytes)
             return True, image_bytes
+        except RenderBusyError as e:
+            logger.warning(f"渲染队列已满，拒绝用户 {user_id} 的请求: {e}")
+            return False, error_reply(WAVES_CODE_104)
         except Exception as e:
             logger.error(f"生成角色图片失败: {e}")
             return False, f"❌ 生成图片失败: {str(e)}"
@@ -3,16 +3,17 @@
 鸣潮角色数据刷新模块
 """
 import asyncio
+import time
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 
 from nonebot import logger
-from nonebot_plugin_orm import get_session
 
-from sqlalchemy import select
-
-from .wwuid_api.client import WavesApi, WavesApiResponse
-from .wwuid_api.models import WutheringWavesBind, RoleList, RoleDetailData, Role
+from .wwuid_api.client import WavesApiResponse, get_waves_api
+from .wwuid_api.token_manager import get_token_manager
+from .wwuid_api.bind_cache import UserBind, get_bind_cache
+from .wwuid_api.models import RoleList, RoleDetailData, Role
+from .wwuid_api.fast_models import FAST_MODELS_AVAILABLE, decode_role_record
 from ..utils import (
     save_user_cache,
     save_role_cache,
@@ -22,47 +23,140 @@ from ..utils import (
     get_role_name_by_id,
     safe_int,
 )
+from ..utils.rate_limit import TokenBucket
+from ..utils.singleflight import SingleFlight
+from ..utils.cache_store import get_cache_store
+from ..utils.model_cache import get_role_detail_lru
 from ..errors import error_reply, WAVES_CODE_102
+from ..plugin_core.config import get_config
+
+
+def role_fingerprint(role_info: Dict[str, Any]) -> Tuple[Any, ...]:
+    """角色列表摘要中能反映练度变化的字段"""
+    return (
+        role_info.get("level"),
+        role_info.get("breach"),
+        role_info.get("chainUnlockNum"),
+        role_info.get("totalSkillLevel"),
+    )
 
 
 class RefreshManager:
     """刷新管理器"""
     
     def __init__(self):
-        self.api = WavesApi()
+        config = get_config()
+        self.api = get_waves_api()
+        self.tokens = get_token_manager()
+        # 所有用户共享的角色详情请求节流器
+        self.pacer = TokenBucket(config.REFRESH_RATE_LIMIT, config.REFRESH_BURST)
+        # 所有账号共享的每分钟上游请求预算，平滑命令与后台刷新叠加时的突发流量
+        budget = config.REFRESH_BUDGET_PER_MINUTE
+        self.budget = TokenBucket(budget / 60, budget)
+        # 同一用户同时只进行一次刷新，重复的请求等待同一个结果
+        self.flights = SingleFlight()
+        # 用户上次成功刷新全部角色的时间（time.monotonic）
+        self._last_refresh: Dict[str, float] = {}
     
-    async def refresh_all(self, user_id: str) -> Tuple[bool, str]:
+    def get_refresh_cooldown(self, user_id: str) -> int:
+        """距离下次可以刷新全部角色还需等待的秒数，0为可以刷新"""
+        interval = get_config().MAX_REFRESH_INTERVAL
+        last = self._last_refresh.get(user_id)
+        if interval <= 0 or last is None:
+            return 0
+        remaining = interval - (time.monotonic() - last)
+        return max(0, int(remaining + 0.999))
+    
+    async def refresh_all(self, user_id: str, force: bool = False) -> Tuple[bool, str]:
         """刷新所有角色数据
         
+        正在刷新时重复请求会等待同一次刷新的结果；
+        两次成功刷新之间至少间隔 MAX_REFRESH_INTERVAL 秒。
+        
+        Args:
+            user_id: 用户ID
+            force: 为True时忽略增量刷新，重新获取全部角色详情
+        
         Returns:
             Tuple[bool, str]: (是否成功, 返回消息)
         """
         logger.info(f"用户 {user_id} 请求刷新所有角色数据")
         
-        ck_result = await self._get_user_ck(user_id)
-        if not ck_result:
-            return False, error_reply(WAVES_CODE_102)
+        key = ("all", user_id)
+        if not self.flights.in_flight(key):
+            cooldown = self.get_refresh_cooldown(user_id)
+            if cooldown > 0:
+                return False, f"⏳ 刷新过于频繁，请 {cooldown} 秒后再试"
         
-        ck, did, bat = ck_result
+        return await self.flights.do(key, self._refresh_all, user_id, force)
+    
+    def _select_changed_roles(
+        self,
+        role_list: List[Dict[str, Any]],
+        previous: Optional[Dict[str, Any]],
+        force: bool,
+    ) -> List[Dict[str, Any]]:
+        """挑出需要重新获取详情的角色
+        
+        摘要（等级、突破、共鸣链、技能总等级）与上次一致、上次详情获取成功、
+        且详情获取时间未超过 REFRESH_FULL_INTERVAL_HOURS 的角色会被跳过。
+        武器与声骸的变化不体现在摘要中，需要时可使用强制刷新。
+        """
+        config = get_config()
+        if force or not config.REFRESH_INCREMENTAL or not previous:
+            return list(role_list)
         
-        user_binds = await self._get_user_binds(user_id)
-        if not user_binds:
+        previous_prints = {
+            str(role_info.get("roleId")): role_fingerprint(role_info)
+            for role_info in previous.get("role_list") or []
+        }
+        detail_times = previous.get("detail_times") or {}
+        max_age = config.REFRESH_FULL_INTERVAL_HOURS * 3600
+        now = datetime.now()
+        
+        changed = []
+        for role_info in role_list:
+            char_id = str(role_info["roleId"])
+            fetched_at = detail_times.get(char_id)
+            if fetched_at is None or previous_prints.get(char_id) != role_fingerprint(role_info):
+                changed.append(role_info)
+                continue
+            try:
+                age = (now - datetime.fromisoformat(fetched_at)).total_seconds()
+            except (TypeError, ValueError):
+                changed.append(role_info)
+                continue
+            if max_age > 0 and age > max_age:
+                changed.append(role_info)
+        return changed
+    
+    async def _refresh_all(self, user_id: str, force: bool = False) -> Tuple[bool, str]:
+        """刷新所有角色数据（实际执行）"""
+        user_bind = await self._get_user_bind(user_id)
+        if not user_bind:
             return False, error_reply(WAVES_CODE_102)
         
-        role_id = user_binds[0].game_uid
+        role_id, ck, did = user_bind.game_uid, user_bind.cookie, user_bind.did
         
-        # 如果数据库中没有bat，尝试获取
-        if not bat:
-            success, bat = await self.api.get_request_token(role_id, ck, did)
-            if not success:
-                logger.warning("获取request_token失败，尝试继续刷新...")
-                bat = ""
+        # 优先使用缓存的令牌，临近过期时提前重新获取
+        success, bat = await self.tokens.get_token(
+            role_id, ck, did, stored_bat=user_bind.bat, stored_at=user_bind.update_time
+        )
+        if not success:
+            logger.warning("获取request_token失败，尝试继续刷新...")
+            bat = ""
         
+        # 登录校验、同步数据、获取列表/详情共三次请求
+        await self.budget.acquire(3)
         try:
             await self.api.login_log(role_id, ck)
         except Exception as e:
             logger.warning(f"登录校验失败: {e}")
         
+        # 先让服务端同步游戏数据，再取角色列表，摘要才能反映最新练度
+        await self.api.refresh_data(role_id, ck)
+        await asyncio.sleep(1)
+        
         role_list_response = await self.api.get_role_info(role_id, ck)
         if not role_list_response.success:
             return False, error_reply(role_list_response.code, role_list_response.message)
@@ -75,62 +169,106 @@ class RefreshManager:
         if not role_list:
             return False, error_reply(101, "角色列表为空")
         
-        role_ids = [role["roleId"] for role in role_list]
+        previous = await load_user_cache(user_id)
+        to_fetch = self._select_changed_roles(role_list, previous, force)
+        skipped_count = len(role_list) - len(to_fetch)
+        if skipped_count:
+            logger.info(f"用户 {user_id} 有 {skipped_count} 个角色无变化，跳过获取详情")
+        
+        config = get_config()
+        semaphore = asyncio.Semaphore(max(1, config.REFRESH_CONCURRENCY))
+        results = await asyncio.gather(*(
+            self._fetch_role_detail(user_id, role_info["roleId"], role_id, ck, did, bat, semaphore)
+            for role_info in to_fetch
+        ))
+        
+        # 上次成功获取详情的时间，跳过的角色沿用原值
+        previous_times = (previous or {}).get("detail_times") or {}
+        current_ids = {str(role_info["roleId"]) for role_info in role_list}
+        detail_times = {k: v for k, v in previous_times.items() if k in current_ids}
+        fetched_at = datetime.now().isoformat()
         
         success_count = 0
         failed_count = 0
         failed_roles = []
-        
-        await self.api.refresh_data(role_id, ck)
-        await asyncio.sleep(1)
-        
-        for role_info in role_list:
+        for role_info, ok in zip(to_fetch, results):
             char_id = role_info["roleId"]
-            try:
-                role_detail_response = await self.api.get_role_detail_info(
-                    str(char_id), role_id, ck, did, bat
-                )
-                
-                if role_detail_response.success:
-                    role_detail_data = role_detail_response.data
-                    if role_detail_data:
-                        save_role_cache(user_id, str(char_id), role_detail_data)
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                        failed_roles.append(get_role_name_by_id(char_id) or f"ID:{char_id}")
-                else:
-                    failed_count += 1
-                    failed_roles.append(get_role_name_by_id(char_id) or f"ID:{char_id}")
-                    logger.warning(f"获取角色 {char_id} 详情失败: {role_detail_response.message}")
-                
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
+            if ok:
+                success_count += 1
+                detail_times[str(char_id)] = fetched_at
+            else:
                 failed_count += 1
+                detail_times.pop(str(char_id), None)
                 failed_roles.append(get_role_name_by_id(char_id) or f"ID:{char_id}")
-                logger.error(f"刷新角色 {char_id} 时发生错误: {e}")
         
         cache_data = {
             "role_list": role_list,
             "refresh_time": datetime.now().isoformat(),
             "success_count": success_count,
             "failed_count": failed_count,
+            "skipped_count": skipped_count,
+            "detail_times": detail_times,
         }
-        save_user_cache(user_id, cache_data)
+        await save_user_cache(user_id, cache_data)
         
-        if failed_count == 0:
+        if failed_count == 0 and skipped_count:
+            message = f"✅ 刷新完成！更新 {success_count} 个角色数据，{skipped_count} 个角色无变化已跳过"
+        elif failed_count == 0:
             message = f"✅ 刷新完成！成功获取 {success_count} 个角色数据"
-        elif success_count == 0:
+        elif success_count == 0 and skipped_count == 0:
             message = f"❌ 刷新失败！所有角色数据获取失败"
         else:
             failed_text = ", ".join(failed_roles[:3])
             if failed_count > 3:
                 failed_text += f" 等 {failed_count} 个角色"
-            message = f"⚠️ 刷新完成！成功 {success_count} 个，失败 {failed_count} 个\n失败角色: {failed_text}"
+            skipped_text = f"，无变化 {skipped_count} 个" if skipped_count else ""
+            message = f"⚠️ 刷新完成！成功 {success_count} 个，失败 {failed_count} 个{skipped_text}\n失败角色: {failed_text}"
+        
+        if success_count > 0 or skipped_count > 0:
+            self._last_refresh[user_id] = time.monotonic()
         
         return True, message
     
+    async def _fetch_role_detail(
+        self,
+        user_id: str,
+        char_id: int,
+        role_id: str,
+        ck: str,
+        did: str,
+        bat: str,
+        semaphore: asyncio.Semaphore,
+    ) -> bool:
+        """获取并缓存单个角色详情（受并发数与请求速率限制）
+        
+        Returns:
+            bool: 是否成功
+        """
+        async with semaphore:
+            await self.budget.acquire()
+            await self.pacer.acquire()
+            try:
+                role_detail_response = await self.tokens.call_with_token(
+                    role_id, ck, did, bat,
+                    lambda token: self.api.get_role_detail_info(str(char_id), role_id, ck, did, token),
+                )
+            except Exception as e:
+                logger.error(f"刷新角色 {char_id} 时发生错误: {e}")
+                return False
+        
+        if not role_detail_response.success:
+            logger.warning(f"获取角色 {char_id} 详情失败: {role_detail_response.message}")
+            return False
+        
+        role_detail_data = role_detail_response.data
+        if not role_detail_data:
+            return False
+        
+        if not await save_role_cache(user_id, str(char_id), role_detail_data):
+            # 写入失败按获取失败处理，下次增量刷新会重新获取
+            return False
+        return True
+    
     async def refresh_single(self, user_id: str, role_name: str) -> Tuple[bool, str]:
         """刷新单个角色数据
         
@@ -149,25 +287,29 @@ class RefreshManager:
         if not role_id_by_name:
             return False, f"❌ 未找到角色: {role_name}"
         
-        ck_result = await self._get_user_ck(user_id)
-        if not ck_result:
-            return False, error_reply(WAVES_CODE_102)
-        
-        ck, did, bat = ck_result
-        
-        user_binds = await self._get_user_binds(user_id)
-        if not user_binds:
+        return await self.flights.do(
+            ("role", user_id, role_id_by_name),
+            self._refresh_single, user_id, role_id_by_name, role_name
+        )
+    
+    async def _refresh_single(self, user_id: str, role_id_by_name: int, role_name: str) -> Tuple[bool, str]:
+        """刷新单个角色数据（实际执行）"""
+        user_bind = await self._get_user_bind(user_id)
+        if not user_bind:
             return False, error_reply(WAVES_CODE_102)
         
-        role_id = user_binds[0].game_uid
+        role_id, ck, did = user_bind.game_uid, user_bind.cookie, user_bind.did
         
-        # 如果数据库中没有bat，尝试获取
-        if not bat:
-            success, bat = await self.api.get_request_token(role_id, ck, did)
-            if not success:
-                logger.warning("获取request_token失败，尝试继续刷新...")
-                bat = ""
+        # 优先使用缓存的令牌，临近过期时提前重新获取
+        success, bat = await self.tokens.get_token(
+            role_id, ck, did, stored_bat=user_bind.bat, stored_at=user_bind.update_time
+        )
+        if not success:
+            logger.warning("获取request_token失败，尝试继续刷新...")
+            bat = ""
         
+        # 登录校验、同步数据、获取列表/详情共三次请求
+        await self.budget.acquire(3)
         try:
             await self.api.login_log(role_id, ck)
         except Exception as e:
@@ -177,8 +319,9 @@ class RefreshManager:
         await asyncio.sleep(1)
         
         try:
-            role_detail_response = await self.api.get_role_detail_info(
-                str(role_id_by_name), role_id, ck, did, bat
+            role_detail_response = await self.tokens.call_with_token(
+                role_id, ck, did, bat,
+                lambda token: self.api.get_role_detail_info(str(role_id_by_name), role_id, ck, did, token),
             )
             
             if not role_detail_response.success:
@@ -188,7 +331,8 @@ class RefreshManager:
             if not role_detail_data:
                 return False, error_reply(101, "未获取到角色数据")
             
-            save_role_cache(user_id, str(role_id_by_name), role_detail_data)
+            if not await save_role_cache(user_id, str(role_id_by_name), role_detail_data):
+                return False, f"❌ 刷新失败: {role_name} 数据保存失败"
             
             return True, f"✅ 刷新成功！{role_name} 数据已更新"
             
@@ -196,43 +340,18 @@ class RefreshManager:
             logger.error(f"刷新角色 {role_name} 时发生错误: {e}")
             return False, f"❌ 刷新失败: {str(e)}"
     
-    async def _get_user_ck(self, user_id: str) -> Optional[Tuple[str, str, str]]:
-        """获取用户CK、did和bat
-        
-        Returns:
-            Tuple[str, str, str]: (cookie, did, bat) 或 None
-        """
-        async with get_session() as session:
-            result = await session.execute(
-                select(WutheringWavesBind.cookie, WutheringWavesBind.did, WutheringWavesBind.bat).where(
-                    WutheringWavesBind.user_id == user_id,
-                    WutheringWavesBind.game_id == 3
-                ).limit(1)
-            )
-            row = result.fetchone()
-            if row:
-                return row[0], row[1], row[2]
-            return None
-    
-    async def _get_user_binds(self, user_id: str) -> List[WutheringWavesBind]:
-        """获取用户的所有绑定记录
+    async def _get_user_bind(self, user_id: str) -> Optional[UserBind]:
+        """获取用户的第一条有效绑定（cookie、did、bat与特征码来自同一条记录）
         
         Returns:
-            List[WutheringWavesBind]: 用户绑定列表
+            Optional[UserBind]: 绑定信息，未绑定返回None
         """
-        async with get_session() as session:
-            result = await session.execute(
-                select(WutheringWavesBind).where(
-                    WutheringWavesBind.user_id == user_id,
-                    WutheringWavesBind.game_id == 3,
-                    WutheringWavesBind.status != "无效"
-                )
-            )
-            return list(result.scalars().all())
+        binds = await get_bind_cache().get(user_id)
+        return binds[0] if binds else None
     
     async def get_cached_role_list(self, user_id: str) -> Optional[List[Role]]:
         """获取缓存的角色列表"""
-        cache_data = load_user_cache(user_id)
+        cache_data = await load_user_cache(user_id)
         if not cache_data:
             return None
         
@@ -255,18 +374,104 @@ class RefreshManager:
         user_id: str, 
         role_id: str
     ) -> Optional[RoleDetailData]:
-        """获取缓存的角色详情"""
+        """获取缓存的角色详情
+        
+        优先返回进程内已解析的对象，缓存文件变化或过期后才重新读取和校验；
+        返回的对象会被多个调用方共享，不要原地修改。
+        """
         from .utils import load_role_cache
         
-        cache_data = load_role_cache(user_id, role_id)
+        lru = get_role_detail_lru()
+        generation = lru.generation()
+        version = get_cache_store().role_version(user_id, role_id)
+        role_detail = lru.get(user_id, role_id, version)
+        if role_detail is not None:
+            return role_detail
+        
+        cache_data = await load_role_cache(user_id, role_id)
         if not cache_data:
             return None
         
         try:
-            return RoleDetailData(**cache_data)
+            role_detail = RoleDetailData(**cache_data)
         except Exception as e:
             logger.warning(f"解析角色详情数据失败: {e}")
             return None
+        
+        lru.put(user_id, role_id, role_detail, version, generation)
+        return role_detail
+    
+    async def get_cached_role_details(
+        self, 
+        user_id: str, 
+        role_ids: List[str]
+    ) -> Dict[str, RoleDetailData]:
+        """批量获取缓存的角色详情
+        
+        内存中已有的直接返回，其余的一次性从缓存后端读取，
+        避免逐个角色访问磁盘或数据库。
+        """
+        from .utils import load_user_role_caches
+        
+        lru = get_role_detail_lru()
+        store = get_cache_store()
+        generation = lru.generation()
+        result: Dict[str, RoleDetailData] = {}
+        missing: Dict[str, Any] = {}
+        for role_id in role_ids:
+            version = store.role_version(user_id, role_id)
+            role_detail = lru.get(user_id, role_id, version)
+            if role_detail is not None:
+                result[role_id] = role_detail
+            else:
+                missing[role_id] = version
+        
+        if not missing:
+            return result
+        
+        cache_map = await load_user_role_caches(user_id)
+        for role_id, version in missing.items():
+            cache_data = cache_map.get(role_id)
+            if not cache_data:
+                continue
+            try:
+                role_detail = RoleDetailData(**cache_data)
+            except Exception as e:
+                logger.warning(f"解析角色详情数据失败: {e}")
+                continue
+            lru.put(user_id, role_id, role_detail, version, generation)
+            result[role_id] = role_detail
+        
+        return result
+    
+    async def get_fast_role_details(self, user_id: str, role_ids: List[str]) -> Dict[str, Any]:
+        """批量获取只读的角色详情，用于统计等需要遍历全部角色的场景
+        
+        安装了 msgspec 时直接从缓存的原始字节解码为轻量模型，
+        跳过 pydantic 校验且不占用LRU；否则与 get_cached_role_details 相同。
+        """
+        if not FAST_MODELS_AVAILABLE:
+            return await self.get_cached_role_details(user_id, role_ids)
+        
+        try:
+            payloads = await get_cache_store().load_user_role_payloads(user_id)
+        except Exception as e:
+            logger.error(f"加载角色缓存失败: {e}")
+            return {}
+        
+        result: Dict[str, Any] = {}
+        for role_id in role_ids:
+            raw = payloads.get(role_id)
+            if not raw:
+                continue
+            try:
+                role_detail = decode_role_record(raw)
+            except Exception as e:
+                logger.warning(f"解析角色详情数据失败: {e}")
+                continue
+            if role_detail is not None:
+                result[role_id] = role_detail
+        return result
     
     async def get_cached_role_detail_by_name(
         self, 
@@ -0,0 +1,282 @@
+# coding=utf-8
+"""
+后台刷新调度
+按优先级排队刷新任务，由固定数量的工作协程依次执行：
+命令触发的刷新最先执行，其次是最近活跃用户，最后是缓存过期的用户
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from nonebot import get_driver, logger
+from nonebot.adapters import Event
+from nonebot.message import event_preprocessor
+from nonebot_plugin_orm import get_session
+
+from sqlalchemy import select
+
+from .wwuid_api.models import WutheringWavesBind
+from ..utils import get_cache_update_time, is_cache_expired
+from .refresh import get_refresh_manager
+from ..plugin_core.config import get_config
+from ..plugin_core.constants import WAVES_GAME_ID
+
+# 数值越小越先执行
+PRIORITY_COMMAND = 0
+PRIORITY_ACTIVE = 1
+PRIORITY_STALE = 2
+
+ACTIVE_PRUNE_MIN_SIZE = 1024
+
+
+@dataclass(order=True)
+class RefreshJob:
+    """刷新任务"""
+    priority: int
+    seq: int
+    user_id: str = field(compare=False)
+    force: bool = field(default=False, compare=False)
+    enqueued_at: float = field(default_factory=time.monotonic, compare=False)
+    future: "asyncio.Future[Tuple[bool, str]]" = field(default=None, compare=False, repr=False)
+
+
+class RefreshScheduler:
+    """刷新调度器
+
+    - 同一用户同时只有一个任务，重复提交会合并（并按需提升优先级、改为强制刷新）
+    - 后台任务数量受 REFRESH_QUEUE_LIMIT 限制，命令触发的任务不受限制
+    - 上游请求的总速率由 RefreshManager 的每分钟预算控制
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self._heap: List[RefreshJob] = []
+        self._jobs: Dict[str, RefreshJob] = {}
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        # 用户最近一次发言的时间（time.monotonic）
+        self._active: Dict[str, float] = {}
+        # 记录数超过该值时清理一次过期记录
+        self._active_prune_size = ACTIVE_PRUNE_MIN_SIZE
+
+    @property
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return len(self._heap)
+
+    def start(self) -> None:
+        """启动工作协程"""
+        if self._tasks:
+            return
+        self._cond = asyncio.Condition()
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"[鸣潮] 刷新调度器已启动，工作协程 {self.workers} 个")
+
+    async def stop(self) -> None:
+        """停止工作协程，未执行的任务直接取消"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._heap:
+            if not job.future.done():
+                job.future.cancel()
+        self._heap.clear()
+        self._jobs.clear()
+
+    def mark_active(self, user_id: str) -> None:
+        """记录用户活跃（记录过多时顺便清理活跃窗口之外的记录）"""
+        self._active[user_id] = time.monotonic()
+        if len(self._active) > self._active_prune_size:
+            self.active_users(get_config().REFRESH_ACTIVE_WINDOW_MINUTES * 60)
+            self._active_prune_size = max(ACTIVE_PRUNE_MIN_SIZE, len(self._active) * 2)
+
+    def active_users(self, window_seconds: float) -> List[str]:
+        """最近 window_seconds 秒内活跃的用户，同时清理过期记录"""
+        now = time.monotonic()
+        self._active = {
+            user_id: last for user_id, last in self._active.items()
+            if now - last <= window_seconds
+        }
+        return list(self._active)
+
+    def get_job(self, user_id: str) -> Optional[RefreshJob]:
+        """用户排队中或执行中的任务"""
+        return self._jobs.get(user_id)
+
+    def submit(self, user_id: str, priority: int = PRIORITY_COMMAND, force: bool = False) -> Optional[RefreshJob]:
+        """提交刷新任务
+
+        已在执行中的任务无法再改为强制刷新，此时返回该任务（job.force 为 False），由调用方提示用户。
+
+        Returns:
+            Optional[RefreshJob]: 任务（可能是已存在的同一用户任务）；后台队列已满时返回None
+        """
+        job = self._jobs.get(user_id)
+        if job is not None:
+            if job in self._heap:
+                job.force = job.force or force
+                if priority < job.priority:
+                    job.priority = priority
+                    heapq.heapify(self._heap)
+            return job
+
+        if priority != PRIORITY_COMMAND and len(self._heap) >= self.queue_limit:
+            return None
+
+        job = RefreshJob(priority, next(self._seq), user_id, force)
+        job.future = asyncio.get_running_loop().create_future()
+        self._jobs[user_id] = job
+        heapq.heappush(self._heap, job)
+        if self._cond is None:
+            # 调度器未启动（如脱离NoneBot运行）时直接执行
+            self.start()
+        asyncio.ensure_future(self._notify())
+        return job
+
+    async def _notify(self) -> None:
+        async with self._cond:
+            self._cond.notify()
+
+    def position(self, job: RefreshJob) -> int:
+        """任务在队列中的位置（从1开始），已开始执行返回0"""
+        if job not in self._heap:
+            return 0
+        return sum(1 for other in self._heap if other < job) + 1
+
+    async def wait(self, job: RefreshJob, timeout: Optional[float] = None) -> Optional[Tuple[bool, str]]:
+        """等待任务结果，超时返回None（任务继续执行）"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _worker(self, index: int) -> None:
+        refresh_manager = get_refresh_manager()
+        while True:
+            async with self._cond:
+                while not self._heap:
+                    await self._cond.wait()
+                job = heapq.heappop(self._heap)
+
+            waited = time.monotonic() - job.enqueued_at
+            logger.debug(
+                f"[鸣潮] 刷新协程 {index} 开始刷新用户 {job.user_id}"
+                f"（优先级 {job.priority}，排队 {waited:.1f} 秒）"
+            )
+            try:
+                result = await refresh_manager.refresh_all(job.user_id, force=job.force)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                self._jobs.pop(job.user_id, None)
+                raise
+            except Exception as e:
+                logger.error(f"[鸣潮] 后台刷新用户 {job.user_id} 失败: {e}")
+                result = (False, f"❌ 刷新失败: {e}")
+
+            if not job.future.done():
+                job.future.set_result(result)
+            self._jobs.pop(job.user_id, None)
+
+    async def scan(self) -> int:
+        """扫描绑定用户，把活跃用户及数据过期的用户加入队列
+
+        Returns:
+            int: 新加入队列的任务数
+        """
+        config = get_config()
+        active = set(self.active_users(config.REFRESH_ACTIVE_WINDOW_MINUTES * 60))
+        stale_minutes = config.REFRESH_STALE_HOURS * 60
+
+        async with get_session() as session:
+            result = await session.execute(
+                select(WutheringWavesBind.user_id).where(
+                    WutheringWavesBind.game_id == WAVES_GAME_ID,
+                    WutheringWavesBind.status != "无效"
+                ).distinct()
+            )
+            user_ids = [row[0] for row in result.fetchall()]
+
+        added = 0
+        for user_id in user_ids:
+            if user_id in self._jobs:
+                continue
+            if user_id in active:
+                priority, expire_minutes = PRIORITY_ACTIVE, config.CACHE_EXPIRE_MINUTES
+            elif stale_minutes > 0:
+                priority, expire_minutes = PRIORITY_STALE, stale_minutes
+            else:
+                continue
+
+            update_time = await get_cache_update_time(user_id)
+            if update_time is not None and not is_cache_expired(update_time, expire_minutes):
+                continue
+            if self.submit(user_id, priority) is None:
+                logger.info("[鸣潮] 刷新队列已满，本轮扫描提前结束")
+                break
+            added += 1
+
+        if added:
+            logger.info(f"[鸣潮] 后台刷新扫描: 加入 {added} 个任务，队列中共 {self.pending} 个")
+        return added
+
+
+_refresh_scheduler: Optional[RefreshScheduler] = None
+
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    """获取刷新调度器实例"""
+    global _refresh_scheduler
+    if _refresh_scheduler is None:
+        config = get_config()
+        _refresh_scheduler = RefreshScheduler(config.REFRESH_WORKERS, config.REFRESH_QUEUE_LIMIT)
+    return _refresh_scheduler
+
+
+@event_preprocessor
+async def track_user_activity(event: Event):
+    """记录发言用户，后台刷新时优先处理"""
+    if event.get_type() != "message" or not get_config().ENABLE_BACKGROUND_REFRESH:
+        return
+    try:
+        get_refresh_scheduler().mark_active(event.get_user_id())
+    except Exception:
+        pass
+
+
+_driver = get_driver()
+
+
+@_driver.on_startup
+async def start_refresh_scheduler():
+    """启动刷新调度器并注册后台扫描任务"""
+    from nonebot_plugin_apscheduler import scheduler
+
+    config = get_config()
+    refresh_scheduler = get_refresh_scheduler()
+    refresh_scheduler.start()
+
+    if not config.ENABLE_BACKGROUND_REFRESH:
+        return
+
+    @scheduler.scheduled_job(
+        "interval",
+        minutes=max(1, config.BACKGROUND_REFRESH_INTERVAL_MINUTES),
+    )
+    async def background_refresh_scan():
+        try:
+            await refresh_scheduler.scan()
+        except Exception as e:
+            logger.error(f"[鸣潮] 后台刷新扫描失败: {e}")
+
+
+@_driver.on_shutdown
+async def stop_refresh_scheduler():
+    """停止刷新调度器"""
+    if _refresh_scheduler is not None:
+        await _refresh_scheduler.stop()
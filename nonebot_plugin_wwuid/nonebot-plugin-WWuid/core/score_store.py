@@ -0,0 +1,500 @@
+# coding=utf-8
+"""
+角色练度评分物化存储
+角色缓存写入后在后台合并计算评分并写入评分表，同时增量维护用户的高/中/低练度计数；
+练度统计与汇总只需按 (user_id, total_score) 索引读取一次。
+评分表缺失或评分权重变更后，由统计模块从角色缓存重建该用户的全部评分。
+群排行按 (role_id, total_score) 索引取前K名，百分位排名来自按角色维护的总分分布。
+"""
+import asyncio
+import weakref
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from nonebot import get_driver, logger
+
+from .wwuid_api.models import _ORM_AVAILABLE, RoleDetailData
+from .wwuid_api.fast_models import FAST_MODELS_AVAILABLE, convert_role_detail
+from .scoring import (
+    RoleFeatures,
+    RoleScores,
+    extract_features,
+    get_score_weights,
+    score_bucket,
+    score_features,
+    score_tier,
+    weights_key,
+)
+from ..utils.common import add_role_cache_listener
+from ..plugin_core.config import get_config
+from ..plugin_core.constants import WAVES_GAME_ID
+
+if _ORM_AVAILABLE:
+    from .wwuid_api.models import WutheringWavesBind, WavesRoleScore, WavesScoreHistogram, WavesScoreSummary
+
+# 角色缓存变化后等待多久再写评分，刷新全部角色时的多次保存合并为一次写入
+RESCORE_BATCH_DELAY = 0.5
+
+
+class ScoreSummary(NamedTuple):
+    """用户练度汇总"""
+    role_count: int
+    score_sum: float
+    high_count: int
+    medium_count: int
+    low_count: int
+
+    @property
+    def avg_score(self) -> float:
+        return self.score_sum / self.role_count if self.role_count else 0.0
+
+
+class ScoredRole(NamedTuple):
+    """一个角色的评分及计算用到的特征"""
+    role_id: int
+    role_name: str
+    features: RoleFeatures
+    scores: RoleScores
+
+
+def _apply_tier(summary: "WavesScoreSummary", total: float, delta: int) -> None:
+    tier = score_tier(total)
+    if tier == "high":
+        summary.high_count += delta
+    elif tier == "medium":
+        summary.medium_count += delta
+    else:
+        summary.low_count += delta
+
+
+def _add_delta(deltas: Dict[Tuple[int, int], int], role_id: int, total: float, delta: int) -> None:
+    key = (role_id, score_bucket(total))
+    deltas[key] = deltas.get(key, 0) + delta
+
+
+def _fill_row(row: "WavesRoleScore", scored: ScoredRole) -> None:
+    features, scores = scored.features, scored.scores
+    row.role_name = scored.role_name
+    row.level = features.level
+    row.chain_num = features.chain_num
+    row.weapon_level = features.weapon_level
+    row.phantom_count = features.phantom_count
+    row.skill_total = features.skill_total
+    row.total_score = scores.total
+    row.level_score = scores.level
+    row.chain_score = scores.chain
+    row.weapon_score = scores.weapon
+    row.phantom_score = scores.phantom
+    row.skill_score = scores.skill
+    row.update_time = datetime.now()
+
+
+def row_to_scored(row: "WavesRoleScore") -> ScoredRole:
+    """评分表记录 -> ScoredRole（未保存的特征字段置0）"""
+    return ScoredRole(
+        role_id=row.role_id,
+        role_name=row.role_name,
+        features=RoleFeatures(
+            level=row.level,
+            breach=0,
+            star_level=0,
+            chain_num=row.chain_num,
+            weapon_level=row.weapon_level,
+            weapon_breach=0,
+            phantom_count=row.phantom_count,
+            phantom_quality=0.0,
+            skill_total=row.skill_total,
+            skill_count=0,
+        ),
+        scores=RoleScores(
+            total=row.total_score,
+            level=row.level_score,
+            chain=row.chain_score,
+            weapon=row.weapon_score,
+            phantom=row.phantom_score,
+            skill=row.skill_score,
+        ),
+    )
+
+
+class ScoreStore:
+    """角色评分表读写
+
+    同一用户的写入串行执行，保证汇总计数的增量更新不会相互覆盖。
+    角色缓存的变化由 schedule_rescore 登记，在后台按用户合并为一个事务写入。
+    """
+
+    def __init__(self):
+        # 锁只在有写入进行或等待时被引用，之后自动回收
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # 分布桶被所有用户共享，单独串行更新
+        self._histogram_lock = asyncio.Lock()
+        # 待写入的角色数据：user_id -> {role_id: 角色详情，None 表示删除}
+        self._pending: Dict[str, Dict[int, Optional[Dict[str, Any]]]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return _ORM_AVAILABLE and get_config().ENABLE_SCORE_STORE
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    def schedule_rescore(self, user_id: str, role_id: int, data: Optional[Dict[str, Any]]) -> None:
+        """登记角色数据变化（data 为 None 表示角色缓存已清除），稍后在后台写入评分"""
+        self._pending.setdefault(user_id, {})[role_id] = data
+        if user_id not in self._flush_tasks:
+            self._flush_tasks[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id: str) -> None:
+        try:
+            await asyncio.sleep(RESCORE_BATCH_DELAY)
+            # 写入期间登记的新变化在下一轮写入
+            while self._pending.get(user_id):
+                changes: Dict[int, Optional[ScoredRole]] = {}
+                for role_id, data in self._pending.pop(user_id).items():
+                    try:
+                        changes[role_id] = score_role_data(data) if data is not None else None
+                    except Exception as e:
+                        logger.warning(f"计算角色 {role_id} 评分失败: {e}")
+                try:
+                    await self.update_roles(user_id, changes)
+                except Exception as e:
+                    logger.warning(f"更新用户 {user_id} 的角色评分失败: {e}")
+        finally:
+            self._flush_tasks.pop(user_id, None)
+
+    async def flush(self, user_id: Optional[str] = None) -> None:
+        """等待已登记的评分写入完成；user_id 为空时等待全部用户"""
+        if user_id is None:
+            tasks = list(self._flush_tasks.values())
+        else:
+            task = self._flush_tasks.get(user_id)
+            tasks = [task] if task is not None else []
+        if tasks:
+            await asyncio.gather(*(asyncio.shield(task) for task in tasks), return_exceptions=True)
+
+    async def load(self, user_id: str) -> Optional[Tuple[ScoreSummary, List[ScoredRole]]]:
+        """读取用户的汇总与按总分降序排列的评分（先等待该用户待写入的评分）
+
+        Returns:
+            汇总不存在或评分权重已变更时返回 None（需要重建）
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+
+        await self.flush(user_id)
+
+        async with get_session() as session:
+            summary = await session.get(WavesScoreSummary, user_id)
+            if summary is None or summary.weights_key != weights_key(get_score_weights()):
+                return None
+            rows = (await session.execute(
+                select(WavesRoleScore)
+                .where(WavesRoleScore.user_id == user_id)
+                .order_by(WavesRoleScore.total_score.desc())
+            )).scalars().all()
+            return (
+                ScoreSummary(
+                    role_count=summary.role_count,
+                    score_sum=summary.score_sum,
+                    high_count=summary.high_count,
+                    medium_count=summary.medium_count,
+                    low_count=summary.low_count,
+                ),
+                [row_to_scored(row) for row in rows],
+            )
+
+    async def replace_user(self, user_id: str, scored: List[ScoredRole]) -> None:
+        """用完整的评分列表重建用户的评分表与汇总"""
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import delete, select
+
+        histogram: Dict[Tuple[int, int], int] = {}
+        async with self._lock(user_id):
+            async with get_session() as session:
+                old_rows = (await session.execute(
+                    select(WavesRoleScore.role_id, WavesRoleScore.total_score)
+                    .where(WavesRoleScore.user_id == user_id)
+                )).all()
+                for role_id, total in old_rows:
+                    _add_delta(histogram, role_id, total, -1)
+                await session.execute(
+                    delete(WavesRoleScore)
+                    .where(WavesRoleScore.user_id == user_id)
+                    .execution_options(synchronize_session=False)
+                )
+                summary = await session.get(WavesScoreSummary, user_id)
+                if summary is None:
+                    summary = WavesScoreSummary(user_id=user_id)
+                    session.add(summary)
+                summary.weights_key = weights_key(get_score_weights())
+                summary.role_count = len(scored)
+                summary.score_sum = sum(item.scores.total for item in scored)
+                summary.high_count = summary.medium_count = summary.low_count = 0
+                for item in scored:
+                    row = WavesRoleScore(user_id=user_id, role_id=item.role_id)
+                    _fill_row(row, item)
+                    session.add(row)
+                    _apply_tier(summary, item.scores.total, 1)
+                    _add_delta(histogram, item.role_id, item.scores.total, 1)
+                summary.update_time = datetime.now()
+                async with self._histogram_lock:
+                    await self._apply_histogram(session, histogram)
+                    await session.commit()
+
+    async def update_roles(self, user_id: str, changes: Dict[int, Optional[ScoredRole]]) -> None:
+        """在一个事务中写入（值为 None 时删除）多个角色的评分，并增量更新汇总
+
+        汇总不存在或权重已变更时只写评分行，汇总留待下次读取时重建。
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+
+        if not changes:
+            return
+        histogram: Dict[Tuple[int, int], int] = {}
+        async with self._lock(user_id):
+            async with get_session() as session:
+                rows = {
+                    row.role_id: row
+                    for row in (await session.execute(
+                        select(WavesRoleScore).where(
+                            WavesRoleScore.user_id == user_id,
+                            WavesRoleScore.role_id.in_(list(changes)),
+                        )
+                    )).scalars().all()
+                }
+                summary = await session.get(WavesScoreSummary, user_id)
+                if summary is not None and summary.weights_key != weights_key(get_score_weights()):
+                    await session.delete(summary)
+                    summary = None
+
+                for role_id, scored in changes.items():
+                    row = rows.get(role_id)
+                    if row is not None:
+                        _add_delta(histogram, role_id, row.total_score, -1)
+                        if summary is not None:
+                            summary.role_count -= 1
+                            summary.score_sum -= row.total_score
+                            _apply_tier(summary, row.total_score, -1)
+
+                    if scored is None:
+                        if row is not None:
+                            await session.delete(row)
+                        continue
+                    if row is None:
+                        row = WavesRoleScore(user_id=user_id, role_id=role_id)
+                        session.add(row)
+                    _fill_row(row, scored)
+                    _add_delta(histogram, role_id, scored.scores.total, 1)
+                    if summary is not None:
+                        summary.role_count += 1
+                        summary.score_sum += scored.scores.total
+                        _apply_tier(summary, scored.scores.total, 1)
+
+                if summary is not None:
+                    summary.update_time = datetime.now()
+                async with self._histogram_lock:
+                    await self._apply_histogram(session, histogram)
+                    await session.commit()
+
+    @staticmethod
+    async def _apply_histogram(session, deltas: Dict[Tuple[int, int], int]) -> None:
+        """在评分写入的同一事务中按 (role_id, bucket) 增减分布计数
+
+        调用方持有 _histogram_lock 直到提交，避免两个事务同时插入同一个新桶。
+        """
+        from sqlalchemy import update
+
+        for (role_id, bucket), delta in deltas.items():
+            if not delta:
+                continue
+            result = await session.execute(
+                update(WavesScoreHistogram)
+                .where(WavesScoreHistogram.role_id == role_id, WavesScoreHistogram.bucket == bucket)
+                .values(count=WavesScoreHistogram.count + delta)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                session.add(WavesScoreHistogram(role_id=role_id, bucket=bucket, count=max(delta, 0)))
+
+    @staticmethod
+    async def _count_scores(session) -> Dict[Tuple[int, int], int]:
+        """按 (role_id, bucket) 统计评分表中的记录数"""
+        from sqlalchemy import select
+
+        counts: Dict[Tuple[int, int], int] = {}
+        result = await session.stream(select(WavesRoleScore.role_id, WavesRoleScore.total_score))
+        async for role_id, total in result:
+            _add_delta(counts, role_id, total, 1)
+        return counts
+
+    async def rebuild_histogram(self) -> int:
+        """从评分表重新统计全部角色的总分分布
+
+        Returns:
+            int: 统计的评分记录数
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import delete
+
+        async with self._histogram_lock:
+            async with get_session() as session:
+                counts = await self._count_scores(session)
+                await session.execute(delete(WavesScoreHistogram))
+                for (role_id, bucket), count in counts.items():
+                    session.add(WavesScoreHistogram(role_id=role_id, bucket=bucket, count=count))
+                await session.commit()
+        return sum(counts.values())
+
+    async def ensure_histogram(self) -> None:
+        """分布与评分表不一致时重建分布
+
+        覆盖从旧版本升级（分布为空）以及旧版本分两次提交评分与分布留下的偏差。
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+
+        async with self._histogram_lock:
+            async with get_session() as session:
+                expected = await self._count_scores(session)
+                stored = {
+                    (role_id, bucket): count
+                    for role_id, bucket, count in (await session.execute(
+                        select(WavesScoreHistogram.role_id, WavesScoreHistogram.bucket, WavesScoreHistogram.count)
+                    )).all()
+                    if count
+                }
+        if stored != expected:
+            count = await self.rebuild_histogram()
+            logger.info(f"总分分布与评分表不一致，已根据 {count} 条角色评分重建")
+
+    @staticmethod
+    def _group_members(group_id: str):
+        """群内有效绑定用户的子查询（走 (group_id, user_id) 索引）"""
+        from sqlalchemy import select
+
+        return select(WutheringWavesBind.user_id).where(
+            WutheringWavesBind.group_id == group_id,
+            WutheringWavesBind.game_id == WAVES_GAME_ID,
+            WutheringWavesBind.status != "无效",
+        )
+
+    async def group_top(self, group_id: str, role_id: int, limit: int) -> List[Tuple[str, ScoredRole]]:
+        """群内指定角色总分最高的前 limit 名
+
+        Returns:
+            List[Tuple[str, ScoredRole]]: (user_id, 评分)，按总分降序
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+
+        async with get_session() as session:
+            rows = (await session.execute(
+                select(WavesRoleScore)
+                .where(
+                    WavesRoleScore.role_id == role_id,
+                    WavesRoleScore.user_id.in_(self._group_members(group_id)),
+                )
+                .order_by(WavesRoleScore.total_score.desc())
+                .limit(limit)
+            )).scalars().all()
+            return [(row.user_id, row_to_scored(row)) for row in rows]
+
+    async def group_rank(self, group_id: str, role_id: int, total: float) -> Tuple[int, int]:
+        """总分在群内该角色中的名次
+
+        Returns:
+            Tuple[int, int]: (名次, 群内拥有该角色评分的人数)
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import case, func, select
+
+        async with get_session() as session:
+            count, higher = (await session.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(case((WavesRoleScore.total_score > total, 1), else_=0)), 0),
+                ).where(
+                    WavesRoleScore.role_id == role_id,
+                    WavesRoleScore.user_id.in_(self._group_members(group_id)),
+                )
+            )).one()
+            return int(higher) + 1, int(count)
+
+    async def percentile(self, role_id: int, total: float) -> Optional[Tuple[float, int]]:
+        """根据总分分布估算百分位（同桶按一半计）
+
+        Returns:
+            Optional[Tuple[float, int]]: (超过的玩家百分比, 参与统计的人数)，没有分布数据时返回 None
+        """
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+
+        async with get_session() as session:
+            buckets = (await session.execute(
+                select(WavesScoreHistogram.bucket, WavesScoreHistogram.count)
+                .where(WavesScoreHistogram.role_id == role_id)
+            )).all()
+
+        population = sum(count for _, count in buckets if count > 0)
+        if population <= 0:
+            return None
+        own = score_bucket(total)
+        below = sum(count for bucket, count in buckets if bucket < own and count > 0)
+        same = sum(count for bucket, count in buckets if bucket == own and count > 0)
+        return (below + same / 2) / population * 100.0, population
+
+
+def score_role_data(data: Dict[str, Any]) -> ScoredRole:
+    """从角色详情字典（save_role_cache 写入的 data）计算评分"""
+    if FAST_MODELS_AVAILABLE:
+        role_detail = convert_role_detail(data)
+    else:
+        role_detail = RoleDetailData.model_validate(data)
+    features = extract_features(role_detail)
+    scores = score_features([features])[0]
+    return ScoredRole(role_detail.role.roleId, role_detail.role.roleName, features, scores)
+
+
+_score_store: Optional[ScoreStore] = None
+
+
+def get_score_store() -> ScoreStore:
+    """获取评分存储实例"""
+    global _score_store
+    if _score_store is None:
+        _score_store = ScoreStore()
+    return _score_store
+
+
+@add_role_cache_listener
+def _rescore_on_save(user_id: str, role_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """角色缓存写入后登记重新计算该角色评分，清除后删除评分（不阻塞缓存写入）"""
+    store = get_score_store()
+    if not store.enabled:
+        return
+    store.schedule_rescore(user_id, int(role_id), data)
+
+
+@get_driver().on_startup
+async def _ensure_score_histogram() -> None:
+    """启动时检查总分分布，与评分表不一致时重建"""
+    store = get_score_store()
+    if not store.enabled:
+        return
+    try:
+        await store.ensure_histogram()
+    except Exception as e:
+        logger.warning(f"检查总分分布失败: {e}")
+
+
+@get_driver().on_shutdown
+async def _flush_pending_scores() -> None:
+    """退出前写入尚未写入的评分"""
+    await get_score_store().flush()
@@ -0,0 +1,232 @@
+# coding=utf-8
+"""
+角色练度批量评分
+把一批角色（一个用户或整个群）的练度特征打包成数组，一次向量化计算全部分项评分与加权总分；
+未安装 NumPy 时逐个计算（与向量化结果仅有舍入误差）。
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:
+    _NUMPY_AVAILABLE = False
+
+from ..plugin_core.config import get_config
+
+SCORE_KEYS = ("level", "chain", "weapon", "phantom", "skill")
+
+MAX_LEVEL = 90
+MAX_CHAIN = 6
+MAX_PHANTOM = 5
+MAX_SKILL_LEVEL = 10
+
+# 练度分档：高练度 >= HIGH_SCORE，中练度 >= MEDIUM_SCORE
+HIGH_SCORE = 80.0
+MEDIUM_SCORE = 60.0
+
+
+class RoleFeatures(NamedTuple):
+    """评分用到的角色练度特征"""
+    level: int
+    breach: int
+    star_level: int
+    chain_num: int
+    weapon_level: int
+    weapon_breach: int
+    phantom_count: int
+    phantom_quality: float
+    skill_total: int
+    skill_count: int
+
+
+class RoleScores(NamedTuple):
+    """分项评分与加权总分"""
+    total: float
+    level: float
+    chain: float
+    weapon: float
+    phantom: float
+    skill: float
+
+
+def extract_features(role_detail) -> RoleFeatures:
+    """从角色详情（pydantic 模型或 fast_models 轻量模型）中提取评分特征"""
+    phantoms = []
+    if role_detail.phantomData and role_detail.phantomData.equipPhantomList:
+        phantoms = [p for p in role_detail.phantomData.equipPhantomList if p]
+
+    skill_list = role_detail.skillList
+    return RoleFeatures(
+        level=role_detail.level,
+        breach=role_detail.role.breach or 0,
+        star_level=role_detail.role.starLevel,
+        chain_num=role_detail.get_chain_num(),
+        weapon_level=role_detail.weaponData.level,
+        weapon_breach=role_detail.weaponData.breach or 0,
+        phantom_count=len(phantoms),
+        phantom_quality=(sum(p.quality for p in phantoms) / len(phantoms)) if phantoms else 0.0,
+        skill_total=sum(s.level - 1 for s in skill_list),
+        skill_count=len(skill_list),
+    )
+
+
+def get_score_weights() -> Dict[str, float]:
+    """评分权重（来自 SCORE_WEIGHT_* 配置）"""
+    config = get_config()
+    return {
+        "level": config.SCORE_WEIGHT_LEVEL,
+        "chain": config.SCORE_WEIGHT_CHAIN,
+        "weapon": config.SCORE_WEIGHT_WEAPON,
+        "phantom": config.SCORE_WEIGHT_PHANTOM,
+        "skill": config.SCORE_WEIGHT_SKILL,
+    }
+
+
+def weights_key(weights: Dict[str, float]) -> str:
+    """权重的稳定表示，用于判断已保存的评分是否按当前权重计算"""
+    return ",".join(f"{weights[key]:g}" for key in SCORE_KEYS)
+
+
+def score_bucket(total: float) -> int:
+    """总分所在的分布桶（每1分一个桶，0-100）"""
+    return max(0, min(int(total), 100))
+
+
+def score_tier(total: float) -> str:
+    """练度分档：high / medium / low"""
+    if total >= HIGH_SCORE:
+        return "high"
+    if total >= MEDIUM_SCORE:
+        return "medium"
+    return "low"
+
+
+# ---- 单个角色的评分公式（未安装 NumPy 时使用，也是向量化实现的参照） ----
+
+def level_score(level: int, breach: int) -> float:
+    """等级评分：等级占90分，突破阶段加分"""
+    if breach >= 6:
+        breach_bonus = 10.0
+    elif breach >= 5:
+        breach_bonus = 7.5
+    elif breach >= 4:
+        breach_bonus = 5.0
+    elif breach >= 3:
+        breach_bonus = 2.5
+    else:
+        breach_bonus = 0.0
+    return min(min(level / MAX_LEVEL, 1.0) * 90.0 + breach_bonus, 100.0)
+
+
+def chain_score(chain_num: int, star_level: int) -> float:
+    """命座评分：仅五星角色计算"""
+    if star_level < 5:
+        return 0.0
+    return min(chain_num / MAX_CHAIN * 100.0, 100.0)
+
+
+def weapon_score(level: int, breach: int) -> float:
+    """武器评分：等级占90分，突破阶段加分"""
+    if breach >= 5:
+        breach_bonus = 10.0
+    elif breach >= 4:
+        breach_bonus = 5.0
+    elif breach >= 3:
+        breach_bonus = 2.5
+    else:
+        breach_bonus = 0.0
+    return min(min(level / MAX_LEVEL, 1.0) * 90.0 + breach_bonus, 100.0)
+
+
+def phantom_score(phantom_count: int, avg_quality: float) -> float:
+    """声骸评分：装备数量占70分，平均品质加分"""
+    if phantom_count == 0:
+        return 0.0
+    if avg_quality >= 5:
+        quality_bonus = 20.0
+    elif avg_quality >= 4:
+        quality_bonus = 15.0
+    elif avg_quality >= 3:
+        quality_bonus = 10.0
+    else:
+        quality_bonus = 0.0
+    return min(phantom_count / MAX_PHANTOM * 70.0 + quality_bonus, 100.0)
+
+
+def skill_score(skill_total: int, skill_count: int) -> float:
+    """技能评分：平均技能等级"""
+    if skill_count == 0:
+        return 0.0
+    return min(skill_total / skill_count / MAX_SKILL_LEVEL * 100.0, 100.0)
+
+
+def _weight_vector(weights: Dict[str, float]) -> List[float]:
+    total = sum(weights[key] for key in SCORE_KEYS)
+    # 权重按占比计算，总和不是100时同样得到0-100的总分
+    return [weights[key] / total if total > 0 else 0.0 for key in SCORE_KEYS]
+
+
+def _score_python(features: Sequence[RoleFeatures], weights: Dict[str, float]) -> List[RoleScores]:
+    ratios = _weight_vector(weights)
+    results = []
+    for f in features:
+        parts = (
+            level_score(f.level, f.breach),
+            chain_score(f.chain_num, f.star_level),
+            weapon_score(f.weapon_level, f.weapon_breach),
+            phantom_score(f.phantom_count, f.phantom_quality),
+            skill_score(f.skill_total, f.skill_count),
+        )
+        total = sum(part * ratio for part, ratio in zip(parts, ratios))
+        results.append(RoleScores(round(total, 2), *(round(part, 2) for part in parts)))
+    return results
+
+
+def _score_numpy(features: Sequence[RoleFeatures], weights: Dict[str, float]) -> List[RoleScores]:
+    data = np.asarray(features, dtype=np.float64)
+    (level, breach, star_level, chain_num, weapon_level, weapon_breach,
+     phantom_count, phantom_quality, skill_total, skill_count) = data.T
+
+    level_part = np.minimum(
+        np.minimum(level / MAX_LEVEL, 1.0) * 90.0
+        + np.select([breach >= 6, breach >= 5, breach >= 4, breach >= 3], [10.0, 7.5, 5.0, 2.5], 0.0),
+        100.0,
+    )
+    chain_part = np.where(star_level < 5, 0.0, np.minimum(chain_num / MAX_CHAIN * 100.0, 100.0))
+    weapon_part = np.minimum(
+        np.minimum(weapon_level / MAX_LEVEL, 1.0) * 90.0
+        + np.select([weapon_breach >= 5, weapon_breach >= 4, weapon_breach >= 3], [10.0, 5.0, 2.5], 0.0),
+        100.0,
+    )
+    phantom_part = np.where(
+        phantom_count == 0,
+        0.0,
+        np.minimum(
+            phantom_count / MAX_PHANTOM * 70.0
+            + np.select(
+                [phantom_quality >= 5, phantom_quality >= 4, phantom_quality >= 3], [20.0, 15.0, 10.0], 0.0
+            ),
+            100.0,
+        ),
+    )
+    safe_count = np.where(skill_count == 0, 1.0, skill_count)
+    skill_part = np.where(
+        skill_count == 0, 0.0, np.minimum(skill_total / safe_count / MAX_SKILL_LEVEL * 100.0, 100.0)
+    )
+
+    parts = np.stack([level_part, chain_part, weapon_part, phantom_part, skill_part], axis=1)
+    totals = parts @ np.asarray(_weight_vector(weights))
+    table = np.round(np.column_stack([totals, parts]), 2)
+    return [RoleScores(*row) for row in table.tolist()]
+
+
+def score_features(features: Sequence[RoleFeatures], weights: Optional[Dict[str, float]] = None) -> List[RoleScores]:
+    """批量计算评分，返回顺序与 features 一致"""
+    if not features:
+        return []
+    if weights is None:
+        weights = get_score_weights()
+    if _NUMPY_AVAILABLE:
+        return _score_numpy(features, weights)
+    return _score_python(features, weights)
@@ -2,6 +2,7 @@
 """
 鸣潮角色练度统计模块
 """
+import asyncio
 from typing import List, Dict, Any, Tuple, Optional
 from dataclasses import dataclass, field
 
@@ -9,6 +10,20 @@ from nonebot import logger
 
 from .wwuid_api.models import RoleDetailData
 from .refresh import get_refresh_manager
+from .scoring import (
+    RoleFeatures,
+    extract_features,
+    get_score_weights,
+    score_features,
+    score_tier,
+    level_score,
+    chain_score,
+    weapon_score,
+    phantom_score,
+    skill_score,
+)
+from .score_store import ScoreSummary, ScoredRole, get_score_store
+from ..utils import get_role_id_by_name
 
 
 @dataclass
@@ -30,18 +45,67 @@ class StatisticsManager:
     
     def __init__(self):
         self.refresh_manager = get_refresh_manager()
-        self.weight_config = self._get_default_weight_config()
     
-    def _get_default_weight_config(self) -> Dict[str, float]:
-        """获取默认评分权重配置"""
+    @property
+    def weight_config(self) -> Dict[str, float]:
+        """评分权重（SCORE_WEIGHT_* 配置）"""
+        return get_score_weights()
+    
+    async def _load_roster(self, user_id: str, role_list: Optional[List[Any]] = None) -> List[Any]:
+        """读取用户全部已缓存的角色详情"""
+        if role_list is None:
+            role_list = await self.refresh_manager.get_cached_role_list(user_id)
+        if not role_list:
+            return []
+        role_ids = [str(role.roleId) for role in role_list]
+        role_details = await self.refresh_manager.get_fast_role_details(user_id, role_ids)
+        return [role_details[role_id] for role_id in role_ids if role_id in role_details]
+    
+    def score_rosters(self, rosters: Dict[str, List[Any]]) -> Dict[str, List[RoleScore]]:
+        """批量计算多个用户全部角色的评分（一次向量化计算）
+        
+        Args:
+            rosters: user_id -> 角色详情列表
+        
+        Returns:
+            Dict[str, List[RoleScore]]: user_id -> 按总分降序排列的评分
+        """
         return {
-            "level": 25.0,
-            "chain": 20.0,
-            "weapon": 20.0,
-            "phantom": 20.0,
-            "skill": 15.0,
+            user_id: [self._build_role_score(item) for item in scored]
+            for user_id, scored in self._score_rosters(rosters).items()
         }
     
+    def _score_rosters(self, rosters: Dict[str, List[Any]]) -> Dict[str, List[ScoredRole]]:
+        owners: List[str] = []
+        details: List[Any] = []
+        features: List[RoleFeatures] = []
+        for user_id, roster in rosters.items():
+            for role_detail in roster:
+                try:
+                    features.append(extract_features(role_detail))
+                except Exception as e:
+                    logger.warning(f"计算角色 {role_detail.role.roleName} 评分失败: {e}")
+                    continue
+                owners.append(user_id)
+                details.append(role_detail)
+        
+        result: Dict[str, List[ScoredRole]] = {user_id: [] for user_id in rosters}
+        for user_id, role_detail, feature, scores in zip(
+            owners, details, features, score_features(features, self.weight_config)
+        ):
+            result[user_id].append(ScoredRole(role_detail.role.roleId, role_detail.role.roleName, feature, scores))
+        
+        for scored in result.values():
+            scored.sort(key=lambda x: x.scores.total, reverse=True)
+        return result
+    
+    async def calculate_group_scores(self, user_ids: List[str]) -> Dict[str, List[RoleScore]]:
+        """并发读取多个用户的角色数据并一次计算评分，没有数据的用户不出现在结果中"""
+        rosters = await asyncio.gather(*(self._load_roster(user_id) for user_id in user_ids))
+        return self.score_rosters({
+            user_id: roster for user_id, roster in zip(user_ids, rosters) if roster
+        })
+    
     async def calculate_role_scores(
         self, 
         user_id: str
@@ -54,123 +118,100 @@ class StatisticsManager:
         Returns:
             Tuple[bool, Optional[List[RoleScore]], str]: (是否成功, 评分列表, 返回消息)
         """
-        logger.info(f"计算用户 {user_id} 的角色评分")
-        
-        role_list = await self.refresh_manager.get_cached_role_list(user_id)
-        
-        if not role_list:
-            return False, None, "❌ 未找到角色数据，请先使用 /刷新面板"
+        success, scores, _, msg = await self.load_role_scores(user_id)
+        return success, scores, msg
+    
+    async def load_role_scores(
+        self,
+        user_id: str
+    ) -> Tuple[bool, Optional[List[RoleScore]], Optional[ScoreSummary], str]:
+        """读取用户所有角色的评分与练度汇总
         
-        scores = []
+        优先读取评分表；评分表不可用、尚未建立或评分权重已变更时，从角色缓存计算并重建评分表。
         
-        for role in role_list:
+        Returns:
+            Tuple[bool, Optional[List[RoleScore]], Optional[ScoreSummary], str]: (是否成功, 按总分降序的评分, 汇总, 返回消息)
+        """
+        store = get_score_store()
+        if store.enabled:
             try:
-                role_detail = await self.refresh_manager.get_cached_role_detail(
-                    user_id, str(role.roleId)
-                )
-                
-                if role_detail:
-                    score = self._calculate_single_role_score(role_detail)
-                    scores.append(score)
+                stored = await store.load(user_id)
             except Exception as e:
-                logger.warning(f"计算角色 {role.roleName} 评分失败: {e}")
-        
-        if not scores:
-            return False, None, "❌ 没有有效的角色数据"
+                logger.warning(f"读取用户 {user_id} 的评分表失败: {e}")
+                stored = None
+            if stored is not None and stored[1]:
+                summary, scored = stored
+                return True, [self._build_role_score(item) for item in scored], summary, ""
         
-        sorted_scores = sorted(scores, key=lambda x: x.total_score, reverse=True)
-        
-        return True, sorted_scores, ""
-    
-    def _calculate_single_role_score(self, role: RoleDetailData) -> RoleScore:
-        """计算单个角色的评分"""
-        r = role.role
+        logger.info(f"计算用户 {user_id} 的角色评分")
         
-        chain_num = role.get_chain_num()
-        weapon_level = role.weaponData.level
+        role_list = await self.refresh_manager.get_cached_role_list(user_id)
         
-        phantom_count = 0
-        if role.phantomData and role.phantomData.equipPhantomList:
-            phantom_count = len([p for p in role.phantomData.equipPhantomList if p])
+        if not role_list:
+            return False, None, None, "❌ 未找到角色数据，请先使用 /刷新面板"
         
-        skill_total = sum(s.level - 1 for s in role.skillList)
+        roster = await self._load_roster(user_id, role_list)
+        scored = self._score_rosters({user_id: roster})[user_id]
         
-        level_score = self._calculate_level_score(role.level, r.breach or 0)
-        chain_score = self._calculate_chain_score(chain_num, r.starLevel)
-        weapon_score = self._calculate_weapon_score(weapon_level, role.weaponData.breach or 0)
-        phantom_score = self._calculate_phantom_score(phantom_count, role.phantomData)
-        skill_score = self._calculate_skill_score(skill_total, len(role.skillList))
+        if not scored:
+            return False, None, None, "❌ 没有有效的角色数据"
         
-        total_score = (
-            level_score * self.weight_config["level"] +
-            chain_score * self.weight_config["chain"] +
-            weapon_score * self.weight_config["weapon"] +
-            phantom_score * self.weight_config["phantom"] +
-            skill_score * self.weight_config["skill"]
-        ) / 100.0
+        if store.enabled:
+            try:
+                await store.replace_user(user_id, scored)
+            except Exception as e:
+                logger.warning(f"写入用户 {user_id} 的评分表失败: {e}")
         
+        return True, [self._build_role_score(item) for item in scored], self._summarize(scored), ""
+    
+    @staticmethod
+    def _summarize(scored: List[ScoredRole]) -> ScoreSummary:
+        tiers = [score_tier(item.scores.total) for item in scored]
+        return ScoreSummary(
+            role_count=len(scored),
+            score_sum=sum(item.scores.total for item in scored),
+            high_count=tiers.count("high"),
+            medium_count=tiers.count("medium"),
+            low_count=tiers.count("low"),
+        )
+    
+    def _build_role_score(self, scored: ScoredRole) -> RoleScore:
+        features, scores = scored.features, scored.scores
         return RoleScore(
-            role_id=r.roleId,
-            role_name=r.roleName,
-            level=role.level,
-            chain_num=chain_num,
-            weapon_level=weapon_level,
-            phantom_count=phantom_count,
-            skill_total=skill_total,
-            total_score=round(total_score, 2),
+            role_id=scored.role_id,
+            role_name=scored.role_name,
+            level=features.level,
+            chain_num=features.chain_num,
+            weapon_level=features.weapon_level,
+            phantom_count=features.phantom_count,
+            skill_total=features.skill_total,
+            total_score=scores.total,
             detail_scores={
-                "level": round(level_score, 2),
-                "chain": round(chain_score, 2),
-                "weapon": round(weapon_score, 2),
-                "phantom": round(phantom_score, 2),
-                "skill": round(skill_score, 2),
+                "level": scores.level,
+                "chain": scores.chain,
+                "weapon": scores.weapon,
+                "phantom": scores.phantom,
+                "skill": scores.skill,
             }
         )
     
+    def _calculate_single_role_score(self, role: RoleDetailData) -> RoleScore:
+        """计算单个角色的评分（也可传入字段相同的 fast_models.FastRoleDetail）"""
+        features = extract_features(role)
+        scores = score_features([features], self.weight_config)[0]
+        return self._build_role_score(ScoredRole(role.role.roleId, role.role.roleName, features, scores))
+    
     def _calculate_level_score(self, level: int, breach: int) -> float:
         """计算等级评分"""
-        max_level = 90
-        level_ratio = min(level / max_level, 1.0)
-        
-        breach_bonus = 0.0
-        if breach >= 6:
-            breach_bonus = 10.0
-        elif breach >= 5:
-            breach_bonus = 7.5
-        elif breach >= 4:
-            breach_bonus = 5.0
-        elif breach >= 3:
-            breach_bonus = 2.5
-        
-        score = level_ratio * 90.0 + breach_bonus
-        return min(score, 100.0)
+        return level_score(level, breach)
     
     def _calculate_chain_score(self, chain_num: int, star_level: int) -> float:
         """计算命座评分"""
-        if star_level < 5:
-            return 0.0
-        
-        max_chain = 6
-        chain_ratio = chain_num / max_chain
-        
-        score = chain_ratio * 100.0
-        return min(score, 100.0)
+        return chain_score(chain_num, star_level)
     
     def _calculate_weapon_score(self, level: int, breach: int) -> float:
         """计算武器评分"""
-        max_level = 90
-        level_ratio = min(level / max_level, 1.0)
-        
-        breach_bonus = 0.0
-        if breach >= 5:
-            breach_bonus = 10.0
-        elif breach >= 4:
-            breach_bonus = 5.0
-        elif breach >= 3:
-            breach_bonus = 2.5
-        
-        score = level_ratio * 90.0 + breach_bonus
-        return min(score, 100.0)
+        return weapon_score(level, breach)
     
     def _calculate_phantom_score(
         self, 
@@ -178,36 +219,16 @@ class StatisticsManager:
         phantom_data: Optional[Any]
     ) -> float:
         """计算声骸评分"""
-        if phantom_count == 0:
-            return 0.0
-        
-        base_score = (phantom_count / 5.0) * 70.0
-        
-        quality_bonus = 0.0
+        avg_quality = 0.0
         if phantom_data and phantom_data.equipPhantomList:
             phantoms = [p for p in phantom_data.equipPhantomList if p]
             if phantoms:
                 avg_quality = sum(p.quality for p in phantoms) / len(phantoms)
-                if avg_quality >= 5:
-                    quality_bonus = 20.0
-                elif avg_quality >= 4:
-                    quality_bonus = 15.0
-                elif avg_quality >= 3:
-                    quality_bonus = 10.0
-        
-        score = base_score + quality_bonus
-        return min(score, 100.0)
+        return phantom_score(phantom_count, avg_quality)
     
     def _calculate_skill_score(self, skill_total: int, skill_count: int) -> float:
         """计算技能评分"""
-        if skill_count == 0:
-            return 0.0
-        
-        avg_level = skill_total / skill_count
-        max_level = 10
-        
-        score = (avg_level / max_level) * 100.0
-        return min(score, 100.0)
+        return skill_score(skill_total, skill_count)
     
     async def get_statistics_text(
         self, 
@@ -249,7 +270,13 @@ class StatisticsManager:
             lines.append(f"...还有 {len(scores) - top_n} 个角色")
         
         lines.append("━━━━━━━━━━━━━━━━━━━━")
-        lines.append("💡 评分基于: 等级(25%) + 命座(20%) + 武器(20%) + 声骸(20%) + 技能(15%)")
+        weights = self.weight_config
+        weight_total = sum(weights.values()) or 1.0
+        weight_text = " + ".join(
+            f"{name}({weights[key] / weight_total * 100:.0f}%)"
+            for key, name in (("level", "等级"), ("chain", "命座"), ("weapon", "武器"), ("phantom", "声骸"), ("skill", "技能"))
+        )
+        lines.append(f"💡 评分基于: {weight_text}")
         lines.append("提示: 使用 /刷新面板 更新数据")
         
         return True, "\n".join(lines)
@@ -266,20 +293,14 @@ class StatisticsManager:
         Returns:
             Tuple[bool, str]: (是否成功, 返回消息)
         """
-        success, scores, msg = await self.calculate_role_scores(user_id)
+        success, scores, summary, msg = await self.load_role_scores(user_id)
         
         if not success:
             return False, msg
         
-        if not scores:
+        if not scores or summary is None:
             return False, "❌ 没有角色数据"
         
-        total_score = sum(s.total_score for s in scores)
-        avg_score = total_score / len(scores)
-        
-        high_score_count = sum(1 for s in scores if s.total_score >= 80.0)
-        medium_score_count = sum(1 for s in scores if 60.0 <= s.total_score < 80.0)
-        low_score_count = sum(1 for s in scores if s.total_score < 60.0)
         
         top_role = scores[0]
         weakest_role = scores[-1]
@@ -287,12 +308,12 @@ class StatisticsManager:
         lines = [
             "【角色练度汇总】",
             f"━━━━━━━━━━━━━━━━━━━━",
-            f"角色总数: {len(scores)}",
-            f"平均评分: {avg_score:.1f}",
+            f"角色总数: {summary.role_count}",
+            f"平均评分: {summary.avg_score:.1f}",
             f"━━━━━━━━━━━━━━━━━━━━",
-            f"🔥 高练度 (80+): {high_score_count} 个",
-            f"⚡ 中练度 (60-79): {medium_score_count} 个",
-            f"💧 低练度 (<60): {low_score_count} 个",
+            f"🔥 高练度 (80+): {summary.high_count} 个",
+            f"⚡ 中练度 (60-79): {summary.medium_count} 个",
+            f"💧 低练度 (<60): {summary.low_count} 个",
             f"━━━━━━━━━━━━━━━━━━━━",
             f"🏆 最强角色: {top_role.role_name} ({top_role.total_score:.1f})",
             f"📈 需提升: {weakest_role.role_name} ({weakest_role.total_score:.1f})",
@@ -301,6 +322,65 @@ class StatisticsManager:
         ]
         
         return True, "\n".join(lines)
+    
+    async def get_group_rank_text(
+        self,
+        group_id: str,
+        user_id: str,
+        role_name: str,
+        top_n: int = 10
+    ) -> Tuple[bool, str]:
+        """获取群内指定角色的练度排行
+        
+        Args:
+            group_id: 群号
+            user_id: 查询者的用户ID
+            role_name: 角色名称
+            top_n: 显示前N名
+        
+        Returns:
+            Tuple[bool, str]: (是否成功, 返回消息)
+        """
+        store = get_score_store()
+        if not store.enabled:
+            return False, "❌ 群排行需要启用评分存储（ENABLE_SCORE_STORE）"
+        
+        role_id = get_role_id_by_name(role_name)
+        if not role_id:
+            return False, f"❌ 未找到角色: {role_name}"
+        
+        # 查询者的评分（评分表尚未建立时会从角色缓存补建）
+        _, scores, _, _ = await self.load_role_scores(user_id)
+        own = next((s for s in scores or [] if s.role_id == role_id), None)
+        
+        top = await store.group_top(group_id, role_id, top_n)
+        if not top:
+            return False, f"❌ 本群暂无 {role_name} 的练度数据，绑定后使用 /刷新面板 即可上榜"
+        
+        display_name = top[0][1].role_name or role_name
+        lines = [
+            f"【本群{display_name}练度排行】",
+            "━━━━━━━━━━━━━━━━━━━━",
+        ]
+        for idx, (member_id, scored) in enumerate(top, 1):
+            rank_emoji = ["🥇", "🥈", "🥉"][idx - 1] if idx <= 3 else f"{idx}."
+            features = scored.features
+            lines.append(f"{rank_emoji} {member_id}  {scored.scores.total:.1f}")
+            lines.append(f"   Lv.{features.level} | {features.chain_num}链 | 武器Lv.{features.weapon_level} | 声骸{features.phantom_count}/5")
+        
+        lines.append("━━━━━━━━━━━━━━━━━━━━")
+        if own is None:
+            lines.append(f"你还没有 {display_name} 的练度数据")
+        else:
+            rank, member_count = await store.group_rank(group_id, role_id, own.total_score)
+            lines.append(f"你的{display_name}: {own.total_score:.1f}，群内第 {rank}/{member_count} 名")
+            percentile = await store.percentile(role_id, own.total_score)
+            if percentile is not None:
+                pct, population = percentile
+                lines.append(f"超过了 {pct:.0f}% 的玩家（共 {population} 人）")
+        lines.append("提示: 使用 /刷新面板 更新数据")
+        
+        return True, "\n".join(lines)
 
 
 _statistics_manager: Optional[StatisticsManager] = None
@@ -0,0 +1,72 @@
+"""add bind composite indexes
+
+迁移 ID: 69bda1e70be4
+父迁移:
+创建时间: 2026-10-17 10:00:00.000000
+
+为绑定表添加 (user_id, game_id, status) 与 (game_uid, game_id) 复合索引。
+旧版本没有迁移脚本，表不存在时在这里按当前结构创建；索引已存在时跳过。
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "69bda1e70be4"
+down_revision: str | Sequence[str] | None = None
+branch_labels: str | Sequence[str] | None = ("nonebot_plugin_wwuid",)
+depends_on: str | Sequence[str] | None = None
+
+TABLE = "nonebot_plugin_wwuid_wutheringwavesbind"
+
+INDEXES = {
+    "ix_wwuid_bind_user_game_status": ["user_id", "game_id", "status"],
+    "ix_wwuid_bind_game_uid_game_id": ["game_uid", "game_id"],
+}
+
+
+def upgrade(name: str = "") -> None:
+    if name:
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABLE):
+        op.create_table(
+            TABLE,
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("user_id", sa.String(length=20), nullable=False),
+            sa.Column("bot_id", sa.String(length=50), nullable=False),
+            sa.Column("game_uid", sa.String(length=50), nullable=False),
+            sa.Column("cookie", sa.String(length=500), nullable=False),
+            sa.Column("did", sa.String(length=50), nullable=False),
+            sa.Column("bat", sa.String(length=200), nullable=False),
+            sa.Column("status", sa.String(length=20), nullable=False),
+            sa.Column("game_id", sa.Integer(), nullable=False),
+            sa.Column("is_login", sa.Boolean(), nullable=False),
+            sa.Column("platform", sa.String(length=50), nullable=False),
+            sa.Column("group_id", sa.String(length=100), nullable=False),
+            sa.Column("create_time", sa.DateTime(), nullable=False),
+            sa.Column("update_time", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id", name=op.f(f"pk_{TABLE}")),
+        )
+        existing = set()
+    else:
+        existing = {index["name"] for index in inspector.get_indexes(TABLE)}
+
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        if f"ix_{TABLE}_user_id" not in existing:
+            batch_op.create_index(batch_op.f(f"ix_{TABLE}_user_id"), ["user_id"], unique=False)
+        for index_name, columns in INDEXES.items():
+            if index_name not in existing:
+                batch_op.create_index(index_name, columns, unique=False)
+
+
+def downgrade(name: str = "") -> None:
+    if name:
+        return
+
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        for index_name in INDEXES:
+            batch_op.drop_index(index_name)
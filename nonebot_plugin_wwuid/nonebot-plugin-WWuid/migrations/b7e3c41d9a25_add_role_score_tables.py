@@ -0,0 +1,72 @@
+"""add role score tables
+
+迁移 ID: b7e3c41d9a25
+父迁移: 69bda1e70be4
+创建时间: 2026-10-17 12:00:00.000000
+
+新增角色评分表与用户练度汇总表。
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "b7e3c41d9a25"
+down_revision: str | Sequence[str] | None = "69bda1e70be4"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+SCORE_TABLE = "nonebot_plugin_wwuid_wavesrolescore"
+SUMMARY_TABLE = "nonebot_plugin_wwuid_wavesscoresummary"
+
+
+def upgrade(name: str = "") -> None:
+    if name:
+        return
+
+    op.create_table(
+        SCORE_TABLE,
+        sa.Column("user_id", sa.String(length=20), nullable=False),
+        sa.Column("role_id", sa.Integer(), nullable=False),
+        sa.Column("role_name", sa.String(length=50), nullable=False),
+        sa.Column("level", sa.Integer(), nullable=False),
+        sa.Column("chain_num", sa.Integer(), nullable=False),
+        sa.Column("weapon_level", sa.Integer(), nullable=False),
+        sa.Column("phantom_count", sa.Integer(), nullable=False),
+        sa.Column("skill_total", sa.Integer(), nullable=False),
+        sa.Column("total_score", sa.Float(), nullable=False),
+        sa.Column("level_score", sa.Float(), nullable=False),
+        sa.Column("chain_score", sa.Float(), nullable=False),
+        sa.Column("weapon_score", sa.Float(), nullable=False),
+        sa.Column("phantom_score", sa.Float(), nullable=False),
+        sa.Column("skill_score", sa.Float(), nullable=False),
+        sa.Column("update_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "role_id", name=op.f(f"pk_{SCORE_TABLE}")),
+    )
+    with op.batch_alter_table(SCORE_TABLE, schema=None) as batch_op:
+        batch_op.create_index("ix_wwuid_role_score_user_total", ["user_id", "total_score"], unique=False)
+
+    op.create_table(
+        SUMMARY_TABLE,
+        sa.Column("user_id", sa.String(length=20), nullable=False),
+        sa.Column("weights_key", sa.String(length=100), nullable=False),
+        sa.Column("role_count", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.Float(), nullable=False),
+        sa.Column("high_count", sa.Integer(), nullable=False),
+        sa.Column("medium_count", sa.Integer(), nullable=False),
+        sa.Column("low_count", sa.Integer(), nullable=False),
+        sa.Column("update_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", name=op.f(f"pk_{SUMMARY_TABLE}")),
+    )
+
+
+def downgrade(name: str = "") -> None:
+    if name:
+        return
+
+    op.drop_table(SUMMARY_TABLE)
+    with op.batch_alter_table(SCORE_TABLE, schema=None) as batch_op:
+        batch_op.drop_index("ix_wwuid_role_score_user_total")
+    op.drop_table(SCORE_TABLE)
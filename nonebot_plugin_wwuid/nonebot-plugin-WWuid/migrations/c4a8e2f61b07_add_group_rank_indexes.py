@@ -0,0 +1,54 @@
+"""add group rank indexes
+
+迁移 ID: c4a8e2f61b07
+父迁移: b7e3c41d9a25
+创建时间: 2026-10-17 14:00:00.000000
+
+为群排行添加评分表 (role_id, total_score) 与绑定表 (group_id, user_id) 索引，
+新增角色总分分布表（已有评分由插件启动时补建分布）。
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "c4a8e2f61b07"
+down_revision: str | Sequence[str] | None = "b7e3c41d9a25"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BIND_TABLE = "nonebot_plugin_wwuid_wutheringwavesbind"
+SCORE_TABLE = "nonebot_plugin_wwuid_wavesrolescore"
+HISTOGRAM_TABLE = "nonebot_plugin_wwuid_wavesscorehistogram"
+
+
+def upgrade(name: str = "") -> None:
+    if name:
+        return
+
+    with op.batch_alter_table(SCORE_TABLE, schema=None) as batch_op:
+        batch_op.create_index("ix_wwuid_role_score_role_total", ["role_id", "total_score"], unique=False)
+
+    with op.batch_alter_table(BIND_TABLE, schema=None) as batch_op:
+        batch_op.create_index("ix_wwuid_bind_group_user", ["group_id", "user_id"], unique=False)
+
+    op.create_table(
+        HISTOGRAM_TABLE,
+        sa.Column("role_id", sa.Integer(), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("role_id", "bucket", name=op.f(f"pk_{HISTOGRAM_TABLE}")),
+    )
+
+
+def downgrade(name: str = "") -> None:
+    if name:
+        return
+
+    op.drop_table(HISTOGRAM_TABLE)
+    with op.batch_alter_table(BIND_TABLE, schema=None) as batch_op:
+        batch_op.drop_index("ix_wwuid_bind_group_user")
+    with op.batch_alter_table(SCORE_TABLE, schema=None) as batch_op:
+        batch_op.drop_index("ix_wwuid_role_score_role_total")
@@ -3,9 +3,14 @@
 鸣潮插件配置管理
 """
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
-from nonebot import get_driver
+
+try:
+    from nonebot import get_driver
+except ImportError:
+    # 脱离NoneBot直接运行脚本时使用默认配置
+    get_driver = None
 
 
 class WavesConfig(BaseModel):
@@ -28,7 +33,182 @@ class WavesConfig(BaseModel):
     
     MAX_REFRESH_INTERVAL: int = Field(
         default=300,
-        description="刷新间隔限制（秒）"
+        description="两次刷新全部角色之间的最短间隔（秒），0为不限制"
+    )
+    
+    REFRESH_CONCURRENCY: int = Field(
+        default=5,
+        description="刷新面板时并发获取角色详情的最大数量（1为逐个获取）"
+    )
+    
+    REFRESH_RATE_LIMIT: float = Field(
+        default=5.0,
+        description="获取角色详情的请求速率（次/秒），0为不限速"
+    )
+    
+    REFRESH_BURST: int = Field(
+        default=5,
+        description="角色详情请求令牌桶容量（允许的突发请求数）"
+    )
+    
+    REFRESH_INCREMENTAL: bool = Field(
+        default=True,
+        description="刷新面板时只重新获取练度摘要有变化的角色（/刷新面板 强制 可获取全部）"
+    )
+    
+    REFRESH_FULL_INTERVAL_HOURS: int = Field(
+        default=24,
+        description="增量刷新时，详情超过该时长（小时）的角色仍会重新获取，0为不限制"
+    )
+    
+    BAT_EXPIRE_MINUTES: int = Field(
+        default=1440,
+        description="访问令牌(bat)的有效期（分钟），超过后重新获取"
+    )
+    
+    BAT_REFRESH_MARGIN_MINUTES: int = Field(
+        default=30,
+        description="访问令牌剩余有效期少于该时长（分钟）时提前重新获取"
+    )
+    
+    REFRESH_BUDGET_PER_MINUTE: int = Field(
+        default=120,
+        description="所有账号共享的每分钟上游请求预算，0为不限制"
+    )
+    
+    REFRESH_WORKERS: int = Field(
+        default=2,
+        description="刷新队列的工作协程数量"
+    )
+    
+    REFRESH_QUEUE_LIMIT: int = Field(
+        default=200,
+        description="刷新队列中后台任务的数量上限（命令触发的刷新不受限制）"
+    )
+    
+    REFRESH_WAIT_TIMEOUT: int = Field(
+        default=60,
+        description="刷新面板命令等待刷新结果的最长时间（秒），超时后刷新在后台继续"
+    )
+    
+    ENABLE_BACKGROUND_REFRESH: bool = Field(
+        default=False,
+        description="是否定时在后台刷新活跃用户及过期的面板数据"
+    )
+    
+    BACKGROUND_REFRESH_INTERVAL_MINUTES: int = Field(
+        default=30,
+        description="后台刷新扫描间隔（分钟）"
+    )
+    
+    REFRESH_ACTIVE_WINDOW_MINUTES: int = Field(
+        default=120,
+        description="最近该时长（分钟）内发过言的绑定用户视为活跃用户，缓存过期后优先刷新"
+    )
+    
+    REFRESH_STALE_HOURS: int = Field(
+        default=24,
+        description="非活跃用户的面板数据超过该时长（小时）后在后台刷新，0为不刷新"
+    )
+    
+    API_MAX_RETRIES: int = Field(
+        default=2,
+        description="查询类接口遇到超时、网络错误或5xx时的最大重试次数（refreshData等接口不重试）"
+    )
+    
+    API_RETRY_BASE_DELAY: float = Field(
+        default=0.5,
+        description="重试退避的初始时长（秒），每次重试翻倍并加入随机抖动"
+    )
+    
+    API_BREAKER_FAILURE_THRESHOLD: int = Field(
+        default=5,
+        description="接口连续失败该次数后熔断，熔断期间直接返回错误"
+    )
+    
+    API_BREAKER_RESET_SECONDS: int = Field(
+        default=30,
+        description="接口熔断持续时间（秒），之后放行一个探测请求"
+    )
+    
+    JSON_BACKEND: str = Field(
+        default="auto",
+        description="JSON编解码实现: auto（orjson > msgspec > json）/ orjson / msgspec / json"
+    )
+    
+    DEV_CODE: str = Field(
+        default="",
+        description="固定使用的devCode，留空则根据本机IP自动生成"
+    )
+    
+    LOCAL_IP: str = Field(
+        default="",
+        description="生成devCode使用的本机IP，留空则自动探测"
+    )
+    
+    DEVICE_IP_REFRESH_SECONDS: int = Field(
+        default=600,
+        description="自动探测的本机IP重新探测间隔（秒）"
+    )
+    
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = Field(
+        default=20,
+        description="每个上游主机的最大连接数"
+    )
+    
+    HTTP_MAX_CONNECTIONS: int = Field(
+        default=64,
+        description="所有上游主机合计的最大并发连接数（超出时排队，0为不限制）"
+    )
+    
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        default=10,
+        description="每个上游主机保持的空闲长连接数"
+    )
+    
+    HTTP_KEEPALIVE_EXPIRY: float = Field(
+        default=30.0,
+        description="空闲长连接保持时间（秒）"
+    )
+    
+    HTTP_CONNECT_TIMEOUT: float = Field(
+        default=10.0,
+        description="建立连接超时时间（秒）"
+    )
+    
+    HTTP_READ_TIMEOUT: float = Field(
+        default=30.0,
+        description="读写超时时间（秒）"
+    )
+    
+    HTTP_POOL_TIMEOUT: float = Field(
+        default=30.0,
+        description="等待连接池空闲连接的超时时间（秒）"
+    )
+    
+    HTTP2_ENABLED: bool = Field(
+        default=False,
+        description="是否启用HTTP/2（需安装 httpx[http2]）"
+    )
+    
+    CACHE_IO_WORKERS: int = Field(
+        default=4,
+        description="缓存文件读写线程池大小"
+    )
+    
+    CACHE_BACKEND: str = Field(
+        default="json",
+        description="角色缓存存储后端: json（每个角色一个文件）或 sqlite（单文件数据库）"
+    )
+    
+    CACHE_SQLITE_PATH: str = Field(
+        default="",
+        description="SQLite缓存数据库路径，留空则为 data/waves_cache/waves_cache.db"
+    )
+    
+    ROLE_DETAIL_CACHE_SIZE: int = Field(
+        default=512,
+        description="内存中缓存的已解析角色详情数量上限（有效期同CACHE_EXPIRE_MINUTES）"
     )
     
     ENABLE_IMAGE_RENDER: bool = Field(
@@ -46,11 +226,56 @@ class WavesConfig(BaseModel):
         description="图片高度"
     )
     
+    RENDER_WORKERS: int = Field(
+        default=0,
+        description="渲染角色卡片的工作进程数，0为按CPU核数自动选择（最多4）"
+    )
+    
+    RENDER_QUEUE_LIMIT: int = Field(
+        default=8,
+        description="渲染排队上限，超出后直接回复稍后再试"
+    )
+    
+    RENDER_USE_PROCESS: bool = Field(
+        default=True,
+        description="是否在独立进程中渲染（关闭则使用线程池）"
+    )
+    
+    FONT_PRELOAD_SIZES: List[int] = Field(
+        default=[12, 14, 16, 18, 20, 24, 28, 30, 36],
+        description="启动后在后台预加载的主字体字号，其余字号在首次使用时加载"
+    )
+    
+    BASE_CANVAS_CACHE_SIZE: int = Field(
+        default=2,
+        description="每个渲染进程缓存的预合成底图数量（每张约9MB）"
+    )
+    
+    ICON_PREFETCH_CONCURRENCY: int = Field(
+        default=8,
+        description="渲染前下载图标的最大并发数（所有查询共用）"
+    )
+    
+    RENDER_CACHE_MEMORY_MB: int = Field(
+        default=64,
+        description="内存中缓存的已渲染卡片总大小上限（MB），0为不在内存缓存"
+    )
+    
+    RENDER_CACHE_DISK_MB: int = Field(
+        default=512,
+        description="磁盘上缓存的已渲染卡片总大小上限（MB），0为不写磁盘"
+    )
+    
     STATISTICS_TOP_N: int = Field(
         default=10,
         description="统计排行榜显示前N名"
     )
     
+    GROUP_RANK_TOP_N: int = Field(
+        default=10,
+        description="群排行显示前N名"
+    )
+    
     SCORE_WEIGHT_LEVEL: float = Field(
         default=25.0,
         description="等级评分权重"
@@ -76,6 +301,21 @@ class WavesConfig(BaseModel):
         description="技能评分权重"
     )
     
+    ENABLE_SCORE_STORE: bool = Field(
+        default=True,
+        description="将角色评分保存到数据库并随角色缓存更新，练度统计直接读取（修改评分权重后自动重建）"
+    )
+    
+    SCORE_TEMPLATE_DIR: str = Field(
+        default="",
+        description="自定义声骸评分模板目录（JSON/TOML），与内置模板合并且优先，留空只使用内置模板"
+    )
+    
+    SCORE_TEMPLATE_RELOAD_SECONDS: float = Field(
+        default=5.0,
+        description="检查评分模板文件是否修改的间隔（秒），修改后无需重启即可生效"
+    )
+    
     ENABLE_AUTO_DELETE_INVALID: bool = Field(
         default=True,
         description="是否启用自动删除无效CK"
@@ -90,6 +330,16 @@ class WavesConfig(BaseModel):
         default=30,
         description="自动删除无效CK的分钟（0-59）"
     )
+    
+    BIND_CACHE_TTL_SECONDS: int = Field(
+        default=60,
+        description="用户绑定信息在内存中的缓存时间（秒），添加或删除绑定时立即失效，0为不缓存"
+    )
+    
+    BIND_CLEANUP_CHUNK_SIZE: int = Field(
+        default=500,
+        description="删除无效CK时每批删除的记录数（每批单独提交），0为一次删除"
+    )
 
 
 _config: Optional[WavesConfig] = None
@@ -107,6 +357,12 @@ def get_config() -> WavesConfig:
     return _config
 
 
+def set_config(config: WavesConfig) -> None:
+    """直接指定配置实例（渲染子进程中没有 NoneBot 驱动，使用主进程传入的配置）"""
+    global _config
+    _config = config
+
+
 def get_cache_dir() -> Path:
     """获取缓存目录"""
     cache_dir = Path.cwd() / "data" / "waves_cache"
@@ -6,12 +6,18 @@
 WAVES_CODE_101 = 101
 WAVES_CODE_102 = 102
 WAVES_CODE_103 = 103
+WAVES_CODE_104 = 104
 WAVES_CODE_999 = 999
 
+# 令牌失效或需要重新登录时接口返回的代码与提示
+WAVES_AUTH_FAILED_CODES = {220, 401, 403}
+WAVES_AUTH_FAILED_KEYWORDS = ("重新登录", "登录已过期", "token失效", "令牌失效")
+
 ERROR_MESSAGES = {
     WAVES_CODE_101: "库街区暂未查询到角色数据",
     WAVES_CODE_102: "未绑定游戏账号或CK已失效，请使用 /添加ck 重新绑定",
     WAVES_CODE_103: "未找到角色信息，请先使用 /刷新面板 进行刷新",
+    WAVES_CODE_104: "当前查询面板的人较多，请稍后再试",
     WAVES_CODE_999: "网络请求失败，请稍后重试",
 }
 
@@ -23,3 +29,10 @@ def error_reply(code: int = 0, msg: str = "") -> str:
     
     error_msg = ERROR_MESSAGES.get(code, f"未知错误 (代码: {code})")
     return f"❌ {error_msg}"
+
+
+def is_auth_failure(code: int, message: str = "") -> bool:
+    """接口响应是否表示鉴权失败"""
+    if code in WAVES_AUTH_FAILED_CODES:
+        return True
+    return bool(message) and any(keyword in message for keyword in WAVES_AUTH_FAILED_KEYWORDS)
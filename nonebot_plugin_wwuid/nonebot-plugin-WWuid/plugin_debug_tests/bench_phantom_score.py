@@ -0,0 +1,139 @@
+# coding=utf-8
+"""
+声骸评分微基准
+对比逐词条解析的旧实现与编译评分表（calc_phantom_score / calc_phantom_scores / calc_roster_phantom_scores），
+并检查两者结果一致。只加载 utils/calculate.py，不需要安装 nonebot 等依赖。
+
+用法: python plugin_debug_tests/bench_phantom_score.py [角色数量]
+"""
+import importlib.util
+import json
+import sys
+import timeit
+from pathlib import Path
+
+current_path = Path(__file__).parent
+plugin_root = current_path.parent
+
+spec = importlib.util.spec_from_file_location("calculate", plugin_root / "utils" / "calculate.py")
+calculate = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(calculate)
+
+
+def legacy_calc_phantom_score(role_id, main_props, sub_props, cost, template=None):
+    """编译评分表之前的实现（逐词条解析数值、查权重、判断词条类型）"""
+    if template is None:
+        template = calculate.CHARACTER_TEMPLATES["default_dps"]
+    total_score = 0
+    for prop in main_props:
+        prop_name = prop.get("attributeName", "")
+        calculate.parse_prop_value(prop.get("attributeValue", "0"))
+        weight = calculate.get_prop_weight(prop_name, cost, is_main_prop=True)
+        if weight > 0:
+            total_score += 10 * weight * template.get(prop_name, 0.5)
+    for prop in sub_props:
+        prop_name = prop.get("attributeName", "")
+        prop_value = calculate.parse_prop_value(prop.get("attributeValue", "0"))
+        weight = calculate.get_prop_weight(prop_name, cost, is_main_prop=False)
+        if weight > 0:
+            template_weight = template.get(prop_name, 0.5)
+            if "暴击" in prop_name:
+                max_value = 10.5 if "伤害" in prop_name else 21.0
+                score = (prop_value / max_value) * 30 * weight * template_weight
+            elif "攻击%" in prop_name:
+                score = (prop_value / 30.0) * 25 * weight * template_weight
+            else:
+                score = 10 * weight * template_weight
+            total_score += score
+    grade, color = calculate.get_grade_by_score(total_score)
+    return calculate.PhantomScore(round(total_score, 2), round(total_score, 2), grade, color)
+
+
+class _Obj:
+    """把字典包装成属性访问，模拟 pydantic 模型"""
+
+    def __init__(self, data):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                value = _Obj(value)
+            elif isinstance(value, list):
+                value = [_Obj(v) if isinstance(v, dict) else v for v in value]
+            setattr(self, key, value)
+
+
+def load_phantoms():
+    data = json.loads((current_path / "last_role_detail.json").read_text(encoding="utf-8"))
+    phantoms = [p for p in data["phantomData"]["equipPhantomList"] if p]
+    # 追加覆盖全部评分分支的样例
+    phantoms.append({
+        "cost": 4,
+        "mainProps": [{"attributeName": "暴击伤害", "attributeValue": "44.0%"}],
+        "subProps": [
+            {"attributeName": "暴击", "attributeValue": "10.5%"},
+            {"attributeName": "暴击伤害", "attributeValue": "21.0%"},
+            {"attributeName": "攻击%", "attributeValue": "11.6%"},
+            {"attributeName": "共鸣效率", "attributeValue": "12.4%"},
+            {"attributeName": "攻击", "attributeValue": "50"},
+        ],
+    })
+    return data, phantoms
+
+
+def main():
+    roster_size = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    data, phantoms = load_phantoms()
+    role_id = data["role"]["roleId"]
+
+    # 一致性检查固定使用旧实现的默认DPS模板（新实现默认按角色取模板）
+    template = calculate.CHARACTER_TEMPLATES["default_dps"]
+    for phantom in phantoms:
+        expected = legacy_calc_phantom_score(role_id, phantom["mainProps"], phantom["subProps"], phantom["cost"])
+        actual = calculate.calc_phantom_score(
+            role_id, phantom["mainProps"], phantom["subProps"], phantom["cost"], template
+        )
+        assert abs(expected.score - actual.score) <= 0.01, (expected, actual)
+    batch = calculate.calc_phantom_scores(role_id, [_Obj(p) for p in phantoms], template)
+    assert [s.score for s in batch] == [
+        calculate.calc_phantom_score(role_id, p["mainProps"], p["subProps"], p["cost"], template).score
+        for p in phantoms
+    ]
+    print(f"结果一致（{len(phantoms)} 个声骸）")
+
+    def run_legacy():
+        for p in phantoms:
+            legacy_calc_phantom_score(role_id, p["mainProps"], p["subProps"], p["cost"])
+
+    def run_compiled():
+        for p in phantoms:
+            calculate.calc_phantom_score(role_id, p["mainProps"], p["subProps"], p["cost"])
+
+    def run_batch():
+        calculate.calc_phantom_scores(role_id, phantoms)
+
+    # 旧实现只支持字典，整组对比时旧实现读字典、批量接口读模型对象
+    role_dicts = [data] * roster_size
+    roles = [_Obj(data)] * roster_size
+
+    def run_roster_legacy():
+        for role in role_dicts:
+            for p in role["phantomData"]["equipPhantomList"]:
+                if p:
+                    legacy_calc_phantom_score(role_id, p["mainProps"] or [], p["subProps"] or [], p["cost"])
+
+    def run_roster():
+        calculate.calc_roster_phantom_scores(roles)
+
+    number = 2000
+    roster_number = max(number // roster_size, 1)
+    cases = [
+        ("逐个声骸调用", run_legacy, run_compiled, number),
+        ("一个角色的全部声骸", run_legacy, run_batch, number),
+        (f"{roster_size}个角色", run_roster_legacy, run_roster, roster_number),
+    ]
+    for label, legacy, compiled, count in cases:
+        legacy_us = min(timeit.repeat(legacy, number=count, repeat=5)) / count * 1e6
+        compiled_us = min(timeit.repeat(compiled, number=count, repeat=5)) / count * 1e6
+        print(f"{label}: 旧实现 {legacy_us:.1f} µs，编译评分表 {compiled_us:.1f} µs，加速 {legacy_us / compiled_us:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ from .resource_mgr import (
     CACHE_PATH,
 )
 from .downloader import ResourceDownloader, get_downloader
+from .http_client import HttpClientRegistry, get_http_registry, close_http_clients
 
 __all__ = [
     # 通用工具
@@ -31,4 +32,8 @@ __all__ = [
     # 下载器
     "ResourceDownloader",
     "get_downloader",
+    # HTTP连接池
+    "HttpClientRegistry",
+    "get_http_registry",
+    "close_http_clients",
 ]
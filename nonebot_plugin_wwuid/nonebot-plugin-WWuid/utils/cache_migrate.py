@@ -0,0 +1,82 @@
+# coding=utf-8
+"""
+JSON缓存迁移到SQLite
+
+用法（在插件目录下执行）:
+    python -m utils.cache_migrate [--cache-dir data/waves_cache] [--db data/waves_cache/waves_cache.db]
+
+迁移完成后将配置 CACHE_BACKEND 改为 sqlite 即可，原JSON文件不会被删除。
+"""
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import codec
+from .cache_store import SqliteCacheStore, dump_record
+
+
+def _parse_name(path: Path) -> Tuple[str, Optional[str]]:
+    """从文件名解析 (user_id, role_id)，用户缓存的 role_id 为None"""
+    user_id, sep, role_id = path.stem.partition("_")
+    return user_id, (role_id if sep else None)
+
+
+def migrate_json_cache(cache_dir: Path, db_path: Path, batch_size: int = 500) -> Dict[str, int]:
+    """把 cache_dir 下的JSON缓存批量写入SQLite数据库
+
+    Returns:
+        Dict[str, int]: 迁移的用户缓存数、角色缓存数与失败数
+    """
+    store = SqliteCacheStore(db_path, max_workers=1)
+    role_rows: List[Tuple[str, str, str, str]] = []
+    user_rows: List[Tuple[str, str, str]] = []
+    stats = {"users": 0, "roles": 0, "failed": 0}
+
+    for path in sorted(cache_dir.glob("*.json")):
+        try:
+            with open(path, "rb") as f:
+                record: Dict[str, Any] = codec.loads(f.read())
+            file_user_id, file_role_id = _parse_name(path)
+            user_id = str(record.get("user_id") or file_user_id)
+            role_id = record.get("role_id") or file_role_id
+            row_data = dump_record(record["data"])
+            update_time = record["update_time"]
+        except Exception as e:
+            print(f"跳过 {path.name}: {e}")
+            stats["failed"] += 1
+            continue
+
+        if role_id is None:
+            user_rows.append((user_id, update_time, row_data))
+        else:
+            role_rows.append((user_id, str(role_id), update_time, row_data))
+
+        if len(role_rows) >= batch_size:
+            stats["roles"] += store.store_roles_many(role_rows)
+            role_rows = []
+        if len(user_rows) >= batch_size:
+            stats["users"] += store.store_users_many(user_rows)
+            user_rows = []
+
+    if role_rows:
+        stats["roles"] += store.store_roles_many(role_rows)
+    if user_rows:
+        stats["users"] += store.store_users_many(user_rows)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="将鸣潮JSON缓存迁移到SQLite")
+    parser.add_argument("--cache-dir", default=str(Path.cwd() / "data" / "waves_cache"), help="JSON缓存目录")
+    parser.add_argument("--db", default="", help="SQLite数据库路径，默认为缓存目录下的 waves_cache.db")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批写入的记录数")
+    args = parser.parse_args()
+
+    cache_dir = Path(args.cache_dir)
+    db_path = Path(args.db) if args.db else cache_dir / "waves_cache.db"
+    stats = migrate_json_cache(cache_dir, db_path, args.batch_size)
+    print(f"迁移完成: 用户缓存 {stats['users']} 条, 角色缓存 {stats['roles']} 条, 失败 {stats['failed']} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# coding=utf-8
+"""
+角色缓存存储后端
+所有磁盘读写都在独立的有界线程池中执行，不阻塞事件循环
+
+- json:   每个 (用户, 角色) 一个JSON文件
+- sqlite: 单个SQLite数据库文件（WAL模式），适合绑定用户较多的实例
+"""
+import asyncio
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+from . import codec
+
+
+def dump_record(record: Dict[str, Any]) -> str:
+    """紧凑序列化缓存记录（不缩进、不转义中文）"""
+    return codec.dumps_str(record)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """先写临时文件再重命名，保证读者不会读到写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class CacheStore:
+    """缓存存储后端基类
+
+    记录格式统一为 {"user_id", "role_id", "update_time", "data"}（用户缓存没有 role_id）。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="waves-cache-io",
+        )
+
+    async def run_io(self, func: Callable, *args: Any) -> Any:
+        """在缓存I/O线程池中执行（其他磁盘缓存也复用这个线程池）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def save_user(self, user_id: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def clear_user(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    def role_version(self, user_id: str, role_id: str) -> Any:
+        """角色缓存的版本标识，供内存缓存判断外部是否修改过数据"""
+        raise NotImplementedError
+
+    async def load_role(self, user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def load_user_roles(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """一次读取用户的全部角色缓存记录，返回 role_id -> 记录"""
+        raise NotImplementedError
+
+    async def load_user_role_payloads(self, user_id: str) -> Dict[str, bytes]:
+        """一次读取用户全部角色缓存记录的原始JSON字节（不解析），返回 role_id -> 字节
+
+        字节内容是包含 "data" 字段的记录对象，供调用方直接解码为目标类型。
+        """
+        raise NotImplementedError
+
+    async def save_role(self, user_id: str, role_id: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def clear_role(self, user_id: str, role_id: str) -> None:
+        raise NotImplementedError
+
+
+class JsonCacheStore(CacheStore):
+    """JSON文件缓存后端
+
+    每个用户一个 {user_id}.json，每个角色一个 {user_id}_{role_id}.json。
+    """
+
+    def __init__(self, cache_dir: Path, max_workers: int = 4):
+        super().__init__(max_workers)
+        self.cache_dir = cache_dir
+
+    def user_file(self, user_id: str) -> Path:
+        return self.cache_dir / f"{user_id}.json"
+
+    def role_file(self, user_id: str, role_id: str) -> Path:
+        return self.cache_dir / f"{user_id}_{role_id}.json"
+
+    @staticmethod
+    def _read_record(path: Path) -> Optional[Dict[str, Any]]:
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            return codec.loads(f.read())
+
+    @staticmethod
+    def _write_record(path: Path, record: Dict[str, Any]) -> None:
+        atomic_write_bytes(path, codec.dumps(record))
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        if path.exists():
+            path.unlink()
+
+    async def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """读取用户缓存记录（含 update_time 与 data）"""
+        return await self.run_io(self._read_record, self.user_file(user_id))
+
+    async def save_user(self, user_id: str, record: Dict[str, Any]) -> None:
+        await self.run_io(self._write_record, self.user_file(user_id), record)
+
+    async def clear_user(self, user_id: str) -> None:
+        await self.run_io(self._remove, self.user_file(user_id))
+
+    def role_version(self, user_id: str, role_id: str) -> Optional[int]:
+        """角色缓存文件的修改时间（纳秒），文件不存在返回None
+
+        只是一次 stat 调用，直接在事件循环中执行比投递到线程池更快。
+        """
+        try:
+            return os.stat(self.role_file(user_id, role_id)).st_mtime_ns
+        except OSError:
+            return None
+
+    async def load_role(self, user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
+        """读取角色缓存记录（含 update_time 与 data）"""
+        return await self.run_io(self._read_record, self.role_file(user_id, role_id))
+
+    def _read_user_roles(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        prefix = f"{user_id}_"
+        records: Dict[str, Dict[str, Any]] = {}
+        for path in self.cache_dir.glob(f"{prefix}*.json"):
+            role_id = path.stem[len(prefix):]
+            try:
+                record = self._read_record(path)
+            except Exception as e:
+                logger.warning(f"读取角色缓存失败 {path.name}: {e}")
+                continue
+            if record:
+                records[role_id] = record
+        return records
+
+    async def load_user_roles(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        return await self.run_io(self._read_user_roles, user_id)
+
+    def _read_user_role_payloads(self, user_id: str) -> Dict[str, bytes]:
+        prefix = f"{user_id}_"
+        payloads: Dict[str, bytes] = {}
+        for path in self.cache_dir.glob(f"{prefix}*.json"):
+            try:
+                with open(path, "rb") as f:
+                    payloads[path.stem[len(prefix):]] = f.read()
+            except OSError as e:
+                logger.warning(f"读取角色缓存失败 {path.name}: {e}")
+        return payloads
+
+    async def load_user_role_payloads(self, user_id: str) -> Dict[str, bytes]:
+        return await self.run_io(self._read_user_role_payloads, user_id)
+
+    async def save_role(self, user_id: str, role_id: str, record: Dict[str, Any]) -> None:
+        await self.run_io(self._write_record, self.role_file(user_id, role_id), record)
+
+    async def clear_role(self, user_id: str, role_id: str) -> None:
+        await self.run_io(self._remove, self.role_file(user_id, role_id))
+
+
+class SqliteCacheStore(CacheStore):
+    """SQLite缓存后端
+
+    所有缓存保存在一个数据库文件中，启用WAL以便读写并发；
+    每个I/O线程持有自己的连接。
+    """
+
+    def __init__(self, db_path: Path, max_workers: int = 4):
+        super().__init__(max_workers)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    self._create_tables(conn)
+                    self._initialized = True
+        return conn
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection) -> None:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_cache ("
+                " user_id TEXT PRIMARY KEY,"
+                " update_time TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS role_cache ("
+                " user_id TEXT NOT NULL,"
+                " role_id TEXT NOT NULL,"
+                " update_time TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_role_cache_user_role"
+                " ON role_cache (user_id, role_id)"
+            )
+
+    def _fetch_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT update_time, data FROM user_cache WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"user_id": user_id, "update_time": row[0], "data": codec.loads(row[1])}
+
+    def _store_user(self, user_id: str, record: Dict[str, Any]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO user_cache (user_id, update_time, data) VALUES (?, ?, ?)"
+                " ON CONFLICT (user_id) DO UPDATE SET"
+                " update_time = excluded.update_time, data = excluded.data",
+                (user_id, record["update_time"], dump_record(record["data"])),
+            )
+
+    def _delete_user(self, user_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM user_cache WHERE user_id = ?", (user_id,))
+
+    def _fetch_role(self, user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT update_time, data FROM role_cache WHERE user_id = ? AND role_id = ?",
+            (user_id, role_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"user_id": user_id, "role_id": role_id, "update_time": row[0], "data": codec.loads(row[1])}
+
+    def _fetch_user_roles(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT role_id, update_time, data FROM role_cache WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        return {
+            role_id: {"user_id": user_id, "role_id": role_id, "update_time": update_time, "data": codec.loads(data)}
+            for role_id, update_time, data in rows
+        }
+
+    def _fetch_user_role_payloads(self, user_id: str) -> Dict[str, bytes]:
+        rows = self._connect().execute(
+            "SELECT role_id, data FROM role_cache WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        # 只拼接外层对象，data 保持原样不解析
+        return {
+            role_id: b'{"data":' + (data if isinstance(data, bytes) else data.encode("utf-8")) + b"}"
+            for role_id, data in rows
+        }
+
+    def store_roles_many(self, rows: Iterable[Tuple[str, str, str, str]]) -> int:
+        """批量写入 (user_id, role_id, update_time, 序列化后的data)，返回写入条数"""
+        rows = list(rows)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO role_cache (user_id, role_id, update_time, data) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (user_id, role_id) DO UPDATE SET"
+                " update_time = excluded.update_time, data = excluded.data",
+                rows,
+            )
+        return len(rows)
+
+    def store_users_many(self, rows: Iterable[Tuple[str, str, str]]) -> int:
+        """批量写入 (user_id, update_time, 序列化后的data)，返回写入条数"""
+        rows = list(rows)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO user_cache (user_id, update_time, data) VALUES (?, ?, ?)"
+                " ON CONFLICT (user_id) DO UPDATE SET"
+                " update_time = excluded.update_time, data = excluded.data",
+                rows,
+            )
+        return len(rows)
+
+    def _store_role(self, user_id: str, role_id: str, record: Dict[str, Any]) -> None:
+        self.store_roles_many([(user_id, role_id, record["update_time"], dump_record(record["data"]))])
+
+    def _delete_role(self, user_id: str, role_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM role_cache WHERE user_id = ? AND role_id = ?", (user_id, role_id))
+
+    async def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_io(self._fetch_user, user_id)
+
+    async def save_user(self, user_id: str, record: Dict[str, Any]) -> None:
+        await self.run_io(self._store_user, user_id, record)
+
+    async def clear_user(self, user_id: str) -> None:
+        await self.run_io(self._delete_user, user_id)
+
+    def role_version(self, user_id: str, role_id: str) -> int:
+        """数据库只由本进程写入，变更已通过缓存回调通知，这里不再单独查询"""
+        return 0
+
+    async def load_role(self, user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_io(self._fetch_role, user_id, role_id)
+
+    async def load_user_roles(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        return await self.run_io(self._fetch_user_roles, user_id)
+
+    async def load_user_role_payloads(self, user_id: str) -> Dict[str, bytes]:
+        return await self.run_io(self._fetch_user_role_payloads, user_id)
+
+    async def save_role(self, user_id: str, role_id: str, record: Dict[str, Any]) -> None:
+        await self.run_io(self._store_role, user_id, role_id, record)
+
+    async def clear_role(self, user_id: str, role_id: str) -> None:
+        await self.run_io(self._delete_role, user_id, role_id)
+
+
+def get_sqlite_path(cache_dir: Path) -> Path:
+    """SQLite缓存数据库路径"""
+    configured = get_config().CACHE_SQLITE_PATH
+    return Path(configured) if configured else cache_dir / "waves_cache.db"
+
+
+_cache_store: Optional[CacheStore] = None
+
+
+def get_cache_store() -> CacheStore:
+    """获取缓存存储实例（由 CACHE_BACKEND 决定后端）"""
+    global _cache_store
+    if _cache_store is None:
+        from .common import get_cache_dir
+        config = get_config()
+        cache_dir = get_cache_dir()
+        if config.CACHE_BACKEND == "sqlite":
+            _cache_store = SqliteCacheStore(get_sqlite_path(cache_dir), config.CACHE_IO_WORKERS)
+        else:
+            if config.CACHE_BACKEND != "json":
+                logger.warning(f"[鸣潮] 未知的缓存后端 {config.CACHE_BACKEND}，使用json")
+            _cache_store = JsonCacheStore(cache_dir, config.CACHE_IO_WORKERS)
+    return _cache_store
@@ -2,10 +2,27 @@
 """
 声骸评分计算模块
 参考原项目XutheringWavesUID的评分算法
+
+评分表在首次使用时编译：词条名映射为整数ID，每个模板按 cost 预先算好主词条得分和
+副词条的 (数值系数, 常数) 表，单个词条的计算只剩一次查表和一次乘加。
+角色模板从 score_templates/ 下的 JSON/TOML 数据文件加载，按角色ID索引，文件修改后自动重新加载。
 """
-from typing import Dict, List, Optional, Tuple
+import json
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
 try:
     from nonebot import logger
 except ImportError:
@@ -144,10 +161,113 @@ def parse_prop_value(value_str: str) -> float:
         return 0
 
 
+# ==================== 编译后的评分表 ====================
+
+# 词条名 -> 整数ID；未知词条统一映射到 UNKNOWN_PROP_ID（所有表中该位置权重为0）
+PROP_NAMES: Tuple[str, ...] = tuple(PHANTOM_WEIGHT_CONFIG)
+PROP_IDS: Dict[str, int] = {name: idx for idx, name in enumerate(PROP_NAMES)}
+UNKNOWN_PROP_ID = len(PROP_NAMES)
+
+# cost -> 主词条权重列（与 get_prop_weight 一致：4、3 之外都按 cost 1 处理）
+_COST_COLUMNS = {4: 0, 3: 1}
+
+
+def _sub_prop_formula(prop_name: str) -> Tuple[float, float]:
+    """副词条得分 = 数值 * 系数 + 常数（未乘权重），与原先的分支判断一致"""
+    # 暴击和暴击伤害按最大值约30分计算
+    if "暴击" in prop_name:
+        max_value = 10.5 if "伤害" in prop_name else 21.0  # 暴击伤害最大10.5%，暴击最大21%
+        return 30 / max_value, 0.0
+    # 百分比攻击按最大值约25分计算
+    if "攻击%" in prop_name:
+        return 25 / 30.0, 0.0  # 攻击%最大30%
+    # 其他词条按固定10分计算
+    return 0.0, 10.0
+
+
+class CompiledTemplate:
+    """按词条ID索引的评分表
+
+    main_points[cost列][prop_id]: 主词条得分
+    sub_coef[prop_id], sub_const[prop_id]: 副词条得分 = 数值 * sub_coef + sub_const
+    """
+    __slots__ = ("main_points", "sub_coef", "sub_const", "sub_needs_value")
+
+    def __init__(self, template: Dict[str, float]):
+        size = UNKNOWN_PROP_ID + 1
+        self.main_points: List[List[float]] = [[0.0] * size for _ in range(3)]
+        self.sub_coef: List[float] = [0.0] * size
+        self.sub_const: List[float] = [0.0] * size
+        for prop_id, prop_name in enumerate(PROP_NAMES):
+            weights = PHANTOM_WEIGHT_CONFIG[prop_name]
+            template_weight = template.get(prop_name, 0.5)
+            for column in range(3):
+                if weights[column] > 0:
+                    # 主词条满分按10分计算
+                    self.main_points[column][prop_id] = 10 * weights[column] * template_weight
+            if weights[3] > 0:
+                coef, const = _sub_prop_formula(prop_name)
+                self.sub_coef[prop_id] = coef * weights[3] * template_weight
+                self.sub_const[prop_id] = const * weights[3] * template_weight
+        # 只有系数非0的词条才需要解析数值
+        self.sub_needs_value: List[bool] = [coef != 0.0 for coef in self.sub_coef]
+
+    def score(self, main_props: Sequence[Any], sub_props: Sequence[Any], cost: int) -> float:
+        """计算一个声骸的原始分数"""
+        main_points = self.main_points[_COST_COLUMNS.get(cost, 2)]
+        sub_coef, sub_const, needs_value = self.sub_coef, self.sub_const, self.sub_needs_value
+        prop_ids = PROP_IDS
+        total = 0.0
+        for name, _ in _iter_props(main_props):
+            total += main_points[prop_ids.get(name, UNKNOWN_PROP_ID)]
+        for name, value in _iter_props(sub_props):
+            prop_id = prop_ids.get(name, UNKNOWN_PROP_ID)
+            if needs_value[prop_id]:
+                total += _cached_prop_value(value) * sub_coef[prop_id]
+            total += sub_const[prop_id]
+        return total
+
+
+def _iter_props(props: Sequence[Any]) -> List[Tuple[str, str]]:
+    """(词条名, 数值字符串) 列表，支持字典和 Props 模型"""
+    if props and isinstance(props[0], dict):
+        return [(p.get("attributeName", ""), p.get("attributeValue", "0")) for p in props]
+    return [(p.attributeName, p.attributeValue) for p in props]
+
+
+# 副词条数值只有有限的几档，解析结果可以长期缓存
+_cached_prop_value = lru_cache(maxsize=4096)(parse_prop_value)
+
+_compiled_templates: Dict[int, Tuple[Dict[str, float], CompiledTemplate]] = {}
+
+
+def compile_template(template: Union[Dict[str, float], CompiledTemplate, None] = None) -> CompiledTemplate:
+    """获取模板对应的评分表（按模板对象缓存，模板字典不应在使用后原地修改）"""
+    if isinstance(template, CompiledTemplate):
+        return template
+    if template is None:
+        # 默认使用DPS模板
+        template = CHARACTER_TEMPLATES["default_dps"]
+    entry = _compiled_templates.get(id(template))
+    if entry is not None and entry[0] is template:
+        return entry[1]
+    if len(_compiled_templates) >= 256:
+        _compiled_templates.clear()
+    compiled = CompiledTemplate(template)
+    _compiled_templates[id(template)] = (template, compiled)
+    return compiled
+
+
+def _make_score(total_score: float) -> PhantomScore:
+    grade, color = get_grade_by_score(total_score)
+    score = round(total_score, 2)
+    return PhantomScore(score=score, total_score=score, grade=grade, color=color)
+
+
 def calc_phantom_score(
     role_id: int,
-    main_props: List[Dict],
-    sub_props: List[Dict],
+    main_props: List[Any],
+    sub_props: List[Any],
     cost: int,
     template: Optional[Dict] = None
 ) -> PhantomScore:
@@ -156,64 +276,75 @@ def calc_phantom_score(
     
     Args:
         role_id: 角色ID
-        main_props: 主词条列表
-        sub_props: 副词条列表
+        main_props: 主词条列表（字典或 Props 模型）
+        sub_props: 副词条列表（字典或 Props 模型）
         cost: 声骸cost值
-        template: 评分模板（可选）
+        template: 评分模板（可选，默认按角色ID取角色模板）
     
     Returns:
         PhantomScore对象
     """
-    if template is None:
-        # 默认使用DPS模板
-        template = CHARACTER_TEMPLATES["default_dps"]
-    
-    total_score = 0
+    compiled = compile_template(template) if template is not None else get_compiled_template(role_id)
+    return _make_score(compiled.score(main_props, sub_props, cost))
+
+
+def calc_phantom_scores(
+    role_id: int,
+    phantoms: Sequence[Any],
+    template: Optional[Dict] = None
+) -> List[Optional[PhantomScore]]:
+    """
+    批量计算一个角色全部声骸的评分
     
-    # 计算主词条分数
-    for prop in main_props:
-        prop_name = prop.get("attributeName", "")
-        prop_value = parse_prop_value(prop.get("attributeValue", "0"))
-        weight = get_prop_weight(prop_name, cost, is_main_prop=True)
-        
-        if weight > 0:
-            # 主词条满分按10分计算
-            template_weight = template.get(prop_name, 0.5)
-            score = 10 * weight * template_weight
-            total_score += score
+    Args:
+        role_id: 角色ID
+        phantoms: 声骸列表（EquipPhantom 模型或含 mainProps/subProps/cost 的字典），可包含空位
+        template: 评分模板（可选，默认按角色ID取角色模板）
     
-    # 计算副词条分数
-    for prop in sub_props:
-        prop_name = prop.get("attributeName", "")
-        prop_value = parse_prop_value(prop.get("attributeValue", "0"))
-        weight = get_prop_weight(prop_name, cost, is_main_prop=False)
-        
-        if weight > 0:
-            # 副词条根据数值和权重计算
-            template_weight = template.get(prop_name, 0.5)
-            # 暴击和暴击伤害按最大值约30分计算
-            if "暴击" in prop_name:
-                max_value = 10.5 if "伤害" in prop_name else 21.0  # 暴击伤害最大10.5%，暴击最大21%
-                score = (prop_value / max_value) * 30 * weight * template_weight
-            # 百分比攻击按最大值约25分计算
-            elif "攻击%" in prop_name:
-                max_value = 30.0  # 攻击%最大30%
-                score = (prop_value / max_value) * 25 * weight * template_weight
-            # 其他词条
-            else:
-                score = 10 * weight * template_weight
-            
-            total_score += score
+    Returns:
+        与 phantoms 一一对应的评分列表，空位为 None
+    """
+    compiled = compile_template(template) if template is not None else get_compiled_template(role_id)
+    results: List[Optional[PhantomScore]] = []
+    for phantom in phantoms:
+        if not phantom:
+            results.append(None)
+            continue
+        if isinstance(phantom, dict):
+            main_props = phantom.get("mainProps") or []
+            sub_props = phantom.get("subProps") or []
+            cost = phantom.get("cost", 0)
+        else:
+            main_props = phantom.mainProps or []
+            sub_props = phantom.subProps or []
+            cost = phantom.cost
+        results.append(_make_score(compiled.score(main_props, sub_props, cost)))
+    return results
+
+
+def calc_roster_phantom_scores(
+    roles: Sequence[Any],
+    templates: Optional[Sequence[Optional[Dict]]] = None
+) -> List[PhantomScore]:
+    """
+    批量计算多个角色的声骸总评分
     
-    # 获取评级
-    grade, color = get_grade_by_score(total_score)
+    Args:
+        roles: 角色详情列表（RoleDetailData 或 fast_models.FastRoleDetail）
+        templates: 与 roles 一一对应的评分模板（可选，默认按角色ID取角色模板）
     
-    return PhantomScore(
-        score=round(total_score, 2),
-        total_score=round(total_score, 2),
-        grade=grade,
-        color=color
-    )
+    Returns:
+        与 roles 一一对应的总评分（见 calc_total_phantom_score）
+    """
+    results = []
+    for idx, role in enumerate(roles):
+        template = templates[idx] if templates is not None else None
+        if template is None:
+            template = get_compiled_template(role.role.roleId, role.role.roleName)
+        phantom_list = (role.phantomData.equipPhantomList or []) if role.phantomData else []
+        scores = calc_phantom_scores(role.role.roleId, phantom_list, template)
+        results.append(calc_total_phantom_score([s for s in scores if s is not None]))
+    return results
 
 
 def calc_total_phantom_score(phantom_scores: List[PhantomScore]) -> PhantomScore:
@@ -242,27 +373,193 @@ def calc_total_phantom_score(phantom_scores: List[PhantomScore]) -> PhantomScore
     )
 
 
+# ==================== 角色评分模板 ====================
+
+TEMPLATE_DATA_DIR = Path(__file__).parent / "score_templates"
+
+
+@dataclass(frozen=True)
+class TemplateEntry:
+    """一个角色（或默认）模板：合并后的权重与编译好的评分表"""
+    name: str
+    weights: Dict[str, float]
+    compiled: CompiledTemplate
+
+
+class _TemplateSnapshot:
+    """一次加载的全部模板（加载后不再修改，整体替换）"""
+    __slots__ = ("default", "by_id", "by_name")
+
+    def __init__(self, default: TemplateEntry, by_id: Dict[int, TemplateEntry], by_name: Dict[str, TemplateEntry]):
+        self.default = default
+        self.by_id = by_id
+        self.by_name = by_name
+
+
+def _read_template_file(path: Path) -> Dict[str, Any]:
+    if path.suffix == ".toml":
+        if tomllib is None:
+            raise ValueError("读取TOML模板需要 Python 3.11+ 或安装 tomli")
+        with path.open("rb") as f:
+            return tomllib.load(f)
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _build_snapshot(files: Sequence[Path]) -> _TemplateSnapshot:
+    """按文件顺序合并模板数据，后面的文件覆盖前面的同名模板与同ID角色"""
+    templates: Dict[str, Dict[str, float]] = {name: dict(weights) for name, weights in CHARACTER_TEMPLATES.items()}
+    roles: Dict[int, Dict[str, Any]] = {}
+    default_name = "default_dps"
+    for path in files:
+        data = _read_template_file(path)
+        default_name = data.get("default", default_name)
+        for name, weights in (data.get("templates") or {}).items():
+            templates[name] = {str(k): float(v) for k, v in weights.items()}
+        for role_id, entry in (data.get("roles") or {}).items():
+            roles[int(role_id)] = entry
+
+    if default_name not in templates:
+        raise ValueError(f"默认模板 {default_name} 不存在")
+
+    shared: Dict[str, TemplateEntry] = {}
+
+    def base_entry(name: str) -> TemplateEntry:
+        if name not in templates:
+            raise ValueError(f"模板 {name} 不存在")
+        if name not in shared:
+            shared[name] = TemplateEntry(name, templates[name], CompiledTemplate(templates[name]))
+        return shared[name]
+
+    try:
+        from .common import ROLE_ID_MAP
+    except ImportError:
+        # 脱离插件单独加载本模块时（如基准测试）不做名称校验
+        ROLE_ID_MAP = {}
+
+    by_id: Dict[int, TemplateEntry] = {}
+    by_name: Dict[str, TemplateEntry] = {}
+    for role_id, entry in roles.items():
+        known_name = ROLE_ID_MAP.get(role_id)
+        if known_name and entry.get("name") and entry["name"] != known_name:
+            logger.warning(f"评分模板角色 {role_id} 的名称 {entry['name']} 与角色表中的 {known_name} 不一致，请检查角色ID")
+        base = base_entry(entry.get("template", default_name))
+        overrides = entry.get("weights")
+        if overrides:
+            weights = {**base.weights, **{str(k): float(v) for k, v in overrides.items()}}
+            template = TemplateEntry(f"{base.name}:{role_id}", weights, CompiledTemplate(weights))
+        else:
+            template = base
+        by_id[role_id] = template
+        if entry.get("name"):
+            by_name[entry["name"]] = template
+
+    return _TemplateSnapshot(base_entry(default_name), by_id, by_name)
+
+
+class TemplateRegistry:
+    """角色评分模板注册表
+
+    按角色ID（其次角色名）O(1) 查找；每隔 check_interval 秒检查一次数据文件的修改时间，
+    有变化时重新加载，加载失败则继续使用旧模板。
+    """
+
+    def __init__(self, directories: Sequence[Path], check_interval: float = 5.0):
+        self.directories = list(directories)
+        self.check_interval = check_interval
+        self._snapshot: Optional[_TemplateSnapshot] = None
+        self._signature: Optional[Tuple] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _files(self) -> List[Path]:
+        files = []
+        for directory in self.directories:
+            if directory.is_dir():
+                files.extend(sorted(
+                    p for p in directory.iterdir() if p.suffix in (".json", ".toml") and p.is_file()
+                ))
+        return files
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self._snapshot is not None and now < self._next_check:
+            return
+        with self._lock:
+            if self._snapshot is not None and now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                files = self._files()
+                signature = tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+                if signature == self._signature and self._snapshot is not None:
+                    return
+                self._snapshot = _build_snapshot(files)
+                if self._signature is not None:
+                    logger.info(f"已重新加载声骸评分模板（{len(files)} 个文件）")
+                self._signature = signature
+            except Exception as e:
+                logger.warning(f"加载声骸评分模板失败: {e}")
+                if self._snapshot is None:
+                    self._snapshot = _build_snapshot([])
+
+    def reload(self) -> None:
+        """立即重新加载"""
+        self._next_check = 0.0
+        self._signature = None
+        self._maybe_reload()
+
+    def get(self, role_id: int, role_name: str = "") -> TemplateEntry:
+        """获取角色模板，未配置的角色使用默认模板"""
+        self._maybe_reload()
+        snapshot = self._snapshot
+        entry = snapshot.by_id.get(role_id)
+        if entry is None and role_name:
+            entry = snapshot.by_name.get(role_name)
+        return entry or snapshot.default
+
+
+_template_registry: Optional[TemplateRegistry] = None
+
+
+def get_template_registry() -> TemplateRegistry:
+    """获取模板注册表（内置模板目录 + SCORE_TEMPLATE_DIR 配置的目录）"""
+    global _template_registry
+    if _template_registry is None:
+        directories = [TEMPLATE_DATA_DIR]
+        check_interval = 5.0
+        try:
+            try:
+                from ..plugin_core.config import get_config
+            except ImportError:
+                from plugin_core.config import get_config
+            config = get_config()
+            if config.SCORE_TEMPLATE_DIR:
+                directories.append(Path(config.SCORE_TEMPLATE_DIR))
+            check_interval = config.SCORE_TEMPLATE_RELOAD_SECONDS
+        except ImportError:
+            # 单独加载本模块（如基准脚本）时只使用内置模板
+            pass
+        _template_registry = TemplateRegistry(directories, check_interval)
+    return _template_registry
+
+
 def get_character_template(role_id: int, role_name: str = "") -> Dict:
     """
     获取角色评分模板
     
     Args:
         role_id: 角色ID
-        role_name: 角色名称
+        role_name: 角色名称（角色ID未配置时按名称查找）
     
     Returns:
         评分模板字典
     """
-    # TODO: 根据角色ID或名称返回对应的评分模板
-    # 目前返回默认DPS模板
-    
-    # 辅助型角色列表
-    support_chars = ["白芷", "维里奈", "守岸人"]
-    
-    if any(name in role_name for name in support_chars):
-        return CHARACTER_TEMPLATES["support"]
-    
-    return CHARACTER_TEMPLATES["default_dps"]
+    return get_template_registry().get(role_id, role_name).weights
+
+
+def get_compiled_template(role_id: int, role_name: str = "") -> CompiledTemplate:
+    """获取角色模板编译后的评分表"""
+    return get_template_registry().get(role_id, role_name).compiled
 
 def expected_damage(attack: float, crit_rate_pct: float, crit_dmg_pct: float, dmg_bonus_pct: float, mult: float = 1.0) -> Dict[str, float]:
     """
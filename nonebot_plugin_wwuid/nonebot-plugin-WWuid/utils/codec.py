@@ -0,0 +1,121 @@
+# coding=utf-8
+"""
+JSON编解码
+优先使用 orjson / msgspec，未安装时回退到标准库 json。
+输出统一为紧凑的UTF-8字节（不缩进、不转义中文）。
+"""
+import json
+from typing import Any, Callable, Dict, Optional, Union
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+JsonInput = Union[bytes, bytearray, memoryview, str]
+
+
+class JsonCodec:
+    """一组 loads/dumps 实现"""
+
+    def __init__(self, name: str, loads: Callable[[JsonInput], Any], dumps: Callable[[Any], bytes]):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def dumps_str(self, obj: Any) -> str:
+        return self.dumps(obj).decode("utf-8")
+
+
+def _orjson_codec() -> JsonCodec:
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=option)
+
+    return JsonCodec("orjson", orjson.loads, dumps)
+
+
+def _msgspec_codec() -> JsonCodec:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=str)
+    decoder = msgspec.json.Decoder()
+    return JsonCodec("msgspec", decoder.decode, encoder.encode)
+
+
+def _stdlib_codec() -> JsonCodec:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    return JsonCodec("json", json.loads, dumps)
+
+
+_BACKENDS: Dict[str, Callable[[], JsonCodec]] = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _stdlib_codec,
+}
+
+_codec: Optional[JsonCodec] = None
+
+
+def _select_codec(preferred: str) -> JsonCodec:
+    if preferred == "auto":
+        candidates = list(_BACKENDS)
+    elif preferred in _BACKENDS:
+        candidates = [preferred, "json"]
+    else:
+        logger.warning(f"未知的JSON_BACKEND: {preferred}，使用自动选择")
+        candidates = list(_BACKENDS)
+
+    for name in candidates:
+        try:
+            return _BACKENDS[name]()
+        except ImportError:
+            if name == preferred:
+                logger.warning(f"JSON_BACKEND={preferred} 未安装，回退到其它实现")
+    return _stdlib_codec()
+
+
+def get_codec() -> JsonCodec:
+    """获取JSON编解码器"""
+    global _codec
+    if _codec is None:
+        _codec = _select_codec(get_config().JSON_BACKEND)
+        logger.debug(f"JSON编解码使用 {_codec.name}")
+    return _codec
+
+
+def loads(data: JsonInput) -> Any:
+    """解析JSON（bytes或str）"""
+    return get_codec().loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为紧凑的UTF-8字节"""
+    return get_codec().dumps(obj)
+
+
+def dumps_str(obj: Any) -> str:
+    """序列化为紧凑的字符串"""
+    return get_codec().dumps_str(obj)
+
+
+def loads_nested(value: Any) -> Any:
+    """解析嵌套在字符串中的JSON（如库洛接口 data 字段），不是JSON时原样返回"""
+    if isinstance(value, str) and value:
+        try:
+            return loads(value)
+        except Exception:
+            # orjson 抛出 ValueError 子类，msgspec 抛出 DecodeError
+            return value
+    return value
@@ -2,12 +2,11 @@
 """
 鸣潮工具函数
 """
-import json
-import os
 import asyncio
+import inspect
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, List, Any, Union
+from typing import Optional, Dict, List, Any, Union, Callable
 
 try:
     from nonebot import logger
@@ -15,6 +14,8 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+from .cache_store import get_cache_store
+
 try:
     from ..wwuid_api.models import Role, RoleDetailData
 except ImportError:
@@ -71,6 +72,29 @@ ROLE_ID_MAP: Dict[int, str] = {v: k for k, v in ROLE_NAME_MAP.items()}
 CACHE_DIR = Path("data/waves_cache")
 
 
+# 角色缓存写入/清除后的回调，用于让派生缓存失效
+# 回调签名: (user_id, role_id, data)，清除缓存时 data 为 None，可以是协程函数
+RoleCacheListener = Callable[[str, str, Optional[Dict[str, Any]]], Any]
+_role_cache_listeners: List[RoleCacheListener] = []
+
+
+def add_role_cache_listener(listener: RoleCacheListener) -> RoleCacheListener:
+    """注册角色缓存变更回调（可作装饰器使用）"""
+    _role_cache_listeners.append(listener)
+    return listener
+
+
+async def _notify_role_cache_changed(user_id: str, role_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """通知所有回调，单个回调出错不影响其他回调"""
+    for listener in list(_role_cache_listeners):
+        try:
+            result = listener(user_id, role_id, data)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"角色缓存变更回调执行失败: {e}")
+
+
 def get_cache_dir() -> Path:
     """获取缓存目录"""
     cache_dir = Path.cwd() / CACHE_DIR
@@ -90,87 +114,86 @@ def get_role_cache_file(user_id: str, role_id: str) -> Path:
     return cache_dir / f"{user_id}_{role_id}.json"
 
 
-def save_user_cache(user_id: str, data: Dict[str, Any]) -> bool:
+async def save_user_cache(user_id: str, data: Dict[str, Any]) -> bool:
     """保存用户缓存数据"""
     try:
-        cache_file = get_user_cache_file(user_id)
         cache_data = {
             "user_id": user_id,
             "update_time": datetime.now().isoformat(),
             "data": data,
         }
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        await get_cache_store().save_user(user_id, cache_data)
         return True
     except Exception as e:
         logger.error(f"保存用户缓存失败: {e}")
         return False
 
 
-def load_user_cache(user_id: str) -> Optional[Dict[str, Any]]:
+async def load_user_cache(user_id: str) -> Optional[Dict[str, Any]]:
     """加载用户缓存数据"""
     try:
-        cache_file = get_user_cache_file(user_id)
-        if not cache_file.exists():
+        cache_data = await get_cache_store().load_user(user_id)
+        if not cache_data:
             return None
         
-        with open(cache_file, "r", encoding="utf-8") as f:
-            cache_data = json.load(f)
-        
         return cache_data.get("data")
     except Exception as e:
         logger.error(f"加载用户缓存失败: {e}")
         return None
 
 
-def save_role_cache(user_id: str, role_id: str, data: Dict[str, Any]) -> bool:
+async def save_role_cache(user_id: str, role_id: str, data: Dict[str, Any]) -> bool:
     """保存角色缓存数据"""
     try:
-        cache_file = get_role_cache_file(user_id, role_id)
         cache_data = {
             "user_id": user_id,
             "role_id": role_id,
             "update_time": datetime.now().isoformat(),
             "data": data,
         }
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+        await get_cache_store().save_role(user_id, role_id, cache_data)
+        await _notify_role_cache_changed(user_id, role_id, data)
         return True
     except Exception as e:
         logger.error(f"保存角色缓存失败: {e}")
         return False
 
 
-def load_role_cache(user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
+async def load_role_cache(user_id: str, role_id: str) -> Optional[Dict[str, Any]]:
     """加载角色缓存数据"""
     try:
-        cache_file = get_role_cache_file(user_id, role_id)
-        if not cache_file.exists():
+        cache_data = await get_cache_store().load_role(user_id, role_id)
+        if not cache_data:
             return None
         
-        with open(cache_file, "r", encoding="utf-8") as f:
-            cache_data = json.load(f)
-        
         return cache_data.get("data")
     except Exception as e:
         logger.error(f"加载角色缓存失败: {e}")
         return None
 
 
-def get_cache_update_time(user_id: str, role_id: Optional[str] = None) -> Optional[datetime]:
+async def load_user_role_caches(user_id: str) -> Dict[str, Dict[str, Any]]:
+    """一次加载用户全部角色缓存数据，返回 role_id -> data"""
+    try:
+        records = await get_cache_store().load_user_roles(user_id)
+        return {role_id: record.get("data") for role_id, record in records.items() if record.get("data")}
+    except Exception as e:
+        logger.error(f"加载角色缓存失败: {e}")
+        return {}
+
+
+async def get_cache_update_time(user_id: str, role_id: Optional[str] = None) -> Optional[datetime]:
     """获取缓存更新时间"""
     try:
+        store = get_cache_store()
         if role_id:
-            cache_file = get_role_cache_file(user_id, role_id)
+            cache_data = await store.load_role(user_id, role_id)
         else:
-            cache_file = get_user_cache_file(user_id)
+            cache_data = await store.load_user(user_id)
         
-        if not cache_file.exists():
+        if not cache_data:
             return None
         
-        with open(cache_file, "r", encoding="utf-8") as f:
-            cache_data = json.load(f)
-        
         update_time = cache_data.get("update_time")
         if update_time:
             return datetime.fromisoformat(update_time)
@@ -180,16 +203,19 @@ def get_cache_update_time(user_id: str, role_id: Optional[str] = None) -> Option
         return None
 
 
-def clear_cache(user_id: str, role_id: Optional[str] = None) -> bool:
-    """清除缓存"""
+async def clear_cache(user_id: str, role_id: Optional[str] = None) -> bool:
+    """清除缓存
+
+    未指定 role_id 时清除该用户的全部缓存（含各角色缓存），并逐个通知回调。
+    """
     try:
-        if role_id:
-            cache_file = get_role_cache_file(user_id, role_id)
-        else:
-            cache_file = get_user_cache_file(user_id)
-        
-        if cache_file.exists():
-            cache_file.unlink()
+        store = get_cache_store()
+        role_ids = [role_id] if role_id else list(await store.load_user_role_payloads(user_id))
+        if not role_id:
+            await store.clear_user(user_id)
+        for rid in role_ids:
+            await store.clear_role(user_id, rid)
+            await _notify_role_cache_changed(user_id, rid, None)
         return True
     except Exception as e:
         logger.error(f"清除缓存失败: {e}")
@@ -11,6 +11,7 @@ from urllib.parse import urlparse
 
 try:
     import httpx
+    from .http_client import get_http_registry
     HTTPX_AVAILABLE = True
 except ImportError:
     HTTPX_AVAILABLE = False
@@ -35,19 +36,14 @@ class ResourceDownloader:
     
     def __init__(self, timeout: int = 30):
         self.timeout = timeout
-        self._client: Optional[httpx.AsyncClient] = None
     
-    async def _get_client(self) -> httpx.AsyncClient:
-        """获取HTTP客户端"""
-        if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(timeout=httpx.Timeout(self.timeout))
-        return self._client
+    def _get_client(self, url: str) -> "httpx.AsyncClient":
+        """获取目标主机的共享HTTP客户端"""
+        return get_http_registry().get_client(url)
     
     async def close(self):
-        """关闭HTTP客户端"""
-        if self._client and not self._client.is_closed:
-            await self._client.aclose()
-            self._client = None
+        """共享连接池在插件关闭时由注册表统一释放，这里无需处理"""
+        return None
     
     def _get_cache_path(self, url: str, cache_dir: Path) -> Path:
         """获取缓存文件路径"""
@@ -89,8 +85,8 @@ class ResourceDownloader:
         
         # 下载图片
         try:
-            client = await self._get_client()
-            response = await client.get(url)
+            client = self._get_client(url)
+            response = await client.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             # 保存到缓存
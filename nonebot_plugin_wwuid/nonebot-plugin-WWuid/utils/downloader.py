@@ -7,7 +7,6 @@ import asyncio
 import hashlib
 from pathlib import Path
 from typing import Optional
-import httpx
 from PIL import Image
 
 try:
@@ -16,6 +15,7 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+from .http_client import get_http_registry
 from .resource_mgr import (
     AVATAR_CACHE_PATH, WEAPON_CACHE_PATH,
     CHAIN_CACHE_PATH, SKILL_CACHE_PATH, PHANTOM_CACHE_PATH
@@ -25,13 +25,13 @@ from .resource_mgr import (
 class ResourceDownloader:
     """资源下载器"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
         self.base_url = "https://api.kurobbs.com"
     
     async def close(self):
-        """关闭客户端"""
-        await self.client.aclose()
+        """共享连接池在插件关闭时由注册表统一释放，这里无需处理"""
+        return None
     
     async def download_image(self, url: str, cache_path: Path) -> Optional[Image.Image]:
         """下载图片并缓存"""
@@ -44,7 +44,8 @@ class ResourceDownloader:
         
         # 下载图片
         try:
-            response = await self.client.get(url)
+            client = get_http_registry().get_client(url)
+            response = await client.get(url, timeout=self.timeout)
             if response.status_code == 200:
                 # 保存到缓存
                 cache_path.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,385 @@
+# coding=utf-8
+"""
+HTTP连接池管理
+进程内共享的 httpx 客户端注册表，供API请求与资源下载复用连接
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+
+# HTTP/2 需要额外安装 h2（httpx[http2]）
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _get_host(url: str) -> str:
+    """提取URL的主机名（用作连接池的键）"""
+    parsed = urlparse(url)
+    return (parsed.netloc or parsed.path).lower()
+
+
+def _pool_stats(transport: Any) -> Dict[str, int]:
+    """读取 httpcore 连接池中的连接状态
+
+    连接池属于 httpx 内部实现，结构变化时返回空结果，
+    并发连接数以 _ConnectionGate 的计数为准。
+    """
+    try:
+        pool = getattr(transport, "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        idle = sum(1 for conn in connections if conn.is_idle())
+    except Exception:
+        return {}
+    return {
+        "connections": len(connections),
+        "idle": idle,
+    }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _ConnectionGate:
+    """所有主机共用的并发连接上限
+
+    异步与同步客户端共用同一计数：请求发出前占用名额，响应体读取完毕或关闭后归还。
+    等待超过 HTTP_POOL_TIMEOUT 时抛出 httpx.PoolTimeout，与 httpx 自身的连接池超时一致。
+    """
+
+    def __init__(self, limit: int, timeout: Optional[float]):
+        self._limit = limit
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._in_use = 0
+        self._in_flight: Dict[str, int] = {}
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _try_acquire(self, host: str) -> bool:
+        """持有锁时尝试占用名额"""
+        if self._limit > 0 and self._in_use >= self._limit:
+            return False
+        self._in_use += 1
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        return True
+
+    def _deadline(self) -> Optional[float]:
+        return None if self._timeout is None else time.monotonic() + self._timeout
+
+    def acquire(self, host: str) -> None:
+        """同步占用名额（在同步客户端所在线程中调用）"""
+        deadline = self._deadline()
+        with self._condition:
+            while not self._try_acquire(host):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise httpx.PoolTimeout("已达到全局连接数上限")
+                self._condition.wait(remaining)
+
+    async def acquire_async(self, host: str) -> None:
+        """异步占用名额，等待期间不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        deadline = self._deadline()
+        while True:
+            with self._lock:
+                if self._try_acquire(host):
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise httpx.PoolTimeout("已达到全局连接数上限")
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                raise httpx.PoolTimeout("已达到全局连接数上限")
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, host: str) -> None:
+        """归还名额并唤醒等待者（可在任意线程调用）"""
+        with self._condition:
+            self._in_use -= 1
+            count = self._in_flight.get(host, 0) - 1
+            if count > 0:
+                self._in_flight[host] = count
+            else:
+                self._in_flight.pop(host, None)
+            waiters, self._waiters = self._waiters, []
+            self._condition.notify()
+        # 等待者数量有限，全部唤醒后重新竞争名额
+        for loop, future in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, future)
+
+    def in_flight(self, host: str) -> int:
+        """主机当前占用的连接数"""
+        return self._in_flight.get(host, 0)
+
+    def stats(self) -> Dict[str, int]:
+        """全局上限的占用情况"""
+        return {"limit": self._limit, "in_use": self._in_use, "waiting": len(self._waiters)}
+
+
+class _ReleaseOnce:
+    """保证连接名额只归还一次"""
+
+    def __init__(self, release: Callable[[], None]):
+        self._release = release
+        self._released = False
+
+    def __call__(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+
+class _GatedAsyncStream(httpx.AsyncByteStream):
+    """响应体关闭时归还名额"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: _ReleaseOnce):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _GatedStream(httpx.SyncByteStream):
+    """响应体关闭时归还名额（同步）"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: _ReleaseOnce):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _GatedAsyncTransport(httpx.AsyncBaseTransport):
+    """先占用全局连接名额再交给 httpx 连接池的异步传输层"""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, gate: _ConnectionGate, host: str):
+        self.transport = transport
+        self._gate = gate
+        self._host = host
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._gate.acquire_async(self._host)
+        release = _ReleaseOnce(lambda: self._gate.release(self._host))
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_GatedAsyncStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class _GatedTransport(httpx.BaseTransport):
+    """先占用全局连接名额再交给 httpx 连接池的同步传输层"""
+
+    def __init__(self, transport: httpx.HTTPTransport, gate: _ConnectionGate, host: str):
+        self.transport = transport
+        self._gate = gate
+        self._host = host
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._gate.acquire(self._host)
+        release = _ReleaseOnce(lambda: self._gate.release(self._host))
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_GatedStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class HttpClientRegistry:
+    """HTTP客户端注册表
+
+    每个上游主机对应一个长连接池（keep-alive），连接数上限按主机计算，
+    所有主机（含同步客户端）另共用 HTTP_MAX_CONNECTIONS 的并发连接上限；
+    异步与同步客户端分别维护。插件关闭时统一释放。
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._transports: Dict[Tuple[str, str], Any] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._gate: Optional[_ConnectionGate] = None
+
+    def _get_gate(self) -> _ConnectionGate:
+        """全局连接上限（首次使用时按配置创建）"""
+        if self._gate is None:
+            config = get_config()
+            self._gate = _ConnectionGate(config.HTTP_MAX_CONNECTIONS, config.HTTP_POOL_TIMEOUT)
+        return self._gate
+
+    def _transport_options(self) -> Dict[str, Any]:
+        """根据配置构建连接池参数"""
+        config = get_config()
+        http2 = config.HTTP2_ENABLED and HTTP2_AVAILABLE
+        if config.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logger.warning("[鸣潮] 未安装h2，HTTP/2已回退为HTTP/1.1")
+        return {
+            "limits": httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            "http2": http2,
+        }
+
+    def _client_options(self) -> Dict[str, Any]:
+        """客户端参数（超时与重定向）"""
+        config = get_config()
+        return {
+            "timeout": httpx.Timeout(
+                config.HTTP_READ_TIMEOUT,
+                connect=config.HTTP_CONNECT_TIMEOUT,
+                pool=config.HTTP_POOL_TIMEOUT,
+            ),
+            "follow_redirects": True,
+        }
+
+    def _count(self, host: str) -> None:
+        self._request_counts[host] = self._request_counts.get(host, 0) + 1
+
+    def get_client(self, url: str) -> httpx.AsyncClient:
+        """获取目标主机的共享异步客户端"""
+        host = _get_host(url)
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            async def _on_request(request: httpx.Request) -> None:
+                self._count(host)
+
+            transport = httpx.AsyncHTTPTransport(**self._transport_options())
+            self._transports[("async", host)] = transport
+            client = httpx.AsyncClient(
+                transport=_GatedAsyncTransport(transport, self._get_gate(), host),
+                event_hooks={"request": [_on_request]},
+                **self._client_options(),
+            )
+            self._clients[host] = client
+        return client
+
+    def get_sync_client(self, url: str) -> httpx.Client:
+        """获取目标主机的共享同步客户端（供同步渲染流程使用）"""
+        host = _get_host(url)
+        client = self._sync_clients.get(host)
+        if client is None or client.is_closed:
+            def _on_request(request: httpx.Request) -> None:
+                self._count(host)
+
+            transport = httpx.HTTPTransport(**self._transport_options())
+            self._transports[("sync", host)] = transport
+            client = httpx.Client(
+                transport=_GatedTransport(transport, self._get_gate(), host),
+                event_hooks={"request": [_on_request]},
+                **self._client_options(),
+            )
+            self._sync_clients[host] = client
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各主机连接池状态，"*" 为全局连接上限的占用情况"""
+        gate = self._get_gate()
+        result: Dict[str, Dict[str, Any]] = {}
+        for kind, clients in (("async", self._clients), ("sync", self._sync_clients)):
+            for host, client in clients.items():
+                if client.is_closed:
+                    continue
+                entry = result.setdefault(host, {
+                    "requests": self._request_counts.get(host, 0),
+                    "in_flight": gate.in_flight(host),
+                })
+                entry[kind] = _pool_stats(self._transports.get((kind, host)))
+        result["*"] = gate.stats()
+        return result
+
+    async def aclose(self) -> None:
+        """关闭所有客户端"""
+        for client in self._clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        for client in self._sync_clients.values():
+            if not client.is_closed:
+                client.close()
+        self._clients.clear()
+        self._sync_clients.clear()
+        self._transports.clear()
+
+
+_registry: Optional[HttpClientRegistry] = None
+
+
+def get_http_registry() -> HttpClientRegistry:
+    """获取HTTP客户端注册表实例"""
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry()
+    return _registry
+
+
+async def close_http_clients() -> None:
+    """关闭所有共享HTTP客户端"""
+    if _registry is not None:
+        await _registry.aclose()
+
+
+try:
+    from nonebot import get_driver
+    get_driver().on_shutdown(close_http_clients)
+except Exception:
+    # 脱离NoneBot运行时由调用方自行关闭
+    pass
@@ -0,0 +1,150 @@
+# coding=utf-8
+"""
+已解析角色详情的进程内缓存
+避免每次查询都重新读取缓存文件并做 pydantic 校验
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+from .common import add_role_cache_listener
+
+
+@dataclass
+class _Entry:
+    value: Any
+    version: Any
+    loaded_at: float
+
+
+class RoleDetailLRU:
+    """角色详情LRU缓存
+
+    - 超过 max_size 时淘汰最久未使用的条目
+    - 条目存活超过 ttl_seconds 后失效
+    - 读取时传入缓存文件的版本（mtime），与入缓存时不一致即失效
+    - 读取缓存前取 generation()，写入时带上：读取期间该角色被失效过就不写入，
+      避免把失效前读到的旧对象放回缓存（SQLite后端没有可比较的版本）
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # 每次失效递增；记录各角色（role_id 为None表示整个用户）最近一次失效时的值
+        self._generation = 0
+        self._invalidated: "OrderedDict[Tuple[str, Optional[str]], int]" = OrderedDict()
+        # 已从 _invalidated 中淘汰的最新记录，早于它开始的读取无法判断，一律不写入
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, role_id: str, version: Any = None) -> Optional[Any]:
+        """读取缓存，未命中返回None"""
+        key = (user_id, role_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expired = self.ttl_seconds > 0 and time.monotonic() - entry.loaded_at > self.ttl_seconds
+        if expired or entry.version != version:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def generation(self) -> int:
+        """当前失效计数，在读取缓存数据之前获取"""
+        return self._generation
+
+    def _invalidated_since(self, user_id: str, role_id: str, generation: int) -> bool:
+        if generation < self._forgotten:
+            return True
+        for key in ((user_id, role_id), (user_id, None)):
+            if self._invalidated.get(key, 0) > generation:
+                return True
+        return False
+
+    def put(
+        self,
+        user_id: str,
+        role_id: str,
+        value: Any,
+        version: Any = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """写入缓存
+
+        Args:
+            generation: 读取数据前的 generation()，读取期间该角色被失效过则丢弃本次写入
+        """
+        if generation is not None and self._invalidated_since(user_id, role_id, generation):
+            return
+        key = (user_id, role_id)
+        self._entries[key] = _Entry(value=value, version=version, loaded_at=time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str, role_id: Optional[str] = None) -> None:
+        """失效指定角色；role_id 为空时失效该用户的全部角色"""
+        self._generation += 1
+        self._invalidated[(user_id, role_id)] = self._generation
+        self._invalidated.move_to_end((user_id, role_id))
+        while len(self._invalidated) > self.max_size:
+            _, forgotten = self._invalidated.popitem(last=False)
+            self._forgotten = max(self._forgotten, forgotten)
+        if role_id is not None:
+            self._entries.pop((user_id, role_id), None)
+            return
+        for key in [k for k in self._entries if k[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_role_detail_lru: Optional[RoleDetailLRU] = None
+
+
+def get_role_detail_lru() -> RoleDetailLRU:
+    """获取角色详情缓存实例"""
+    global _role_detail_lru
+    if _role_detail_lru is None:
+        config = get_config()
+        _role_detail_lru = RoleDetailLRU(
+            max_size=config.ROLE_DETAIL_CACHE_SIZE,
+            ttl_seconds=config.CACHE_EXPIRE_MINUTES * 60,
+        )
+    return _role_detail_lru
+
+
+@add_role_cache_listener
+def _invalidate_on_save(user_id: str, role_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """角色缓存写入或清除后丢弃旧的解析结果"""
+    if _role_detail_lru is not None:
+        _role_detail_lru.invalidate(user_id, role_id)
@@ -0,0 +1,46 @@
+# coding=utf-8
+"""
+请求限速工具
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    以固定速率补充令牌，桶满时允许短时突发；
+    多个协程共享同一个桶时按先来后到依次放行。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限速
+            capacity: 桶容量（允许的最大突发请求数）
+        """
+        self.rate = rate
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """获取令牌，令牌不足时等待"""
+        if self.rate <= 0:
+            return
+
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -0,0 +1,41 @@
+# coding=utf-8
+"""
+请求合并（single-flight）
+同一个键同时只执行一次，并发的调用方等待同一个结果
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """按键合并并发调用
+
+    第一个调用方启动任务，之后的调用方在任务结束前直接等待它的结果（包括异常）。
+    单个调用方被取消不会取消共享的任务。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.shared = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        """该键是否有正在执行的任务"""
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """执行或加入 key 对应的任务"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Future[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有调用方都被取消时避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
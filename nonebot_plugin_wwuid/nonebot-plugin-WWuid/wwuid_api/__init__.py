@@ -1,3 +1,3 @@
 # wwuid_api/__init__.py
-from .client import WavesApi
+from .client import WavesApi, get_waves_api
 from .models import *
@@ -0,0 +1,114 @@
+# coding=utf-8
+"""
+用户绑定查询缓存
+一次查询取出用户全部有效绑定（含cookie、did、bat），并在进程内短时间缓存；
+添加、删除绑定或更新令牌时失效
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ..plugin_core.config import get_config
+    from ..plugin_core.constants import WAVES_GAME_ID
+except ImportError:
+    from plugin_core.config import get_config
+    from plugin_core.constants import WAVES_GAME_ID
+
+
+@dataclass(frozen=True)
+class UserBind:
+    """一条有效绑定的快照（与会话无关，可安全缓存）"""
+    game_uid: str
+    cookie: str
+    did: str
+    bat: str
+    update_time: Optional[datetime]
+    bot_id: str = ""
+
+
+class BindCache:
+    """按 user_id 缓存有效绑定列表
+
+    ttl_seconds <= 0 时不缓存，每次都查询数据库。
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, List[UserBind]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: str) -> List[UserBind]:
+        """获取用户的有效绑定（按添加顺序）"""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        binds = await self._load(user_id)
+        if self.ttl_seconds > 0:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, binds)
+        return binds
+
+    @staticmethod
+    async def _load(user_id: str) -> List[UserBind]:
+        from nonebot_plugin_orm import get_session
+        from sqlalchemy import select
+        from .models import WutheringWavesBind
+
+        async with get_session() as session:
+            result = await session.execute(
+                select(
+                    WutheringWavesBind.game_uid,
+                    WutheringWavesBind.cookie,
+                    WutheringWavesBind.did,
+                    WutheringWavesBind.bat,
+                    WutheringWavesBind.update_time,
+                    WutheringWavesBind.bot_id,
+                ).where(
+                    WutheringWavesBind.user_id == user_id,
+                    WutheringWavesBind.game_id == WAVES_GAME_ID,
+                    WutheringWavesBind.status != "无效"
+                ).order_by(WutheringWavesBind.id)
+            )
+            return [
+                UserBind(
+                    game_uid=row[0],
+                    cookie=row[1],
+                    did=row[2] or "",
+                    bat=row[3] or "",
+                    update_time=row[4],
+                    bot_id=row[5] or "",
+                )
+                for row in result.fetchall()
+            ]
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """使缓存失效，不传 user_id 时清空全部"""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def invalidate_game_uid(self, game_uid: str) -> None:
+        """使包含指定特征码的缓存失效"""
+        stale = [
+            user_id for user_id, (_, binds) in self._entries.items()
+            if any(bind.game_uid == game_uid for bind in binds)
+        ]
+        for user_id in stale:
+            del self._entries[user_id]
+
+
+_bind_cache: Optional[BindCache] = None
+
+
+def get_bind_cache() -> BindCache:
+    """获取绑定缓存实例"""
+    global _bind_cache
+    if _bind_cache is None:
+        _bind_cache = BindCache(get_config().BIND_CACHE_TTL_SECONDS)
+    return _bind_cache
@@ -2,20 +2,61 @@
 """
 鸣潮API请求模块
 """
-import json
+import asyncio
 import random
 import string
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 import httpx
 
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
 from plugin_core.errors import (
     WAVES_CODE_101,
     WAVES_CODE_102,
     WAVES_CODE_999,
 )
 from plugin_core.constants import WAVES_GAME_ID
+from .device import DeviceIdentityProvider
+from .resilience import RETRYABLE_STATUS, ApiResilience, RetryPolicy
+
+try:
+    from ..plugin_core.config import get_config
+    from ..utils import codec
+    from ..utils.http_client import get_http_registry
+except ImportError:
+    from plugin_core.config import get_config
+    from utils import codec
+    from utils.http_client import get_http_registry
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko)  KuroGameBox/2.10.0"
+)
+
+# 请求头缓存的最大条目数
+HEADER_CACHE_SIZE = 256
+
+# 非幂等或无需重试的接口，失败后直接返回
+NO_RETRY_ENDPOINTS = (
+    "/aki/roleBox/akiBox/refreshData",
+    "/user/login/log",
+)
+
+
+class _RetryableStatus(Exception):
+    """上游返回了可重试的HTTP状态码"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
 
 
 class WavesApiResponse:
@@ -48,10 +89,37 @@ class WavesApi:
     def __init__(self):
         self.SERVER_ID = "76402e5b20be2c39f095a152090afddc"
         self.MAIN_URL = "https://api.kurobbs.com"
-        self.client = httpx.AsyncClient(timeout=30.0)
+        
+        config = get_config()
+        self.device = DeviceIdentityProvider(
+            USER_AGENT,
+            local_ip=config.LOCAL_IP,
+            dev_code=config.DEV_CODE,
+            refresh_seconds=config.DEVICE_IP_REFRESH_SECONDS,
+        )
+        # (cookie, is_community, dev_code) -> 请求头
+        self._header_cache: "OrderedDict[Tuple[str, bool, str], Dict[str, str]]" = OrderedDict()
+        self._header_cache_version = self.device.version
+        # 查询类接口是幂等的，临时故障时退避重试；每个接口单独熔断
+        no_retry = RetryPolicy(max_attempts=1)
+        self.resilience = ApiResilience(
+            default_policy=RetryPolicy(
+                max_attempts=1 + max(0, config.API_MAX_RETRIES),
+                base_delay=config.API_RETRY_BASE_DELAY,
+            ),
+            policies={endpoint: no_retry for endpoint in NO_RETRY_ENDPOINTS},
+            failure_threshold=config.API_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=config.API_BREAKER_RESET_SECONDS,
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享连接池中的API客户端"""
+        return get_http_registry().get_client(self.MAIN_URL)
     
     async def close(self):
-        await self.client.aclose()
+        """共享连接池在插件关闭时由注册表统一释放，这里无需处理"""
+        return None
     
     def _get_server_id(self, role_id: str) -> str:
         """获取服务器ID"""
@@ -64,40 +132,43 @@ class WavesApi:
         return self.SERVER_ID
     
     def _get_headers(self, cookie: str = "", role_id: str = "", is_community: bool = False, dev_code: str = "") -> Dict[str, str]:
-        """构建请求头"""
-        platform_source = "ios"
-        user_agent = (
-            "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) "
-            "AppleWebKit/605.1.15 (KHTML, like Gecko)  KuroGameBox/2.10.0"
-        )
+        """构建请求头
         
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
-            "source": platform_source,
-            "User-Agent": user_agent,
-        }
+        相同 (cookie, is_community, dev_code) 的请求头只构建一次，
+        返回副本，调用方可以放心追加字段。
+        """
+        # devCode格式: "ip, user_agent"
+        device_code = dev_code or self.device.get_dev_code()
         
-        if cookie:
-            headers["token"] = cookie
+        # 本机IP变化后自动生成的devCode随之失效
+        if self.device.version != self._header_cache_version:
+            self._header_cache.clear()
+            self._header_cache_version = self.device.version
         
-        # devCode格式: "ip, user_agent"
-        if dev_code:
-            headers["devCode"] = dev_code
+        key = (cookie, is_community, dev_code)
+        headers = self._header_cache.get(key)
+        if headers is None:
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
+                "source": "ios",
+                "User-Agent": USER_AGENT,
+            }
+            
+            if cookie:
+                headers["token"] = cookie
+            
+            headers["devCode"] = device_code
+            
+            if is_community:
+                headers["version"] = "2.10.0"
+            
+            self._header_cache[key] = headers
+            if len(self._header_cache) > HEADER_CACHE_SIZE:
+                self._header_cache.popitem(last=False)
         else:
-            import socket
-            try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                s.connect(("8.8.8.8", 80))
-                ip = s.getsockname()[0]
-                s.close()
-            except:
-                ip = "127.0.0.1"
-            headers["devCode"] = f"{ip}, {user_agent}"
-        
-        if is_community:
-            headers["version"] = "2.10.0"
+            self._header_cache.move_to_end(key)
         
-        return headers
+        return dict(headers)
     
     async def _request(
         self,
@@ -107,40 +178,94 @@ class WavesApi:
         headers: Optional[Dict[str, str]] = None,
         role_id: Optional[str] = None,
     ) -> WavesApiResponse:
-        """统一请求方法"""
-        try:
-            content_type = headers.get("Content-Type", "") if headers else ""
-            
-            if method.upper() == "GET":
-                response = await self.client.get(url, headers=headers)
-            else:
-                if "application/x-www-form-urlencoded" in content_type:
-                    response = await self.client.post(url, data=data, headers=headers)
+        """统一请求方法
+        
+        超时、网络错误及5xx/429响应按接口的重试策略退避重试；
+        接口熔断期间直接返回错误，不再请求上游。
+        """
+        endpoint, entry = self.resilience.get(url)
+        policy, breaker, metrics = entry.policy, entry.breaker, entry.metrics
+        
+        if not breaker.allow():
+            metrics.rejected += 1
+            return WavesApiResponse(code=WAVES_CODE_999, message="接口暂时不可用，请稍后再试")
+        
+        attempt = 0
+        while True:
+            metrics.requests += 1
+            try:
+                response = await self._send(url, method, data, headers)
+                if response.status_code in RETRYABLE_STATUS:
+                    raise _RetryableStatus(response.status_code)
+            except (httpx.RequestError, _RetryableStatus) as e:
+                metrics.failures += 1
+                if breaker.record_failure():
+                    metrics.opened += 1
+                if isinstance(e, httpx.TimeoutException):
+                    error = WavesApiResponse(code=WAVES_CODE_999, message="请求超时")
+                elif isinstance(e, httpx.RequestError):
+                    # 网络异常可能是网卡或出口IP发生了变化，下次请求时重新探测
+                    self.device.invalidate()
+                    error = WavesApiResponse(code=WAVES_CODE_999, message=f"网络错误: {str(e)}")
                 else:
-                    response = await self.client.post(url, json=data, headers=headers)
+                    error = WavesApiResponse(code=WAVES_CODE_999, message=f"服务器错误: {str(e)}")
+                
+                attempt += 1
+                if attempt >= policy.max_attempts or not breaker.allow():
+                    return error
+                metrics.retries += 1
+                delay = policy.backoff(attempt - 1)
+                logger.debug(f"[鸣潮] 请求 {endpoint} 失败（{error.message}），{delay:.2f} 秒后第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+                continue
+            except asyncio.CancelledError:
+                # 取消不代表接口故障，但半开状态下必须释放探测名额，否则熔断器无法再放行请求
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                metrics.failures += 1
+                if breaker.record_failure():
+                    metrics.opened += 1
+                return WavesApiResponse(code=WAVES_CODE_999, message=f"未知错误: {str(e)}")
             
-            result = response.json()
+            breaker.record_success()
+            break
+        
+        try:
+            # 直接从原始字节解析，data 字段中嵌套的JSON字符串在这里解析一次，调用方不再重复解析
+            result = codec.loads(response.content)
             
             if isinstance(result, dict):
                 code = result.get("code", -1)
-                data = result.get("data", None)
-                if isinstance(data, str) and data:
-                    try:
-                        data = json.loads(data)
-                    except json.JSONDecodeError:
-                        pass
+                data = codec.loads_nested(result.get("data", None))
                 message = result.get("message", "")
                 return WavesApiResponse(code=code, data=data, message=message)
             else:
                 return WavesApiResponse(code=-1, message="响应格式错误")
                 
-        except httpx.TimeoutException:
-            return WavesApiResponse(code=WAVES_CODE_999, message="请求超时")
-        except httpx.RequestError as e:
-            return WavesApiResponse(code=WAVES_CODE_999, message=f"网络错误: {str(e)}")
         except Exception as e:
             return WavesApiResponse(code=WAVES_CODE_999, message=f"未知错误: {str(e)}")
     
+    async def _send(
+        self,
+        url: str,
+        method: str,
+        data: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+    ) -> httpx.Response:
+        """发送一次请求"""
+        content_type = headers.get("Content-Type", "") if headers else ""
+        
+        if method.upper() == "GET":
+            return await self.client.get(url, headers=headers)
+        if "application/x-www-form-urlencoded" in content_type:
+            return await self.client.post(url, data=data, headers=headers)
+        return await self.client.post(url, json=data, headers=headers)
+    
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各接口的请求、失败、重试次数及熔断器状态"""
+        return self.resilience.snapshot()
+    
     async def login_log(self, role_id: str, cookie: str) -> WavesApiResponse:
         """登录校验"""
         url = f"{self.MAIN_URL}/user/login/log"
@@ -174,12 +299,6 @@ class WavesApi:
         
         if response.success:
             data = response.data
-            # data可能是字符串JSON，需要解析
-            if isinstance(data, str) and data:
-                try:
-                    data = json.loads(data)
-                except json.JSONDecodeError:
-                    pass
             if isinstance(data, dict) and "accessToken" in data:
                 return True, data.get("accessToken", "")
         
@@ -269,6 +388,17 @@ class WavesApi:
         return await self._request(url, method="POST", data=data, headers=headers)
 
 
+_waves_api: Optional[WavesApi] = None
+
+
+def get_waves_api() -> WavesApi:
+    """获取API客户端实例"""
+    global _waves_api
+    if _waves_api is None:
+        _waves_api = WavesApi()
+    return _waves_api
+
+
 def generate_random_jwt_token() -> str:
     """生成随机JWT Token（用于兜底）"""
     chars = string.ascii_letters + string.digits
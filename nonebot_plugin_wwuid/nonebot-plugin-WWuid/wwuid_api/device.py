@@ -0,0 +1,107 @@
+# coding=utf-8
+"""
+设备标识（devCode）管理模块
+"""
+import asyncio
+import socket
+import time
+from typing import Optional
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+def resolve_local_ip() -> str:
+    """探测本机出口IP（UDP connect 不会真正发送数据包）"""
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+        finally:
+            s.close()
+    except OSError:
+        return "127.0.0.1"
+
+
+class DeviceIdentityProvider:
+    """设备标识提供者
+
+    本机IP只在首次使用时同步探测一次，之后按间隔在线程池中后台重新探测，
+    期间继续返回旧值；IP发生变化时 version 自增，供上层清理依赖它的缓存。
+    """
+
+    def __init__(
+        self,
+        user_agent: str,
+        local_ip: str = "",
+        dev_code: str = "",
+        refresh_seconds: int = 600,
+    ):
+        """
+        Args:
+            user_agent: 拼接到devCode中的UA
+            local_ip: 配置指定的本机IP，非空时不再探测
+            dev_code: 配置指定的完整devCode，非空时直接使用
+            refresh_seconds: 自动探测结果的有效期
+        """
+        self.user_agent = user_agent
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self._ip_override = local_ip
+        self._dev_code_override = dev_code
+        self._ip: Optional[str] = None
+        self._resolved_at = 0.0
+        self._refreshing = False
+
+    def get_local_ip(self) -> str:
+        """获取本机IP（带缓存）"""
+        if self._ip_override:
+            return self._ip_override
+
+        if self._ip is None:
+            self._update(resolve_local_ip())
+        elif time.monotonic() - self._resolved_at > self.refresh_seconds:
+            self._schedule_refresh()
+        return self._ip
+
+    def get_dev_code(self) -> str:
+        """获取devCode，格式: "ip, user_agent" """
+        if self._dev_code_override:
+            return self._dev_code_override
+        return f"{self.get_local_ip()}, {self.user_agent}"
+
+    def invalidate(self) -> None:
+        """标记探测结果过期（如网络异常、网卡切换后调用）"""
+        self._resolved_at = 0.0
+
+    def _schedule_refresh(self) -> None:
+        """在线程池中重新探测，不阻塞事件循环"""
+        if self._refreshing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._update(resolve_local_ip())
+            return
+
+        self._refreshing = True
+        future = loop.run_in_executor(None, resolve_local_ip)
+        future.add_done_callback(self._on_resolved)
+
+    def _on_resolved(self, future: "asyncio.Future") -> None:
+        self._refreshing = False
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._update(future.result())
+
+    def _update(self, ip: str) -> None:
+        self._resolved_at = time.monotonic()
+        if ip != self._ip:
+            if self._ip is not None:
+                logger.info(f"[鸣潮] 本机IP变化: {self._ip} -> {ip}")
+            self._ip = ip
+            self.version += 1
@@ -0,0 +1,202 @@
+# coding=utf-8
+"""
+鸣潮角色详情的轻量模型
+基于 msgspec.Struct，直接从JSON字节解码，不做 pydantic 校验，占用内存更少；
+字段与 models.py 中的 pydantic 模型一致，并提供相同的辅助方法。
+未安装 msgspec 时 FAST_MODELS_AVAILABLE 为 False，调用方应回退到 pydantic 模型。
+"""
+from typing import Any, List, Optional, Union
+
+try:
+    import msgspec
+    _MSGSPEC_AVAILABLE = True
+except ImportError:
+    _MSGSPEC_AVAILABLE = False
+
+from .models import RoleDetailData
+
+FAST_MODELS_AVAILABLE = _MSGSPEC_AVAILABLE
+
+SKILL_SORT_ORDER = ["常态攻击", "共鸣技能", "共鸣回路", "共鸣解放", "变奏技能", "延奏技能", "谐度破坏"]
+CHAIN_NAMES = ["零", "一", "二", "三", "四", "五", "六"]
+
+
+if _MSGSPEC_AVAILABLE:
+    class FastChain(msgspec.Struct, kw_only=True):
+        """命座"""
+        name: Optional[str] = None
+        order: int
+        description: Optional[str] = None
+        iconUrl: Optional[str] = None
+        unlocked: bool
+
+    class FastWeapon(msgspec.Struct, kw_only=True):
+        """武器"""
+        weaponId: int
+        weaponName: str
+        weaponType: int
+        weaponStarLevel: int
+        weaponIcon: Optional[str] = None
+        weaponEffectName: Optional[str] = None
+
+    class FastWeaponData(msgspec.Struct, kw_only=True):
+        """武器数据"""
+        weapon: FastWeapon
+        level: int
+        breach: Optional[int] = None
+        resonLevel: Optional[int] = None
+
+    class FastPhantomProp(msgspec.Struct, kw_only=True):
+        """声骸属性"""
+        phantomPropId: int
+        name: str
+        phantomId: int
+        quality: int
+        cost: int
+        iconUrl: str
+        skillDescription: Optional[str] = None
+
+    class FastFetterDetail(msgspec.Struct, kw_only=True):
+        """声骸共鸣"""
+        groupId: int
+        name: str
+        iconUrl: Optional[str] = None
+        num: int
+        firstDescription: Optional[str] = None
+        secondDescription: Optional[str] = None
+
+    class FastProps(msgspec.Struct, kw_only=True):
+        """属性词条"""
+        attributeName: str
+        iconUrl: Optional[str] = None
+        attributeValue: str
+
+    class FastEquipPhantom(msgspec.Struct, kw_only=True):
+        """装备的声骸"""
+        phantomProp: FastPhantomProp
+        cost: int
+        quality: int
+        level: int
+        fetterDetail: FastFetterDetail
+        mainProps: Optional[List[FastProps]] = None
+        subProps: Optional[List[FastProps]] = None
+
+        def get_props(self) -> List[FastProps]:
+            """获取所有词条"""
+            props = []
+            if self.mainProps:
+                props.extend(self.mainProps)
+            if self.subProps:
+                props.extend(self.subProps)
+            return props
+
+    class FastEquipPhantomData(msgspec.Struct, kw_only=True):
+        """声骸装备数据"""
+        cost: int
+        equipPhantomList: Optional[List[Optional[FastEquipPhantom]]] = None
+
+    class FastSkill(msgspec.Struct, kw_only=True):
+        """技能"""
+        id: int
+        type: str
+        name: str
+        description: str
+        iconUrl: str
+
+    class FastSkillData(msgspec.Struct, kw_only=True):
+        """技能数据"""
+        skill: FastSkill
+        level: int
+
+    class FastSkillBranch(msgspec.Struct, kw_only=True):
+        """技能分支"""
+        activePic: str
+        branchId: int
+        branchName: str
+        desc: str
+        pic: str
+        skillIcon: str
+
+    class FastRole(msgspec.Struct, kw_only=True):
+        """角色基础信息"""
+        roleId: int
+        level: int
+        breach: Optional[int] = None
+        roleName: str
+        roleIconUrl: Optional[str] = None
+        rolePicUrl: Optional[str] = None
+        starLevel: int
+        attributeId: int
+        attributeName: Optional[str] = None
+        weaponTypeId: int
+        weaponTypeName: Optional[str] = None
+        acronym: Optional[str] = None
+        chainUnlockNum: Optional[int] = None
+        isMainRole: Optional[bool] = None
+        totalSkillLevel: Optional[int] = None
+
+    class FastRoleDetail(msgspec.Struct, kw_only=True):
+        """角色详情数据"""
+        role: FastRole
+        level: int
+        chainList: List[FastChain]
+        weaponData: FastWeaponData
+        phantomData: Optional[FastEquipPhantomData] = None
+        skillList: List[FastSkillData]
+        activeBranchId: int = 0
+        skillBranchList: Optional[List[FastSkillBranch]] = None
+
+        def get_chain_num(self) -> int:
+            """获取已解锁命座数量"""
+            return sum(1 for chain in self.chainList if chain.unlocked)
+
+        def get_chain_name(self) -> str:
+            """获取命座名称"""
+            num = self.get_chain_num()
+            return f"{CHAIN_NAMES[min(num, 6)]}链" if num < len(CHAIN_NAMES) else "六链"
+
+        def get_skill_level(self, skill_type: str) -> int:
+            """获取指定类型的技能等级"""
+            skill = next((s for s in self.skillList if s.skill.type == skill_type), None)
+            return (skill.level - 1) if skill else 0
+
+        def get_skill_list(self) -> List[FastSkillData]:
+            """获取排序后的技能列表"""
+            return sorted(
+                self.skillList,
+                key=lambda x: SKILL_SORT_ORDER.index(x.skill.type) if x.skill.type in SKILL_SORT_ORDER else 999
+            )
+
+        def get_skill_branch(self) -> Optional[FastSkillBranch]:
+            """获取当前激活的技能分支"""
+            if self.activeBranchId and self.skillBranchList:
+                return next((b for b in self.skillBranchList if b.branchId == self.activeBranchId), None)
+            return None
+
+    class _FastRoleRecord(msgspec.Struct):
+        """缓存记录，只解码 data 字段"""
+        data: Optional[FastRoleDetail] = None
+
+    # strict=False 与 pydantic 的宽松模式一致（允许 "1" -> 1 之类的转换）
+    _detail_decoder = msgspec.json.Decoder(FastRoleDetail, strict=False)
+    _record_decoder = msgspec.json.Decoder(_FastRoleRecord, strict=False)
+
+
+def decode_role_detail(raw: Union[bytes, str]) -> "FastRoleDetail":
+    """从角色详情JSON（接口返回的 data）直接解码"""
+    return _detail_decoder.decode(raw)
+
+
+def decode_role_record(raw: Union[bytes, str]) -> Optional["FastRoleDetail"]:
+    """从缓存记录JSON（{"update_time", "data", ...}）直接解码出角色详情"""
+    return _record_decoder.decode(raw).data
+
+
+def convert_role_detail(data: Any) -> "FastRoleDetail":
+    """从已解析的字典转换"""
+    return msgspec.convert(data, FastRoleDetail, strict=False)
+
+
+def to_pydantic(role_detail: "FastRoleDetail") -> RoleDetailData:
+    """转换为 pydantic 模型（渲染等需要完整模型的场景）"""
+    return RoleDetailData.model_validate(msgspec.to_builtins(role_detail))
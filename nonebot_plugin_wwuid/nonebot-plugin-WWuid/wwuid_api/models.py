@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import List, Optional, Dict, Any
 try:
     from nonebot_plugin_orm import Model
-    from sqlalchemy import String, DateTime, Integer, Boolean
+    from sqlalchemy import String, DateTime, Integer, Boolean, Float, Index
     from sqlalchemy.orm import Mapped, mapped_column
     _ORM_AVAILABLE = True
 except Exception:
@@ -17,6 +17,15 @@ from pydantic import BaseModel, Field, field_validator
 if _ORM_AVAILABLE:
     class WutheringWavesBind(Model):
         """鸣潮用户绑定表"""
+        __table_args__ = (
+            # 按用户查询有效绑定（几乎所有命令）
+            Index("ix_wwuid_bind_user_game_status", "user_id", "game_id", "status"),
+            # 按特征码查询/更新（登录、令牌写回）
+            Index("ix_wwuid_bind_game_uid_game_id", "game_uid", "game_id"),
+            # 按群查询成员（群排行）
+            Index("ix_wwuid_bind_group_user", "group_id", "user_id"),
+        )
+
         id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
         user_id: Mapped[str] = mapped_column(String(20), index=True)
         bot_id: Mapped[str] = mapped_column(String(50), default="")
@@ -45,54 +54,125 @@ if _ORM_AVAILABLE:
             new_token: str,
             new_did: str,
             active_days: int = 30,
-        ):
-            """根据uid和game_id查找记录，如果is_login为True且在活跃天数内则更新cookie和did"""
+        ) -> int:
+            """根据uid和game_id更新cookie和did（仅限is_login为True且创建时间在活跃天数内的记录）
+
+            Returns:
+                int: 更新的记录数
+            """
             from nonebot_plugin_orm import get_session
-            from datetime import datetime, timedelta
-            from sqlalchemy import select, and_
-            import time
-            current_time = int(time.time())
-            threshold_time = current_time - (active_days * 24 * 60 * 60)
+            from datetime import timedelta
+            from sqlalchemy import update
+            threshold = datetime.now() - timedelta(days=active_days)
             async with get_session() as session:
-                stmt = select(cls).where(
-                    and_(
+                stmt = (
+                    update(cls)
+                    .where(
                         cls.game_uid == uid,
                         cls.game_id == game_id,
                         cls.is_login == True,
-                        cls.create_time != None,
+                        cls.create_time >= threshold,
                     )
+                    .values(cookie=new_token, did=new_did, update_time=datetime.now())
+                    .execution_options(synchronize_session=False)
                 )
                 result = await session.execute(stmt)
-                users = result.scalars().all()
-                updated_count = 0
-                for user in users:
-                    create_timestamp = int(user.create_time.timestamp())
-                    if create_timestamp >= threshold_time:
-                        user.cookie = new_token
-                        user.did = new_did
-                        user.update_time = datetime.now()
-                        updated_count += 1
                 await session.commit()
-                return updated_count
+                return result.rowcount or 0
 
         @classmethod
-        async def delete_all_invalid_cookie(cls, game_id: int = 3) -> int:
-            """删除所有status为'无效'的cookie记录"""
+        async def delete_all_invalid_cookie(cls, game_id: int = 3, chunk_size: Optional[int] = None) -> int:
+            """删除所有status为'无效'的cookie记录
+
+            按主键分批删除，每批单独提交，避免长时间锁表。
+
+            Args:
+                game_id: 游戏ID
+                chunk_size: 每批删除的记录数，默认使用配置 BIND_CLEANUP_CHUNK_SIZE，<=0 为一次删除
+
+            Returns:
+                int: 删除的记录数
+            """
             from nonebot_plugin_orm import get_session
             from sqlalchemy import select, delete
-            async with get_session() as session:
-                stmt = select(cls).where(cls.status == "无效", cls.game_id == game_id)
-                result = await session.execute(stmt)
-                invalid_cookies = result.scalars().all()
-                if not invalid_cookies:
-                    return 0
-                del_count = 0
-                for cookie in invalid_cookies:
-                    await session.delete(cookie)
-                    del_count += 1
-                await session.commit()
-                return del_count
+            if chunk_size is None:
+                try:
+                    from ..plugin_core.config import get_config
+                except ImportError:
+                    from plugin_core.config import get_config
+                chunk_size = get_config().BIND_CLEANUP_CHUNK_SIZE
+
+            condition = (cls.status == "无效", cls.game_id == game_id)
+            if chunk_size <= 0:
+                async with get_session() as session:
+                    result = await session.execute(
+                        delete(cls).where(*condition).execution_options(synchronize_session=False)
+                    )
+                    await session.commit()
+                    return result.rowcount or 0
+
+            del_count = 0
+            while True:
+                async with get_session() as session:
+                    ids = (await session.execute(
+                        select(cls.id).where(*condition).order_by(cls.id).limit(chunk_size)
+                    )).scalars().all()
+                    if not ids:
+                        break
+                    result = await session.execute(
+                        delete(cls).where(cls.id.in_(ids)).execution_options(synchronize_session=False)
+                    )
+                    await session.commit()
+                    del_count += result.rowcount or 0
+                if len(ids) < chunk_size:
+                    break
+            return del_count
+
+    class WavesRoleScore(Model):
+        """角色练度评分表（每个用户每个角色一行，角色缓存写入时重新计算）"""
+        __table_args__ = (
+            # 练度统计：按用户读取并按总分排序
+            Index("ix_wwuid_role_score_user_total", "user_id", "total_score"),
+            # 群排行：按角色取总分最高的前K名
+            Index("ix_wwuid_role_score_role_total", "role_id", "total_score"),
+        )
+
+        user_id: Mapped[str] = mapped_column(String(20), primary_key=True)
+        role_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        role_name: Mapped[str] = mapped_column(String(50), default="")
+        level: Mapped[int] = mapped_column(default=0)
+        chain_num: Mapped[int] = mapped_column(default=0)
+        weapon_level: Mapped[int] = mapped_column(default=0)
+        phantom_count: Mapped[int] = mapped_column(default=0)
+        skill_total: Mapped[int] = mapped_column(default=0)
+        total_score: Mapped[float] = mapped_column(Float, default=0.0)
+        level_score: Mapped[float] = mapped_column(Float, default=0.0)
+        chain_score: Mapped[float] = mapped_column(Float, default=0.0)
+        weapon_score: Mapped[float] = mapped_column(Float, default=0.0)
+        phantom_score: Mapped[float] = mapped_column(Float, default=0.0)
+        skill_score: Mapped[float] = mapped_column(Float, default=0.0)
+        update_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    class WavesScoreSummary(Model):
+        """用户练度汇总表（随角色评分增量维护）
+
+        记录存在且 weights_key 与当前权重一致时，该用户的评分表才是完整的；
+        否则需要从角色缓存重建。
+        """
+        user_id: Mapped[str] = mapped_column(String(20), primary_key=True)
+        weights_key: Mapped[str] = mapped_column(String(100), default="")
+        role_count: Mapped[int] = mapped_column(default=0)
+        score_sum: Mapped[float] = mapped_column(Float, default=0.0)
+        high_count: Mapped[int] = mapped_column(default=0)
+        medium_count: Mapped[int] = mapped_column(default=0)
+        low_count: Mapped[int] = mapped_column(default=0)
+        update_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    class WavesScoreHistogram(Model):
+        """角色总分分布（每个角色每1分一个桶，随评分表增量维护），用于计算百分位排名"""
+        role_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+        count: Mapped[int] = mapped_column(default=0)
 
 # ==================== 鸣潮角色数据模型 ====================
 
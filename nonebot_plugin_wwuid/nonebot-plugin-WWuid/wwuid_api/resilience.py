@@ -0,0 +1,171 @@
+# coding=utf-8
+"""
+接口容错
+按接口区分的重试策略（指数退避 + 随机抖动）与熔断器
+"""
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+# 视为上游临时故障、可以重试的HTTP状态码
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """重试策略
+
+    Attributes:
+        max_attempts: 最多请求次数（含第一次），1为不重试
+        base_delay: 第一次重试的退避上限（秒），之后每次翻倍
+        max_delay: 退避上限（秒）
+    """
+    max_attempts: int = 1
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def backoff(self, retry: int) -> float:
+        """第 retry 次重试（从0开始）前的等待时间，使用全抖动避免多个请求同时重试"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** retry))
+        return random.uniform(0, ceiling)
+
+
+@dataclass
+class EndpointMetrics:
+    """单个接口的统计"""
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    rejected: int = 0
+    opened: int = 0
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败 failure_threshold 次后打开，打开期间直接拒绝请求；
+    reset_timeout 秒后进入半开状态放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否放行请求"""
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = BREAKER_HALF_OPEN
+            self._probing = False
+        # 半开状态只放行一个探测请求
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release_probe(self) -> None:
+        """探测请求未得出结果（如被取消）时释放名额，下一个请求继续探测"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != BREAKER_CLOSED:
+            logger.info(f"[鸣潮] 接口 {self.name} 已恢复，熔断器关闭")
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败
+
+        Returns:
+            bool: 熔断器是否因此打开
+        """
+        self._failures += 1
+        self._probing = False
+        if self.state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+            was_open = self.state == BREAKER_OPEN
+            self.state = BREAKER_OPEN
+            self._opened_at = time.monotonic()
+            if not was_open:
+                logger.warning(
+                    f"[鸣潮] 接口 {self.name} 连续失败 {self._failures} 次，"
+                    f"熔断 {self.reset_timeout:.0f} 秒"
+                )
+                return True
+        return False
+
+
+@dataclass
+class _Endpoint:
+    policy: RetryPolicy
+    breaker: CircuitBreaker
+    metrics: EndpointMetrics = field(default_factory=EndpointMetrics)
+
+
+class ApiResilience:
+    """按接口管理重试策略、熔断器与统计"""
+
+    def __init__(
+        self,
+        default_policy: RetryPolicy,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.default_policy = default_policy
+        self.policies = dict(policies or {})
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._endpoints: Dict[str, _Endpoint] = {}
+
+    @staticmethod
+    def endpoint_of(url: str) -> str:
+        """从URL中取出接口路径"""
+        path = url.split("?", 1)[0]
+        if "://" in path:
+            path = "/" + path.split("://", 1)[1].split("/", 1)[-1]
+        return path
+
+    def get(self, url: str) -> Tuple[str, _Endpoint]:
+        endpoint = self.endpoint_of(url)
+        entry = self._endpoints.get(endpoint)
+        if entry is None:
+            entry = _Endpoint(
+                policy=self.policies.get(endpoint, self.default_policy),
+                breaker=CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout),
+            )
+            self._endpoints[endpoint] = entry
+        return endpoint, entry
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """各接口的请求统计与熔断器状态"""
+        return {
+            endpoint: {
+                "state": entry.breaker.state,
+                "requests": entry.metrics.requests,
+                "failures": entry.metrics.failures,
+                "retries": entry.metrics.retries,
+                "rejected": entry.metrics.rejected,
+                "opened": entry.metrics.opened,
+            }
+            for endpoint, entry in self._endpoints.items()
+        }
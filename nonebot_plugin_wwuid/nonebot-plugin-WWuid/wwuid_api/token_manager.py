@@ -0,0 +1,193 @@
+# coding=utf-8
+"""
+访问令牌（bat）管理
+按 (特征码, did) 缓存 requestToken 获取的 accessToken，并写回绑定表
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+    from ..plugin_core.errors import is_auth_failure
+    from ..utils.singleflight import SingleFlight
+except ImportError:
+    from plugin_core.config import get_config
+    from plugin_core.errors import is_auth_failure
+    from utils.singleflight import SingleFlight
+
+from .bind_cache import get_bind_cache
+from .client import WavesApi, WavesApiResponse, get_waves_api
+
+
+@dataclass
+class _CachedToken:
+    value: str
+    obtained_at: float
+
+
+class TokenManager:
+    """访问令牌管理器
+
+    - 内存中按 (game_uid, did) 缓存令牌及获取时间，数据库中的 bat 作为初始值
+    - 令牌剩余有效期不足 refresh_margin 时提前重新获取，失败则继续使用旧令牌
+    - 同一个令牌的并发请求只会向上游请求一次
+    - 接口返回鉴权失败时作废令牌并重试一次
+    """
+
+    def __init__(self, api: WavesApi, ttl_seconds: float, refresh_margin_seconds: float):
+        self.api = api
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._tokens: Dict[Tuple[str, str], _CachedToken] = {}
+        self._flights = SingleFlight()
+
+    def _age(self, token: _CachedToken) -> float:
+        return time.time() - token.obtained_at
+
+    def _is_valid(self, token: _CachedToken) -> bool:
+        return bool(token.value) and self._age(token) < self.ttl_seconds
+
+    def _needs_refresh(self, token: _CachedToken) -> bool:
+        return self._age(token) >= self.ttl_seconds - self.refresh_margin_seconds
+
+    def remember(self, game_uid: str, did: str, bat: str, obtained_at: Optional[datetime] = None) -> None:
+        """记录已知的令牌（如数据库中保存的 bat）"""
+        if not bat:
+            return
+        timestamp = obtained_at.timestamp() if obtained_at else time.time()
+        self._tokens[(game_uid, did)] = _CachedToken(bat, timestamp)
+
+    def invalidate(self, game_uid: str, did: str) -> None:
+        """作废令牌"""
+        self._tokens.pop((game_uid, did), None)
+
+    async def get_token(
+        self,
+        game_uid: str,
+        cookie: str,
+        did: str = "",
+        stored_bat: str = "",
+        stored_at: Optional[datetime] = None,
+        server_id: Optional[str] = None,
+        stale: str = "",
+        persist: bool = True,
+    ) -> Tuple[bool, str]:
+        """获取访问令牌
+
+        Args:
+            game_uid: 特征码
+            cookie: 用户token
+            did: 设备ID
+            stored_bat / stored_at: 数据库中保存的令牌及其更新时间，内存中没有时使用
+            server_id: 服务器ID
+            stale: 已确认失效的令牌，缓存中仍是它时强制重新获取
+            persist: 是否把新令牌写回绑定表
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 令牌或错误信息)
+        """
+        key = (game_uid, did)
+        if key not in self._tokens and stored_bat and stored_bat != stale:
+            self.remember(game_uid, did, stored_bat, stored_at)
+
+        token = self._tokens.get(key)
+        if token is not None and stale and token.value == stale:
+            self.invalidate(game_uid, did)
+            token = None
+
+        if token is not None and not self._needs_refresh(token):
+            return True, token.value
+
+        success, result = await self._flights.do(
+            key, self._request_token, game_uid, cookie, did, server_id, persist
+        )
+        if not success and token is not None and self._is_valid(token):
+            # 提前刷新失败，旧令牌仍在有效期内
+            logger.warning(f"[鸣潮] 提前刷新令牌失败，继续使用旧令牌: {result}")
+            return True, token.value
+        return success, result
+
+    async def _request_token(
+        self,
+        game_uid: str,
+        cookie: str,
+        did: str,
+        server_id: Optional[str],
+        persist: bool,
+    ) -> Tuple[bool, str]:
+        success, bat = await self.api.get_request_token(game_uid, cookie, did, server_id)
+        if not success:
+            return False, bat
+
+        self._tokens[(game_uid, did)] = _CachedToken(bat, time.time())
+        if persist:
+            await self._persist(game_uid, did, bat)
+        return True, bat
+
+    async def _persist(self, game_uid: str, did: str, bat: str) -> None:
+        """把令牌写回绑定表（update_time 同时更新，作为令牌获取时间）"""
+        try:
+            from nonebot_plugin_orm import get_session
+            from sqlalchemy import update
+            from .models import WutheringWavesBind
+        except ImportError:
+            return
+
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    update(WutheringWavesBind)
+                    .where(
+                        WutheringWavesBind.game_uid == game_uid,
+                        WutheringWavesBind.did == did,
+                    )
+                    .values(bat=bat, update_time=datetime.now())
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"[鸣潮] 保存令牌失败: {e}")
+            return
+        get_bind_cache().invalidate_game_uid(game_uid)
+
+    async def call_with_token(
+        self,
+        game_uid: str,
+        cookie: str,
+        did: str,
+        bat: str,
+        func: Callable[[str], Awaitable[WavesApiResponse]],
+    ) -> WavesApiResponse:
+        """使用令牌调用接口，鉴权失败时换新令牌重试一次"""
+        response = await func(bat)
+        if response.success or not is_auth_failure(response.code, response.message):
+            return response
+
+        logger.info(f"[鸣潮] 特征码 {game_uid} 的令牌已失效，重新获取")
+        success, new_bat = await self.get_token(game_uid, cookie, did, stale=bat)
+        if not success:
+            return response
+        return await func(new_bat)
+
+
+_token_manager: Optional[TokenManager] = None
+
+
+def get_token_manager() -> TokenManager:
+    """获取令牌管理器实例"""
+    global _token_manager
+    if _token_manager is None:
+        config = get_config()
+        _token_manager = TokenManager(
+            get_waves_api(),
+            ttl_seconds=config.BAT_EXPIRE_MINUTES * 60,
+            refresh_margin_seconds=config.BAT_REFRESH_MARGIN_MINUTES * 60,
+        )
+    return _token_manager
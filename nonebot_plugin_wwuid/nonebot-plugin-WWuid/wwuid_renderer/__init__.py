@@ -1,17 +1,9 @@
 # wwuid_renderer/__init__.py
 from .card_drawer import render_role_card
+from .executor import RenderExecutor, RenderBusyError, get_render_executor
+from .font_manager import FontManager, get_font_manager, get_font_by_attr
 from .utils import (
     waves_font_origin, ww_font_origin, emoji_font_origin,
-    waves_font_10, waves_font_12, waves_font_14, waves_font_16, waves_font_15, waves_font_18,
-    waves_font_20, waves_font_22, waves_font_23, waves_font_24, waves_font_25, waves_font_26,
-    waves_font_28, waves_font_30, waves_font_32, waves_font_34, waves_font_36, waves_font_38,
-    waves_font_40, waves_font_42, waves_font_44, waves_font_50, waves_font_58, waves_font_60,
-    waves_font_62, waves_font_70, waves_font_84,
-    ww_font_12, ww_font_14, ww_font_16, ww_font_15, ww_font_18, ww_font_20, ww_font_22,
-    ww_font_23, ww_font_24, ww_font_25, ww_font_26, ww_font_28, ww_font_30, ww_font_32,
-    ww_font_34, ww_font_36, ww_font_38, ww_font_40, ww_font_42, ww_font_44, ww_font_50,
-    ww_font_58, ww_font_60, ww_font_62, ww_font_70, ww_font_84,
-    emoji_font,
     get_waves_bg, get_attribute_icon, get_weapon_type_icon, load_resource_image,
     draw_text_with_shadow, add_footer, crop_center_img, resize_and_center_image,
     create_rounded_mask, apply_blur,
@@ -19,3 +11,11 @@ from .utils import (
     get_phantom_icon_async, get_phantom_icon_sync, get_chain_icon_async, get_chain_icon_sync,
     get_weapon_icon_async, get_weapon_icon_sync, get_avatar_sync
 )
+
+
+def __getattr__(name: str):
+    """预定义字号（waves_font_24、ww_font_30、emoji_font 等）按需加载"""
+    font = get_font_by_attr(name)
+    if font is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return font
@@ -6,7 +6,8 @@
 import asyncio
 import io
 import re
-from typing import Optional, Tuple, Dict, List
+import time
+from typing import FrozenSet, Optional, Tuple, Dict, List
 from PIL import Image, ImageDraw, ImageEnhance
 
 try:
@@ -17,9 +18,12 @@ except ImportError:
 
 try:
     from ..utils.resource_mgr import CHARINFO_PATH, BG_PATH
+    from ..plugin_core.config import get_config
 except ImportError:
     from utils.resource_mgr import CHARINFO_PATH, BG_PATH
-from .utils import waves_font_origin
+    from plugin_core.config import get_config
+from .utils import waves_font_origin, WAVES_BG_FILES, BG_PATH as WAVES_BG_PATH
+from .layer_cache import LayerCache
 from .utils import (
     get_waves_bg, get_attribute_icon, get_weapon_type_icon,
     draw_text_with_shadow, add_footer, resize_and_center_image,
@@ -28,6 +32,9 @@ from .utils import (
     get_chain_icon_sync, get_weapon_icon_sync
 )
 
+# 渲染器版本：修改布局或绘制逻辑后递增，使已缓存的卡片失效
+RENDERER_VERSION = "2"
+
 # ---- 布局常量（对齐源项目大致位置）----
 CANVAS_W = 1200
 HEADER_H = 160
@@ -78,6 +85,8 @@ class RoleCardRenderer:
     
     def __init__(self):
         self.TEXT_PATH = CHARINFO_PATH
+        self.last_timings: Dict[str, float] = {}
+        self.layers = LayerCache(max_canvases=get_config().BASE_CANVAS_CACHE_SIZE)
         self.font_12 = waves_font_origin(12)
         self.font_14 = waves_font_origin(14)
         self.font_16 = waves_font_origin(16)
@@ -90,60 +99,187 @@ class RoleCardRenderer:
         self.font_40 = waves_font_origin(40)
         self.font_50 = waves_font_origin(50)
     
-    def render_role_card(self, role_detail, account: Optional[Dict] = None, raw_detail: Optional[Dict] = None) -> bytes:
-        """渲染角色练度卡片"""
+    def render_role_card(self, role_detail, account: Optional[Dict] = None, raw_detail: Optional[Dict] = None, icons=None) -> bytes:
+        """渲染角色练度卡片
+
+        icons 为预取好的图标（RoleIcons），缺少的图标仍会同步下载；
+        各阶段耗时（秒）记录在 self.last_timings 中。
+        """
         role = role_detail.role
+        timings: Dict[str, float] = {}
+        self.last_timings = timings
+        stage_start = time.perf_counter()
+
+        def mark(stage: str):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] = now - stage_start
+            stage_start = now
         
         # 计算卡片高度（根据内容动态调整）
         card_height = max(PHANTOM_Y + 500, 1900)
         
-        # 创建背景
-        img = get_waves_bg((CANVAS_W, card_height))
+        # 创建背景（背景图与各区域底框预先合成，已包含的底框不再重复绘制）
+        frames = self._static_frames(role_detail)
+        img = self._get_base_canvas((CANVAS_W, card_height), frames)
+        mark("background")
         
         # 绘制顶部信息栏（账号等级、世界等级等）
-        self._draw_header_section(img, role_detail, account)
+        self._draw_header_section(img, role_detail, account, frames, icons)
+        mark("header")
         
         # 绘制角色信息区域（左侧立绘 + 右侧属性）
-        self._draw_role_section(img, role_detail)
+        self._draw_role_section(img, role_detail, icons)
+        mark("role")
         
         # 绘制属性面板
-        self._draw_property_section(img, role_detail, raw_detail)
+        self._draw_property_section(img, role_detail, raw_detail, frames)
+        mark("property")
         
         # 绘制武器区域
-        self._draw_weapon_section(img, role_detail)
+        self._draw_weapon_section(img, role_detail, frames, icons)
+        mark("weapon")
         
         # 绘制技能区域
-        self._draw_skill_section(img, role_detail)
+        self._draw_skill_section(img, role_detail, frames, icons)
+        mark("skill")
         
         # 绘制命座区域
-        self._draw_chain_section(img, role_detail)
+        self._draw_chain_section(img, role_detail, frames, icons)
+        mark("chain")
         
         # 绘制声骸区域
-        self._draw_phantom_section(img, role_detail)
+        self._draw_phantom_section(img, role_detail, frames, icons)
+        mark("phantom")
         
         # 添加页脚
         img = add_footer(img)
         # 伤害试算
         self._draw_damage_section(img, self._get_role_properties(role_detail, raw_detail))
+        mark("footer")
         
         # 转换为字节
         buffer = io.BytesIO()
         img.save(buffer, format='PNG')
+        mark("encode")
         return buffer.getvalue()
     
-    def _draw_header_section(self, img: Image.Image, role_detail, account: Optional[Dict] = None):
-        """绘制顶部信息栏"""
-        draw = ImageDraw.Draw(img)
+    def _get_icon(self, icons, kind: str, key, loader) -> Optional[Image.Image]:
+        """优先使用预取的图标，没有时调用 loader 同步获取"""
+        if icons is not None:
+            image = icons.get(kind, key)
+            if image is not None:
+                return image
+        return loader()
+    
+    def warm_up(self):
+        """预先合成最常见布局的底图"""
+        frames = frozenset({"header", "property", "weapon", "skill", "chain"} | {f"phantom:{i}" for i in range(5)})
+        self._get_base_canvas((CANVAS_W, max(PHANTOM_Y + 500, 1900)), frames)
+    
+    def _static_frames(self, role_detail) -> FrozenSet[str]:
+        """本次渲染需要绘制的底框
         
+        角色立绘底框会压住顶部的等级文字，不能提前合成，仍在绘制角色区域时粘贴。
+        """
+        frames = {"header", "property"}
+        weapon_data = role_detail.weaponData
+        if weapon_data and weapon_data.weapon:
+            frames.add("weapon")
+        if role_detail.get_skill_list():
+            frames.add("skill")
+        if role_detail.chainList:
+            frames.add("chain")
+        if role_detail.phantomData:
+            phantom_list = role_detail.phantomData.equipPhantomList or []
+            valid_count = len([p for p in phantom_list if p])
+            frames.update(f"phantom:{i}" for i in range(min(valid_count, 5)))
+        return frozenset(frames)
+    
+    def _get_base_canvas(self, size: Tuple[int, int], frames: FrozenSet[str]) -> Image.Image:
+        """获取预合成底图的拷贝"""
+        def build() -> Image.Image:
+            self.layers.watch(*(WAVES_BG_PATH / name for name in WAVES_BG_FILES))
+            img = get_waves_bg(size)
+            if "header" in frames:
+                self._draw_header_frame(img)
+            if "property" in frames:
+                self._draw_property_frame(img)
+            if "weapon" in frames:
+                self._draw_weapon_frame(img)
+            if "skill" in frames:
+                self._draw_skill_frame(img)
+            if "chain" in frames:
+                self._draw_chain_frame(img)
+            for i in range(5):
+                if f"phantom:{i}" in frames:
+                    self._draw_phantom_frame(img, i)
+            return img
+        
+        return self.layers.canvas((RENDERER_VERSION, size, frames), build)
+    
+    def _draw_header_frame(self, img: Image.Image):
         # 顶部背景条 - 使用title_bar替代
-        header_bg = load_resource_image("title_bar.png")
+        header_bg = self.layers.resource("title_bar.png", (CANVAS_W, HEADER_H))
         if header_bg:
-            header_bg = header_bg.resize((CANVAS_W, HEADER_H))
             img.paste(header_bg, (0, 0), header_bg)
         else:
             # 使用纯色背景
             header_overlay = Image.new('RGBA', (CANVAS_W, HEADER_H), (30, 30, 40, 200))
             img.paste(header_overlay, (0, 0), header_overlay)
+    
+    def _draw_property_frame(self, img: Image.Image):
+        # 属性面板背景
+        prop_bg = self.layers.resource("prop_bg.png", (PROP_W, PROP_H))
+        if prop_bg:
+            img.paste(prop_bg, (PROP_X, PROP_Y), prop_bg)
+    
+    def _draw_weapon_frame(self, img: Image.Image):
+        # 武器背景
+        weapon_bg = self.layers.resource("weapon_bg.png", (600, 150))
+        if weapon_bg:
+            img.paste(weapon_bg, (550, WEAPON_Y + 40), weapon_bg)
+    
+    def _draw_skill_frame(self, img: Image.Image):
+        # 技能背景
+        skill_bg = self.layers.resource("skill_bg.png", (1100, 120))
+        if skill_bg:
+            img.paste(skill_bg, (50, SKILL_Y + 40), skill_bg)
+        else:
+            # 使用纯色背景
+            skill_area = Image.new('RGBA', (1100, 120), (40, 40, 50, 150))
+            img.paste(skill_area, (50, SKILL_Y + 40), skill_area)
+    
+    def _draw_chain_frame(self, img: Image.Image):
+        # 命座背景 - 使用banner3替代
+        chain_bg = self.layers.resource("banner3.png", (1100, 100))
+        if chain_bg:
+            img.paste(chain_bg, (50, CHAIN_Y + 40), chain_bg)
+        else:
+            # 使用纯色背景
+            chain_area = Image.new('RGBA', (1100, 100), (40, 40, 50, 150))
+            img.paste(chain_area, (50, CHAIN_Y + 40), chain_area)
+    
+    def _draw_phantom_frame(self, img: Image.Image, index: int):
+        # 声骸卡片背景 - 使用sh_bg替代
+        x = 50 + index * 220
+        ph_y = PHANTOM_Y + 50
+        ph_card_bg = self.layers.resource("sh_bg.png", (200, 280))
+        if ph_card_bg:
+            img.paste(ph_card_bg, (x, ph_y), ph_card_bg)
+        else:
+            # 使用带边框的卡片背景
+            card_bg = Image.new('RGBA', (200, 280), (40, 40, 50, 180))
+            img.paste(card_bg, (x, ph_y), card_bg)
+            draw = ImageDraw.Draw(img)
+            draw.rectangle([x, ph_y, x + 200, ph_y + 280], outline=(100, 100, 120, 200), width=2)
+    
+    def _draw_header_section(self, img: Image.Image, role_detail, account: Optional[Dict] = None, frames: FrozenSet[str] = frozenset(), icons=None):
+        """绘制顶部信息栏"""
+        draw = ImageDraw.Draw(img)
+        
+        if "header" not in frames:
+            self._draw_header_frame(img)
         
         # 左侧账号信息：头像、昵称、UID
         if account:
@@ -152,7 +288,7 @@ class RoleCardRenderer:
             avatar = None
             try:
                 from .utils import get_avatar_sync
-                avatar = get_avatar_sync(avatar_url, uid)
+                avatar = self._get_icon(icons, "avatar", uid, lambda: get_avatar_sync(avatar_url, uid))
             except Exception:
                 avatar = None
             if avatar:
@@ -209,14 +345,13 @@ class RoleCardRenderer:
             weapon_icon = weapon_icon.resize((35, 35))
             img.paste(weapon_icon, (ROLE_X + 270, ROLE_Y - 48), weapon_icon)
     
-    def _draw_role_section(self, img: Image.Image, role_detail):
+    def _draw_role_section(self, img: Image.Image, role_detail, icons=None):
         """绘制角色信息区域（左侧立绘）"""
         role = role_detail.role
         
         # 角色立绘背景框 - 使用base_info_bg替代
-        role_bg = load_resource_image("base_info_bg.png")
+        role_bg = self.layers.resource("base_info_bg.png", (ROLE_W + 30, ROLE_H + 20))
         if role_bg:
-            role_bg = role_bg.resize((ROLE_W + 30, ROLE_H + 20))
             img.paste(role_bg, (ROLE_X - 15, ROLE_Y - 10), role_bg)
         else:
             # 使用带边框的纯色背景
@@ -229,7 +364,10 @@ class RoleCardRenderer:
         # 加载并显示角色立绘
         if hasattr(role, 'rolePicUrl') and role.rolePicUrl:
             try:
-                role_pic = get_role_picture_sync(role.rolePicUrl, role.roleId)
+                role_pic = self._get_icon(
+                    icons, "role", role.roleId,
+                    lambda: get_role_picture_sync(role.rolePicUrl, role.roleId)
+                )
                 if role_pic:
                     # 调整立绘大小并居中显示
                     role_pic = self._resize_role_picture(role_pic, (ROLE_W, ROLE_H))
@@ -277,15 +415,12 @@ class RoleCardRenderer:
         
         return result
     
-    def _draw_property_section(self, img: Image.Image, role_detail, raw_detail: Optional[Dict] = None):
+    def _draw_property_section(self, img: Image.Image, role_detail, raw_detail: Optional[Dict] = None, frames: FrozenSet[str] = frozenset()):
         """绘制属性面板（右侧）"""
         draw = ImageDraw.Draw(img)
         
-        # 属性面板背景
-        prop_bg = load_resource_image("prop_bg.png")
-        if prop_bg:
-            prop_bg = prop_bg.resize((PROP_W, PROP_H))
-            img.paste(prop_bg, (PROP_X, PROP_Y), prop_bg)
+        if "property" not in frames:
+            self._draw_property_frame(img)
         
         # 获取属性数据
         props = self._get_role_properties(role_detail, raw_detail)
@@ -384,7 +519,7 @@ class RoleCardRenderer:
         draw_text_with_shadow(img, f"暴击伤害 {int(result['crit']):,}", (250, y_base), self.font_20, anchor="lm")
         draw_text_with_shadow(img, f"期望伤害 {int(result['expect']):,}", (600, y_base), self.font_20, anchor="lm")
     
-    def _draw_weapon_section(self, img: Image.Image, role_detail):
+    def _draw_weapon_section(self, img: Image.Image, role_detail, frames: FrozenSet[str] = frozenset(), icons=None):
         """绘制武器区域"""
         weapon_data = role_detail.weaponData
         if not weapon_data or not weapon_data.weapon:
@@ -399,25 +534,24 @@ class RoleCardRenderer:
         # 标题
         draw.text((550, y_base), "【武器信息】", font=self.font_24, fill=WHITE)
         
-        # 武器背景
-        weapon_bg = load_resource_image("weapon_bg.png")
-        if weapon_bg:
-            weapon_bg = weapon_bg.resize((600, 150))
-            img.paste(weapon_bg, (550, y_base + 40), weapon_bg)
+        if "weapon" not in frames:
+            self._draw_weapon_frame(img)
         
         # 武器图标背景（根据星级）
         star_level = weapon.weaponStarLevel or 4
         icon_bg_name = f"weapon_icon_bg_{star_level}.png"
-        icon_bg = load_resource_image(icon_bg_name)
+        icon_bg = self.layers.resource(icon_bg_name, (100, 100))
         if icon_bg:
-            icon_bg = icon_bg.resize((100, 100))
             img.paste(icon_bg, (570, y_base + 60), icon_bg)
         
         # 尝试加载武器图标
         weapon_icon = None
         if hasattr(weapon, 'weaponIcon') and weapon.weaponIcon:
             try:
-                weapon_icon = get_weapon_icon_sync(weapon.weaponId, weapon.weaponIcon)
+                weapon_icon = self._get_icon(
+                    icons, "weapon", weapon.weaponId,
+                    lambda: get_weapon_icon_sync(weapon.weaponId, weapon.weaponIcon)
+                )
             except Exception:
                 pass
         
@@ -441,14 +575,13 @@ class RoleCardRenderer:
                  font=self.font_18, fill=WHITE, anchor="mm")
         
         # 突破图标
-        promote_icon = load_resource_image("promote_icon.png")
+        promote_icon = self.layers.resource("promote_icon.png", (20, 20))
         if promote_icon:
             breach = min(weapon_data.breach or 0, 6)
             for i in range(breach):
-                icon = promote_icon.resize((20, 20))
-                img.paste(icon, (690 + i * 25, y_base + 130), icon)
+                img.paste(promote_icon, (690 + i * 25, y_base + 130), promote_icon)
     
-    def _draw_skill_section(self, img: Image.Image, role_detail):
+    def _draw_skill_section(self, img: Image.Image, role_detail, frames: FrozenSet[str] = frozenset(), icons=None):
         # 绘制技能区域（横向图标+等级）
         skill_list = role_detail.get_skill_list()
         if not skill_list:
@@ -460,15 +593,8 @@ class RoleCardRenderer:
         # 标题
         draw.text((50, y_base), "【技能】", font=self.font_24, fill=WHITE)
         
-        # 技能背景
-        skill_bg = load_resource_image("skill_bg.png")
-        if skill_bg:
-            skill_bg = skill_bg.resize((1100, 120))
-            img.paste(skill_bg, (50, y_base + 40), skill_bg)
-        else:
-            # 使用纯色背景
-            skill_area = Image.new('RGBA', (1100, 120), (40, 40, 50, 150))
-            img.paste(skill_area, (50, y_base + 40), skill_area)
+        if "skill" not in frames:
+            self._draw_skill_frame(img)
         
         # 按类型排序技能
         sorted_skills = sorted(skill_list, 
@@ -492,7 +618,10 @@ class RoleCardRenderer:
             skill_icon = None
             if hasattr(skill, 'iconUrl') and skill.iconUrl:
                 try:
-                    skill_icon = get_skill_icon_sync(skill.id, skill.iconUrl)
+                    skill_icon = self._get_icon(
+                        icons, "skill", skill.id,
+                        lambda: get_skill_icon_sync(skill.id, skill.iconUrl)
+                    )
                 except Exception:
                     pass
             
@@ -522,19 +651,12 @@ class RoleCardRenderer:
         
         # 绘制总评分（参考源项目左侧声骸评分圆章）
         try:
-            from ..utils.calculate import calc_phantom_score, calc_total_phantom_score
+            from ..utils.calculate import calc_phantom_scores, calc_total_phantom_score
         except ImportError:
-            from utils.calculate import calc_phantom_score, calc_total_phantom_score
+            from utils.calculate import calc_phantom_scores, calc_total_phantom_score
         try:
             phantom_list = (role_detail.phantomData.equipPhantomList or []) if role_detail.phantomData else []
-            scores = []
-            for p in phantom_list:
-                if not p:
-                    continue
-                main_props = p.mainProps or []
-                sub_props = p.subProps or []
-                score = calc_phantom_score(role_detail.role.roleId, main_props, sub_props, p.cost)
-                scores.append(score)
+            scores = [s for s in calc_phantom_scores(role_detail.role.roleId, phantom_list) if s is not None]
             total = calc_total_phantom_score(scores)
             # 圆形徽章
             badge_center = (150, y_base + 120)
@@ -550,7 +672,7 @@ class RoleCardRenderer:
         except Exception:
             pass
     
-    def _draw_chain_section(self, img: Image.Image, role_detail):
+    def _draw_chain_section(self, img: Image.Image, role_detail, frames: FrozenSet[str] = frozenset(), icons=None):
         """绘制命座区域"""
         chain_list = role_detail.chainList or []
         if not chain_list:
@@ -562,15 +684,8 @@ class RoleCardRenderer:
         # 标题
         draw.text((50, y_base), "【命座】", font=self.font_24, fill=WHITE)
         
-        # 命座背景 - 使用banner3替代
-        chain_bg = load_resource_image("banner3.png")
-        if chain_bg:
-            chain_bg = chain_bg.resize((1100, 100))
-            img.paste(chain_bg, (50, y_base + 40), chain_bg)
-        else:
-            # 使用纯色背景
-            chain_area = Image.new('RGBA', (1100, 100), (40, 40, 50, 150))
-            img.paste(chain_area, (50, y_base + 40), chain_area)
+        if "chain" not in frames:
+            self._draw_chain_frame(img)
         
         # 横向排列命座
         chain_x = 80
@@ -580,11 +695,14 @@ class RoleCardRenderer:
         for i, chain in enumerate(chain_list[:6]):
             x = chain_x + i * chain_spacing
             
-            # 尝试加载命座图标
+            # 尝试加载命座图标（未解锁的命座不显示图标，也不加载；与预取范围一致）
             chain_icon = None
-            if hasattr(chain, 'iconUrl') and chain.iconUrl:
+            if chain.unlocked and getattr(chain, 'iconUrl', None):
                 try:
-                    chain_icon = get_chain_icon_sync(i + 1, chain.iconUrl)
+                    chain_icon = self._get_icon(
+                        icons, "chain", i + 1,
+                        lambda: get_chain_icon_sync(i + 1, chain.iconUrl)
+                    )
                 except Exception:
                     pass
             
@@ -619,7 +737,7 @@ class RoleCardRenderer:
             points.append((px, py))
         draw.polygon(points, fill=fill_color, outline=outline_color)
     
-    def _draw_phantom_section(self, img: Image.Image, role_detail):
+    def _draw_phantom_section(self, img: Image.Image, role_detail, frames: FrozenSet[str] = frozenset(), icons=None):
         """绘制声骸区域"""
         phantom_data = role_detail.phantomData
         if not phantom_data:
@@ -638,6 +756,16 @@ class RoleCardRenderer:
         draw.text((50, y_base), "【声骸】", font=self.font_24, fill=WHITE)
         draw.text((150, y_base), f"{len(valid_phantoms)}/5", font=self.font_20, fill=GREY)
         
+        # 声骸评分（五个声骸一次计算）
+        try:
+            from ..utils.calculate import calc_phantom_scores
+        except ImportError:
+            from utils.calculate import calc_phantom_scores
+        try:
+            phantom_scores = calc_phantom_scores(role_detail.role.roleId, valid_phantoms[:5])
+        except Exception:
+            phantom_scores = [None] * len(valid_phantoms[:5])
+        
         # 声骸列表 - 横向排列
         ph_x = 50
         ph_y = y_base + 50
@@ -651,22 +779,17 @@ class RoleCardRenderer:
             prop = phantom.phantomProp
             name = prop.name if prop else "未知"
             
-            # 声骸卡片背景 - 使用sh_bg替代
-            ph_card_bg = load_resource_image("sh_bg.png")
-            if ph_card_bg:
-                ph_card_bg = ph_card_bg.resize((200, 280))
-                img.paste(ph_card_bg, (x, ph_y), ph_card_bg)
-            else:
-                # 使用带边框的卡片背景
-                card_bg = Image.new('RGBA', (200, 280), (40, 40, 50, 180))
-                img.paste(card_bg, (x, ph_y), card_bg)
-                draw.rectangle([x, ph_y, x + 200, ph_y + 280], outline=(100, 100, 120, 200), width=2)
+            if f"phantom:{i}" not in frames:
+                self._draw_phantom_frame(img, i)
             
             # 尝试加载声骸图标
             ph_icon = None
             if hasattr(prop, 'iconUrl') and prop.iconUrl:
                 try:
-                    ph_icon = get_phantom_icon_sync(prop.phantomId, prop.iconUrl)
+                    ph_icon = self._get_icon(
+                        icons, "phantom", prop.phantomId,
+                        lambda: get_phantom_icon_sync(prop.phantomId, prop.iconUrl)
+                    )
                 except Exception:
                     pass
             
@@ -704,18 +827,9 @@ class RoleCardRenderer:
                          font=self.font_12, fill=GREY, anchor="mm")
             
             # 声骸评分（如果有）
-            try:
-                from ..utils.calculate import calc_phantom_score
-            except ImportError:
-                from utils.calculate import calc_phantom_score
-            if main_props or sub_props:
+            score_result = phantom_scores[i]
+            if score_result is not None and (main_props or sub_props):
                 try:
-                    score_result = calc_phantom_score(
-                        role_detail.role.roleId,
-                        main_props,
-                        sub_props,
-                        phantom.cost
-                    )
                     # 评分背景
                     score_bg_color = self._get_score_color(score_result.grade)
                     draw.rounded_rectangle([x + 50, ph_y + 235, x + 150, ph_y + 265], 
@@ -750,7 +864,7 @@ def get_renderer() -> RoleCardRenderer:
     return _renderer
 
 
-def render_role_card(role_detail, account: Optional[Dict] = None, raw_detail: Optional[Dict] = None) -> bytes:
+def render_role_card(role_detail, account: Optional[Dict] = None, raw_detail: Optional[Dict] = None, icons=None) -> bytes:
     """渲染角色练度卡片（便捷函数）"""
     renderer = get_renderer()
-    return renderer.render_role_card(role_detail, account=account, raw_detail=raw_detail)
+    return renderer.render_role_card(role_detail, account=account, raw_detail=raw_detail, icons=icons)
@@ -0,0 +1,242 @@
+# coding=utf-8
+"""
+角色卡片渲染执行器
+Pillow 绘图与PNG编码在独立的进程池中执行，不占用事件循环
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import types
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+from .render_worker import render_in_worker, warm_worker, worker_pid
+from .worker_main import RENDER_PACKAGE_ENV
+
+WORKER_MAIN_PATH = Path(__file__).with_name("worker_main.py")
+
+
+def _process_context():
+    """渲染进程的启动方式
+
+    机器人进程中已有多个线程（缓存IO线程池、定时任务、HTTP客户端），
+    fork 会把这些线程持有的锁一并复制到子进程中导致死锁，因此不使用 fork。
+    forkserver 的服务进程预先导入渲染模块，之后的子进程从它派生，不必各自重新导入。
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["__main__", f"{__package__}.render_worker"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+@contextmanager
+def _worker_main():
+    """启动子进程期间把主模块换成 worker_main.py
+
+    spawn / forkserver 的子进程会按父进程 __main__ 的路径重新执行主模块，
+    换成 worker_main.py 后子进程不会再执行 bot.py，也不会导入插件包的 __init__。
+    """
+    os.environ[RENDER_PACKAGE_ENV] = __package__
+    main_module = sys.modules["__main__"]
+    stand_in = types.ModuleType("__main__")
+    stand_in.__file__ = str(WORKER_MAIN_PATH)
+    sys.modules["__main__"] = stand_in
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+class RenderBusyError(Exception):
+    """渲染队列已满"""
+
+
+class RenderStats:
+    """渲染耗时统计（各阶段累计值与次数）"""
+
+    def __init__(self):
+        self.count = 0
+        self.rejected = 0
+        self.failed = 0
+        self._totals: Dict[str, float] = {}
+        self._max: Dict[str, float] = {}
+
+    def record(self, timings: Dict[str, float]) -> None:
+        self.count += 1
+        for stage, seconds in timings.items():
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+            self._max[stage] = max(self._max.get(stage, 0.0), seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """各阶段平均/最大耗时（毫秒）"""
+        stages = {
+            stage: {
+                "avg_ms": round(total / self.count * 1000, 2),
+                "max_ms": round(self._max[stage] * 1000, 2),
+            }
+            for stage, total in self._totals.items()
+        } if self.count else {}
+        return {
+            "count": self.count,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "stages": stages,
+        }
+
+
+class RenderExecutor:
+    """渲染执行器
+
+    - 渲染在 workers 个预热过的工作进程中执行
+    - 执行中加排队的任务超过 workers + queue_limit 时直接拒绝（RenderBusyError）
+    - 进程池不可用（如无法创建子进程）时退回线程池，至少不阻塞事件循环
+    """
+
+    def __init__(self, workers: int = 2, queue_limit: int = 8, use_process: bool = True):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.use_process = use_process
+        self.stats = RenderStats()
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """执行中与排队中的任务数"""
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_process:
+                try:
+                    self._executor = self._start_process_pool()
+                    logger.info(f"[鸣潮] 渲染进程池已启动，进程数: {self.workers}")
+                except (OSError, NotImplementedError) as e:
+                    logger.warning(f"[鸣潮] 无法创建渲染进程池，改用线程池: {e}")
+                    self.use_process = False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="waves-render",
+                    initializer=warm_worker,
+                )
+        return self._executor
+
+    def _start_process_pool(self) -> ProcessPoolExecutor:
+        """创建进程池并立即启动全部工作进程
+
+        子进程只在这里启动（之后的任务由已有进程处理），替换主模块的范围也就限于启动期间。
+        """
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=warm_worker,
+            initargs=(get_config().model_dump(),),
+            mp_context=_process_context(),
+        )
+        with _worker_main():
+            for _ in range(self.workers):
+                executor.submit(worker_pid)
+        return executor
+
+    def _fallback_to_threads(self, reason: Exception) -> None:
+        logger.warning(f"[鸣潮] 渲染进程池不可用，改用线程池: {reason}")
+        old = self._executor
+        self._executor = None
+        self.use_process = False
+        if old is not None:
+            old.shutdown(wait=False)
+
+    async def render(
+        self,
+        role_detail,
+        account: Optional[Dict] = None,
+        raw_detail: Optional[Dict] = None,
+        icons=None,
+    ) -> bytes:
+        """渲染角色卡片
+
+        Args:
+            icons: 预取好的图标（RoleIcons）
+
+        Raises:
+            RenderBusyError: 排队任务已满
+        """
+        if self._pending >= self.workers + self.queue_limit:
+            self.stats.rejected += 1
+            raise RenderBusyError(f"渲染队列已满（{self._pending}）")
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            args = (render_in_worker, role_detail, account, raw_detail, icons, time.time())
+            try:
+                image_bytes, timings = await loop.run_in_executor(self._get_executor(), *args)
+            except BrokenProcessPool as e:
+                self._fallback_to_threads(e)
+                image_bytes, timings = await loop.run_in_executor(self._get_executor(), *args)
+            timings["total"] = time.perf_counter() - started
+            self.stats.record(timings)
+            logger.debug(
+                "[鸣潮] 渲染耗时 " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items())
+            )
+            return image_bytes
+        except Exception:
+            self.stats.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        """关闭工作进程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_render_executor: Optional[RenderExecutor] = None
+
+
+def get_render_executor() -> RenderExecutor:
+    """获取渲染执行器实例"""
+    global _render_executor
+    if _render_executor is None:
+        config = get_config()
+        workers = config.RENDER_WORKERS or min(4, os.cpu_count() or 1)
+        _render_executor = RenderExecutor(
+            workers=workers,
+            queue_limit=config.RENDER_QUEUE_LIMIT,
+            use_process=config.RENDER_USE_PROCESS,
+        )
+    return _render_executor
+
+
+def shutdown_render_executor() -> None:
+    """关闭渲染执行器"""
+    if _render_executor is not None:
+        _render_executor.shutdown()
+
+
+try:
+    from nonebot import get_driver
+    get_driver().on_shutdown(shutdown_render_executor)
+except Exception:
+    # 脱离NoneBot运行时由调用方自行关闭
+    pass
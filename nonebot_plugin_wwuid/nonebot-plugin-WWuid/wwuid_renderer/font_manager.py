@@ -0,0 +1,127 @@
+# coding=utf-8
+"""
+字体管理
+每个 (字体, 字号) 在第一次使用时才加载，之后复用同一个对象
+"""
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import ImageFont
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+except ImportError:
+    from plugin_core.config import get_config
+
+FONTS_DIR = Path(__file__).parent / "assets" / "fonts"
+
+# 字体名称 -> (字体文件, 找不到文件时尝试的系统字体)
+FONT_FACES: Dict[str, Tuple[Path, Optional[str]]] = {
+    "waves": (FONTS_DIR / "waves_fonts.ttf", "msyh.ttc"),
+    "ww": (FONTS_DIR / "arial-unicode-ms-bold.ttf", "msyh.ttc"),
+    "emoji": (FONTS_DIR / "NotoColorEmoji.ttf", None),
+}
+
+# 旧的模块级字体变量名，如 waves_font_24、ww_font_30、emoji_font
+_FONT_ATTR_PATTERN = re.compile(r"^(waves|ww)_font_(\d+)$")
+EMOJI_FONT_SIZE = 109
+
+
+class FontManager:
+    """字体管理器（线程安全）"""
+
+    def __init__(self, faces: Dict[str, Tuple[Path, Optional[str]]] = FONT_FACES):
+        self.faces = faces
+        self._fonts: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, face: str, size: int) -> ImageFont.FreeTypeFont:
+        path, fallback = self.faces[face]
+        if path.exists():
+            return ImageFont.truetype(str(path), size=size)
+        if fallback:
+            # 回退到系统字体
+            try:
+                return ImageFont.truetype(fallback, size=size)
+            except OSError:
+                pass
+        return ImageFont.load_default()
+
+    def get(self, face: str, size: int) -> ImageFont.FreeTypeFont:
+        """获取字体（已加载的直接返回）"""
+        key = (face, size)
+        font = self._fonts.get(key)
+        if font is None:
+            with self._lock:
+                font = self._fonts.get(key)
+                if font is None:
+                    font = self._load(face, size)
+                    self._fonts[key] = font
+        return font
+
+    def preload(self, specs: Iterable[Tuple[str, int]]) -> None:
+        """预先加载一组字体"""
+        for face, size in specs:
+            try:
+                self.get(face, size)
+            except Exception as e:
+                logger.warning(f"[鸣潮] 预加载字体失败 {face}:{size}: {e}")
+
+    def preload_in_background(self, specs: Iterable[Tuple[str, int]]) -> threading.Thread:
+        """在后台线程中预加载字体"""
+        thread = threading.Thread(
+            target=self.preload,
+            args=(list(specs),),
+            name="waves-font-preload",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def loaded(self) -> List[Tuple[str, int]]:
+        """已加载的字体"""
+        return sorted(self._fonts)
+
+
+_font_manager: Optional[FontManager] = None
+
+
+def get_font_manager() -> FontManager:
+    """获取字体管理器实例"""
+    global _font_manager
+    if _font_manager is None:
+        _font_manager = FontManager()
+    return _font_manager
+
+
+def get_font_by_attr(name: str) -> Optional[ImageFont.FreeTypeFont]:
+    """按旧的变量名获取字体，不是字体变量名时返回None"""
+    if name == "emoji_font":
+        return get_font_manager().get("emoji", EMOJI_FONT_SIZE)
+    match = _FONT_ATTR_PATTERN.match(name)
+    if match is None:
+        return None
+    return get_font_manager().get(match.group(1), int(match.group(2)))
+
+
+def preload_configured_fonts() -> None:
+    """启动后在后台预加载配置的常用字号"""
+    sizes = get_config().FONT_PRELOAD_SIZES
+    if sizes:
+        get_font_manager().preload_in_background(("waves", size) for size in sizes)
+
+
+try:
+    from nonebot import get_driver
+    get_driver().on_startup(preload_configured_fonts)
+except Exception:
+    # 脱离NoneBot运行时首次使用时再加载
+    pass
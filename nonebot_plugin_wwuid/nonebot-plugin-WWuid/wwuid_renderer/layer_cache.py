@@ -0,0 +1,103 @@
+# coding=utf-8
+"""
+静态图层缓存
+背景图、标题栏和各区域底框在每次渲染时都一样，只在第一次使用时读取和缩放，
+之后直接复用；素材文件被替换后自动重建。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+from .utils import CHARINFO_PATH
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class LayerCache:
+    """静态图层缓存
+
+    - resource(): 缩放后的素材图片，按 (文件名, 尺寸) 缓存，返回的图片只能作为粘贴源，不要修改
+    - canvas():   预合成的底图，按调用方给出的键缓存，每次返回一份拷贝
+    - 每隔 check_interval 秒检查一次用到的素材文件，修改时间变化则清空全部缓存
+    """
+
+    def __init__(self, max_canvases: int = 2, check_interval: float = 5.0):
+        self.max_canvases = max(1, max_canvases)
+        self.check_interval = check_interval
+        self._resources: Dict[Tuple[str, Tuple[int, int]], Optional[Image.Image]] = {}
+        self._canvases: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._watched: Dict[Path, Optional[int]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def watch(self, *paths: Path) -> None:
+        """登记需要监视修改时间的素材文件"""
+        with self._lock:
+            for path in paths:
+                if path not in self._watched:
+                    self._watched[path] = _mtime(path)
+
+    def _check_assets(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        changed = [path for path, mtime in self._watched.items() if _mtime(path) != mtime]
+        if changed:
+            logger.info(f"[鸣潮] 素材文件已更新，重建图层缓存: {', '.join(p.name for p in changed)}")
+            self.clear()
+
+    def resource(self, name: str, size: Tuple[int, int]) -> Optional[Image.Image]:
+        """读取 charinfo 素材并缩放到指定尺寸，文件不存在返回None"""
+        key = (name, size)
+        with self._lock:
+            self._check_assets()
+            if key in self._resources:
+                return self._resources[key]
+
+            path = CHARINFO_PATH / name
+            image = None
+            if path.exists():
+                try:
+                    image = Image.open(path).convert('RGBA').resize(size)
+                except Exception as e:
+                    logger.warning(f"加载资源图片失败 {name}: {e}")
+            self._watched.setdefault(path, _mtime(path))
+            self._resources[key] = image
+            return image
+
+    def canvas(self, key: Hashable, builder: Callable[[], Image.Image]) -> Image.Image:
+        """获取预合成底图的拷贝，不存在时调用 builder 生成"""
+        with self._lock:
+            self._check_assets()
+            base = self._canvases.get(key)
+            if base is None:
+                base = builder()
+                self._canvases[key] = base
+                while len(self._canvases) > self.max_canvases:
+                    self._canvases.popitem(last=False)
+            else:
+                self._canvases.move_to_end(key)
+            return base.copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._resources.clear()
+            self._canvases.clear()
+            self._watched = {path: _mtime(path) for path in self._watched}
@@ -0,0 +1,297 @@
+# coding=utf-8
+"""
+已渲染角色卡片缓存
+角色数据与渲染器版本都没变时直接返回上次生成的PNG
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+    from ..utils.cache_store import get_cache_store
+    from ..utils.common import add_role_cache_listener
+    from ..utils.calculate import get_character_template
+except ImportError:
+    from plugin_core.config import get_config
+    from utils.cache_store import get_cache_store
+    from utils.common import add_role_cache_listener
+    from utils.calculate import get_character_template
+
+from .card_drawer import RENDERER_VERSION
+
+CARD_CACHE_PATH = Path(__file__).parent / "cache" / "cards"
+
+
+def card_cache_key(role_detail, account: Optional[Dict] = None, raw_detail: Optional[Dict] = None) -> str:
+    """角色数据 + 渲染器版本 + 声骸评分模板的稳定哈希（模板热更新后旧卡片自动失效）"""
+    payload = {
+        "renderer": RENDERER_VERSION,
+        "template": get_character_template(role_detail.role.roleId, role_detail.role.roleName),
+        "role": role_detail.model_dump(mode="json"),
+        "account": account,
+        "raw": raw_detail,
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_bytes(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+class RenderedCardCache:
+    """渲染结果缓存
+
+    - 每个角色只保留最新的一份，内存与磁盘都按 (user_id, role_id) 索引，失效只是一次字典查找
+    - 内存中按LRU保存PNG字节，总量不超过 memory_bytes
+    - 从内存淘汰的条目写到磁盘，磁盘总量超过 disk_bytes 时删除最久未访问的文件；磁盘命中后放回内存
+    - 磁盘读写在缓存存储的I/O线程池中执行
+    """
+
+    def __init__(self, memory_bytes: int, disk_bytes: int, disk_dir: Path = CARD_CACHE_PATH):
+        self.memory_bytes = max(0, memory_bytes)
+        self.disk_bytes = max(0, disk_bytes)
+        self.disk_dir = disk_dir
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+        self._memory_size = 0
+        # 磁盘上的卡片 (user_id, role_id) -> (key, 文件大小)，第一次访问磁盘时扫描目录建立
+        self._disk_index: Optional[Dict[Tuple[str, str], Tuple[str, int]]] = None
+        self._disk_size = 0
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_file(self, user_id: str, role_id: str, key: str) -> Path:
+        return self.disk_dir / f"{user_id}_{role_id}_{key}.png"
+
+    async def get(self, user_id: str, role_id: str, key: str) -> Optional[bytes]:
+        """读取缓存的PNG，未命中返回None"""
+        cached = self._memory.get((user_id, role_id))
+        if cached is not None and cached[0] == key:
+            self._memory.move_to_end((user_id, role_id))
+            self.hits += 1
+            return cached[1]
+
+        if self.disk_bytes and self._on_disk(user_id, role_id, key) is not False:
+            data = await get_cache_store().run_io(self._read_disk, user_id, role_id, key)
+            if data is not None:
+                self.disk_hits += 1
+                # 读盘期间可能已写入了更新的卡片
+                if (user_id, role_id) not in self._memory:
+                    await self._remember(user_id, role_id, key, data)
+                return data
+
+        self.misses += 1
+        return None
+
+    async def put(self, user_id: str, role_id: str, key: str, data: bytes) -> None:
+        """写入缓存（同一角色只保留最新的一份）"""
+        self._forget_memory(user_id, role_id)
+        await self._drop_disk(user_id, role_id, keep=key)
+        await self._remember(user_id, role_id, key, data)
+
+    async def invalidate(self, user_id: str, role_id: str) -> None:
+        """清除某个角色的缓存条目"""
+        self._forget_memory(user_id, role_id)
+        await self._drop_disk(user_id, role_id)
+
+    def _forget_memory(self, user_id: str, role_id: str) -> None:
+        cached = self._memory.pop((user_id, role_id), None)
+        if cached is not None:
+            self._memory_size -= len(cached[1])
+
+    async def _remember(self, user_id: str, role_id: str, key: str, data: bytes) -> None:
+        """放入内存，超出容量的条目写到磁盘"""
+        if len(data) > self.memory_bytes:
+            await self._spill([((user_id, role_id), key, data)])
+            return
+
+        self._memory[(user_id, role_id)] = (key, data)
+        self._memory_size += len(data)
+        evicted = []
+        while self._memory_size > self.memory_bytes:
+            old_role, (old_key, old_data) = self._memory.popitem(last=False)
+            self._memory_size -= len(old_data)
+            evicted.append((old_role, old_key, old_data))
+        if evicted:
+            await self._spill(evicted)
+
+    def _on_disk(self, user_id: str, role_id: str, key: Optional[str] = None) -> Optional[bool]:
+        """磁盘上是否有该角色的卡片（指定 key 时要求一致），尚未扫描目录时返回None"""
+        index = self._disk_index
+        if index is None:
+            return None
+        entry = index.get((user_id, role_id))
+        return entry is not None and (key is None or entry[0] == key)
+
+    async def _drop_disk(self, user_id: str, role_id: str, keep: Optional[str] = None) -> None:
+        """删除磁盘上该角色的卡片（与 keep 相同的保留）"""
+        if not self.disk_bytes or self._on_disk(user_id, role_id) is False:
+            return
+        if keep is not None and self._on_disk(user_id, role_id, keep):
+            return
+        await get_cache_store().run_io(self._remove_disk, user_id, role_id, keep)
+
+    async def _spill(self, entries) -> None:
+        """把淘汰的条目写到磁盘"""
+        if not self.disk_bytes:
+            return
+        try:
+            await get_cache_store().run_io(self._spill_sync, entries)
+        except Exception as e:
+            logger.warning(f"[鸣潮] 写入卡片缓存失败: {e}")
+
+    def _load_disk_index(self) -> Dict[Tuple[str, str], Tuple[str, int]]:
+        """扫描磁盘目录建立索引（调用方持有 _disk_lock）"""
+        if self._disk_index is not None:
+            return self._disk_index
+        index: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.disk_dir.glob("*.png"):
+            parts = path.stem.rsplit("_", 2)
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            if len(parts) != 3 or (parts[0], parts[1]) in index:
+                # 无法识别或同一角色的多余文件
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            index[(parts[0], parts[1])] = (parts[2], size)
+        self._disk_size = sum(size for _, size in index.values())
+        self._disk_index = index
+        return index
+
+    def _read_disk(self, user_id: str, role_id: str, key: str) -> Optional[bytes]:
+        with self._disk_lock:
+            entry = self._load_disk_index().get((user_id, role_id))
+            if entry is None or entry[0] != key:
+                return None
+            data = _read_bytes(self._disk_file(user_id, role_id, key))
+            if data is None:
+                self._disk_index.pop((user_id, role_id), None)
+                self._disk_size -= entry[1]
+            return data
+
+    def _remove_disk(self, user_id: str, role_id: str, keep: Optional[str] = None) -> None:
+        with self._disk_lock:
+            index = self._load_disk_index()
+            entry = index.get((user_id, role_id))
+            if entry is None or entry[0] == keep:
+                return
+            del index[(user_id, role_id)]
+            self._disk_size -= entry[1]
+            try:
+                self._disk_file(user_id, role_id, entry[0]).unlink()
+            except OSError:
+                pass
+
+    def _spill_sync(self, entries) -> None:
+        with self._disk_lock:
+            index = self._load_disk_index()
+            for (user_id, role_id), key, data in entries:
+                entry = index.get((user_id, role_id))
+                if entry is not None:
+                    if entry[0] == key:
+                        continue
+                    self._disk_size -= entry[1]
+                    try:
+                        self._disk_file(user_id, role_id, entry[0]).unlink()
+                    except OSError:
+                        pass
+                _write_bytes(self._disk_file(user_id, role_id, key), data)
+                index[(user_id, role_id)] = (key, len(data))
+                self._disk_size += len(data)
+            if self._disk_size > self.disk_bytes:
+                self._prune_disk(index)
+
+    def _prune_disk(self, index: Dict[Tuple[str, str], Tuple[str, int]]) -> None:
+        files = []
+        for (user_id, role_id), (key, size) in index.items():
+            try:
+                mtime = self._disk_file(user_id, role_id, key).stat().st_mtime
+            except OSError:
+                mtime = 0.0
+            files.append((mtime, size, (user_id, role_id), key))
+        files.sort()
+        for _, size, role, key in files:
+            if self._disk_size <= self.disk_bytes:
+                break
+            try:
+                self._disk_file(role[0], role[1], key).unlink()
+            except OSError:
+                pass
+            del index[role]
+            self._disk_size -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_bytes": self._disk_size if self._disk_index is not None else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+        }
+
+
+_card_cache: Optional[RenderedCardCache] = None
+
+
+def get_card_cache() -> RenderedCardCache:
+    """获取卡片缓存实例"""
+    global _card_cache
+    if _card_cache is None:
+        config = get_config()
+        _card_cache = RenderedCardCache(
+            memory_bytes=config.RENDER_CACHE_MEMORY_MB * 1024 * 1024,
+            disk_bytes=config.RENDER_CACHE_DISK_MB * 1024 * 1024,
+        )
+    return _card_cache
+
+
+@add_role_cache_listener
+async def _invalidate_on_save(user_id: str, role_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """角色数据变化后旧卡片不再有用"""
+    if _card_cache is not None:
+        await _card_cache.invalidate(user_id, role_id)
@@ -0,0 +1,215 @@
+# coding=utf-8
+"""
+渲染前的图标预取
+在事件循环中并发下载角色卡片需要的全部图标，渲染时不再逐个同步下载
+"""
+import asyncio
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import get_config
+    from ..utils.http_client import get_http_registry
+except ImportError:
+    from plugin_core.config import get_config
+    from utils.http_client import get_http_registry
+
+from .utils import get_icon_cache_file
+
+IconKey = Tuple[str, Any]
+
+
+@dataclass
+class IconRequest:
+    """一个待预取的图标"""
+    kind: str
+    key: Any
+    url: str
+
+    @property
+    def cache_file(self) -> Path:
+        return get_icon_cache_file(self.kind, self.key)
+
+
+class RoleIcons:
+    """预取结果
+
+    保存图标的原始字节，渲染时（可能在另一个进程中）才解码，
+    这样跨进程传递的是压缩后的图片而不是像素数据。
+    """
+
+    def __init__(self, data: Optional[Dict[IconKey, bytes]] = None):
+        self.data: Dict[IconKey, bytes] = data or {}
+        self._decoded: Dict[IconKey, Optional[Image.Image]] = {}
+
+    def __getstate__(self):
+        return {"data": self.data}
+
+    def __setstate__(self, state):
+        self.data = state["data"]
+        self._decoded = {}
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, kind: str, key: Any) -> Optional[Image.Image]:
+        """获取解码后的图标，未预取或解码失败返回None"""
+        icon_key = (kind, key)
+        if icon_key not in self._decoded:
+            raw = self.data.get(icon_key)
+            image = None
+            if raw:
+                try:
+                    image = Image.open(io.BytesIO(raw)).convert('RGBA')
+                except Exception as e:
+                    logger.warning(f"解码预取图标失败 {kind}:{key}: {e}")
+            self._decoded[icon_key] = image
+        return self._decoded[icon_key]
+
+
+def collect_icon_requests(role_detail, account: Optional[Dict] = None) -> List[IconRequest]:
+    """收集渲染角色卡片会用到的全部图标地址"""
+    requests: List[IconRequest] = []
+
+    def add(kind: str, key: Any, url: Optional[str]):
+        if url and key is not None:
+            requests.append(IconRequest(kind, key, url))
+
+    if account:
+        add("avatar", account.get("uid"), account.get("avatarUrl"))
+
+    role = role_detail.role
+    add("role", role.roleId, getattr(role, "rolePicUrl", None))
+
+    weapon_data = role_detail.weaponData
+    if weapon_data and weapon_data.weapon:
+        weapon = weapon_data.weapon
+        add("weapon", weapon.weaponId, getattr(weapon, "weaponIcon", None))
+
+    for skill_data in (role_detail.get_skill_list() or []):
+        skill = skill_data.skill
+        add("skill", skill.id, getattr(skill, "iconUrl", None))
+
+    for i, chain in enumerate((role_detail.chainList or [])[:6]):
+        if chain.unlocked:
+            add("chain", i + 1, getattr(chain, "iconUrl", None))
+
+    if role_detail.phantomData:
+        for phantom in (role_detail.phantomData.equipPhantomList or [])[:5]:
+            if phantom and phantom.phantomProp:
+                prop = phantom.phantomProp
+                add("phantom", prop.phantomId, getattr(prop, "iconUrl", None))
+
+    # 去重（同一个声骸可能装备多个）
+    unique: Dict[IconKey, IconRequest] = {}
+    for request in requests:
+        unique.setdefault((request.kind, request.key), request)
+    return list(unique.values())
+
+
+def _read_file(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _verify_and_write(path: Path, data: bytes) -> bool:
+    """确认是可解码的图片后才写入缓存，避免错误页面等内容污染同步路径共用的缓存文件"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception:
+        return False
+    _write_file(path, data)
+    return True
+
+
+_download_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_download_semaphore() -> asyncio.Semaphore:
+    """所有查询共用的下载并发上限（ICON_PREFETCH_CONCURRENCY）"""
+    global _download_semaphore
+    if _download_semaphore is None:
+        _download_semaphore = asyncio.Semaphore(max(1, get_config().ICON_PREFETCH_CONCURRENCY))
+    return _download_semaphore
+
+
+async def _fetch_icon(request: IconRequest) -> Optional[bytes]:
+    """读取本地缓存，没有则下载并写入缓存"""
+    loop = asyncio.get_running_loop()
+    cache_file = request.cache_file
+    # 文件不存在时读取返回None，不在事件循环中单独检查
+    data = await loop.run_in_executor(None, _read_file, cache_file)
+    if data:
+        return data
+
+    async with _get_download_semaphore():
+        try:
+            client = get_http_registry().get_client(request.url)
+            response = await client.get(request.url)
+        except Exception as e:
+            logger.warning(f"预取图标失败 {request.url}: {e}")
+            return None
+
+    if response.status_code != 200:
+        logger.warning(f"预取图标失败 {request.url}: HTTP {response.status_code}")
+        return None
+
+    data = response.content
+    try:
+        if not await loop.run_in_executor(None, _verify_and_write, cache_file, data):
+            logger.warning(f"预取图标失败 {request.url}: 返回内容不是有效图片")
+            return None
+    except Exception as e:
+        logger.warning(f"写入图标缓存失败 {cache_file}: {e}")
+    return data
+
+
+async def prefetch_role_icons(role_detail, account: Optional[Dict] = None) -> RoleIcons:
+    """并发获取角色卡片需要的全部图标"""
+    requests = collect_icon_requests(role_detail, account)
+    if not requests:
+        return RoleIcons()
+
+    results = await asyncio.gather(
+        *(_fetch_icon(request) for request in requests),
+        return_exceptions=True,
+    )
+
+    data: Dict[IconKey, bytes] = {}
+    for request, result in zip(requests, results):
+        if isinstance(result, Exception):
+            logger.warning(f"预取图标失败 {request.kind}:{request.key}: {result}")
+        elif result:
+            data[(request.kind, request.key)] = result
+    return RoleIcons(data)
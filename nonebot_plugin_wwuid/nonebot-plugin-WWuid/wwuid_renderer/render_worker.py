@@ -0,0 +1,68 @@
+# coding=utf-8
+"""
+渲染进程入口
+进程池的初始化函数与任务函数，只依赖渲染相关模块。
+子进程反序列化任务时导入的是本模块，配合 worker_main.py 不会执行插件包的 __init__
+（注册命令、require 等操作需要已初始化的 NoneBot）。
+"""
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from nonebot import logger
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+try:
+    from ..plugin_core.config import WavesConfig, set_config
+except ImportError:
+    from plugin_core.config import WavesConfig, set_config
+
+from .card_drawer import get_renderer
+from .utils import CHARINFO_PATH, BG_PATH
+
+
+def warm_worker(config_values: Optional[Dict[str, Any]] = None) -> None:
+    """工作进程初始化：应用主进程的配置，提前加载字体、静态素材并合成常用底图
+
+    Args:
+        config_values: 主进程的配置（子进程中读不到 NoneBot 驱动配置），线程池中为None
+    """
+    if config_values is not None:
+        set_config(WavesConfig(**config_values))
+    try:
+        get_renderer().warm_up()
+    except Exception as e:
+        logger.warning(f"[鸣潮] 渲染进程预热失败: {e}")
+    for asset_dir in (CHARINFO_PATH, BG_PATH):
+        if not asset_dir.exists():
+            continue
+        for path in asset_dir.glob("*.*"):
+            try:
+                with open(path, "rb") as f:
+                    f.read()
+            except OSError:
+                continue
+
+
+def render_in_worker(
+    role_detail,
+    account: Optional[Dict],
+    raw_detail: Optional[Dict],
+    icons,
+    submitted_at: float,
+) -> Tuple[bytes, Dict[str, float]]:
+    """在工作进程中渲染，返回 (PNG字节, 各阶段耗时)"""
+    queue_wait = time.time() - submitted_at
+    renderer = get_renderer()
+    image_bytes = renderer.render_role_card(role_detail, account=account, raw_detail=raw_detail, icons=icons)
+    timings = dict(renderer.last_timings)
+    timings["queue"] = max(0.0, queue_wait)
+    return image_bytes, timings
+
+
+def worker_pid() -> int:
+    """返回工作进程的PID（启动进程池时用来确认子进程已就绪）"""
+    return os.getpid()
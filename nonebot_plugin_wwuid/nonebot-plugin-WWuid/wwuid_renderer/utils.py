@@ -4,7 +4,6 @@
 """
 import io
 import asyncio
-import httpx
 import shutil
 import concurrent.futures
 from pathlib import Path
@@ -17,101 +16,43 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+try:
+    from ..utils.http_client import get_http_registry
+except ImportError:
+    from utils.http_client import get_http_registry
+
 # --- 字体定义 ---
+# 字体在第一次使用时才加载，由 FontManager 统一缓存
+from .font_manager import FONT_FACES, get_font_manager, get_font_by_attr
+
 # 字体路径
-FONT_ORIGIN_PATH = Path(__file__).parent / "assets" / "fonts" / "waves_fonts.ttf"
-FONT2_ORIGIN_PATH = Path(__file__).parent / "assets" / "fonts" / "arial-unicode-ms-bold.ttf"
-EMOJI_ORIGIN_PATH = Path(__file__).parent / "assets" / "fonts" / "NotoColorEmoji.ttf"
+FONT_ORIGIN_PATH = FONT_FACES["waves"][0]
+FONT2_ORIGIN_PATH = FONT_FACES["ww"][0]
+EMOJI_ORIGIN_PATH = FONT_FACES["emoji"][0]
 
 
 def waves_font_origin(size: int) -> ImageFont.FreeTypeFont:
     """获取主字体"""
-    if FONT_ORIGIN_PATH.exists():
-        return ImageFont.truetype(str(FONT_ORIGIN_PATH), size=size)
-    else:
-        # 回退到系统字体
-        try:
-            return ImageFont.truetype("msyh.ttc", size=size)
-        except:
-            return ImageFont.load_default()
+    return get_font_manager().get("waves", size)
 
 
 def ww_font_origin(size: int) -> ImageFont.FreeTypeFont:
     """获取备用字体"""
-    if FONT2_ORIGIN_PATH.exists():
-        return ImageFont.truetype(str(FONT2_ORIGIN_PATH), size=size)
-    else:
-        try:
-            return ImageFont.truetype("msyh.ttc", size=size)
-        except:
-            return ImageFont.load_default()
+    return get_font_manager().get("ww", size)
 
 
 def emoji_font_origin(size: int) -> ImageFont.FreeTypeFont:
     """获取emoji字体"""
-    if EMOJI_ORIGIN_PATH.exists():
-        return ImageFont.truetype(str(EMOJI_ORIGIN_PATH), size=size)
-    else:
-        return ImageFont.load_default()
-
-
-# 预定义字体大小
-waves_font_10 = waves_font_origin(10)
-waves_font_12 = waves_font_origin(12)
-waves_font_14 = waves_font_origin(14)
-waves_font_16 = waves_font_origin(16)
-waves_font_15 = waves_font_origin(15)
-waves_font_18 = waves_font_origin(18)
-waves_font_20 = waves_font_origin(20)
-waves_font_22 = waves_font_origin(22)
-waves_font_23 = waves_font_origin(23)
-waves_font_24 = waves_font_origin(24)
-waves_font_25 = waves_font_origin(25)
-waves_font_26 = waves_font_origin(26)
-waves_font_28 = waves_font_origin(28)
-waves_font_30 = waves_font_origin(30)
-waves_font_32 = waves_font_origin(32)
-waves_font_34 = waves_font_origin(34)
-waves_font_36 = waves_font_origin(36)
-waves_font_38 = waves_font_origin(38)
-waves_font_40 = waves_font_origin(40)
-waves_font_42 = waves_font_origin(42)
-waves_font_44 = waves_font_origin(44)
-waves_font_50 = waves_font_origin(50)
-waves_font_58 = waves_font_origin(58)
-waves_font_60 = waves_font_origin(60)
-waves_font_62 = waves_font_origin(62)
-waves_font_70 = waves_font_origin(70)
-waves_font_84 = waves_font_origin(84)
-
-ww_font_12 = ww_font_origin(12)
-ww_font_14 = ww_font_origin(14)
-ww_font_16 = ww_font_origin(16)
-ww_font_15 = ww_font_origin(15)
-ww_font_18 = ww_font_origin(18)
-ww_font_20 = ww_font_origin(20)
-ww_font_22 = ww_font_origin(22)
-ww_font_23 = ww_font_origin(23)
-ww_font_24 = ww_font_origin(24)
-ww_font_25 = ww_font_origin(25)
-ww_font_26 = ww_font_origin(26)
-ww_font_28 = ww_font_origin(28)
-ww_font_30 = ww_font_origin(30)
-ww_font_32 = ww_font_origin(32)
-ww_font_34 = ww_font_origin(34)
-ww_font_36 = ww_font_origin(36)
-ww_font_38 = ww_font_origin(38)
-ww_font_40 = ww_font_origin(40)
-ww_font_42 = ww_font_origin(42)
-ww_font_44 = ww_font_origin(44)
-ww_font_50 = ww_font_origin(50)
-ww_font_58 = ww_font_origin(58)
-ww_font_60 = ww_font_origin(60)
-ww_font_62 = ww_font_origin(62)
-ww_font_70 = ww_font_origin(70)
-ww_font_84 = ww_font_origin(84)
-
-emoji_font = emoji_font_origin(109)
+    return get_font_manager().get("emoji", size)
+
+
+def __getattr__(name: str):
+    """预定义字号（waves_font_24、ww_font_30、emoji_font 等）按需加载"""
+    font = get_font_by_attr(name)
+    if font is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return font
+
 
 # --- 资源路径定义 ---
 CHARINFO_PATH = Path(__file__).parent / "assets" / "images" / "charinfo"
@@ -130,6 +71,22 @@ WEAPON_CACHE_PATH = CACHE_PATH / "weapons"
 for p in [AVATAR_CACHE_PATH, SKILL_CACHE_PATH, PHANTOM_CACHE_PATH, CHAIN_CACHE_PATH, WEAPON_CACHE_PATH]:
     p.mkdir(parents=True, exist_ok=True)
 
+# 图标类型 -> (缓存目录, 文件名模板)
+ICON_CACHE_FILES: Dict[str, Tuple[Path, str]] = {
+    "role": (AVATAR_CACHE_PATH, "role_{}.png"),
+    "avatar": (AVATAR_CACHE_PATH, "avatar_{}.png"),
+    "skill": (SKILL_CACHE_PATH, "skill_{}.png"),
+    "phantom": (PHANTOM_CACHE_PATH, "phantom_{}.png"),
+    "chain": (CHAIN_CACHE_PATH, "chain_{}.png"),
+    "weapon": (WEAPON_CACHE_PATH, "weapon_{}.png"),
+}
+
+
+def get_icon_cache_file(kind: str, key) -> Path:
+    """图标的本地缓存文件"""
+    cache_dir, name = ICON_CACHE_FILES[kind]
+    return cache_dir / name.format(key)
+
 
 async def _download_and_cache(url: str, cache_file: Path) -> Optional[Image.Image]:
     """通用的下载并缓存图片函数"""
@@ -146,17 +103,17 @@ async def _download_and_cache(url: str, cache_file: Path) -> Optional[Image.Imag
     
     # 下载图片
     try:
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                img_data = response.content
-                img = Image.open(io.BytesIO(img_data)).convert('RGBA')
-                # 写入缓存
-                with open(cache_file, 'wb') as f:
-                    f.write(img_data)
-                return img
-            else:
-                logger.warning(f"下载图片失败 {url}: HTTP {response.status_code}")
+        client = get_http_registry().get_client(url)
+        response = await client.get(url)
+        if response.status_code == 200:
+            img_data = response.content
+            img = Image.open(io.BytesIO(img_data)).convert('RGBA')
+            # 写入缓存
+            with open(cache_file, 'wb') as f:
+                f.write(img_data)
+            return img
+        else:
+            logger.warning(f"下载图片失败 {url}: HTTP {response.status_code}")
     except Exception as e:
         logger.error(f"下载并缓存图片出现异常 {url}: {e}")
     
@@ -178,28 +135,31 @@ def _download_and_cache_sync(url: str, cache_file: Path) -> Optional[Image.Image
     
     # 下载图片
     try:
-        with httpx.Client(timeout=30.0, follow_redirects=True) as client:
-            response = client.get(url)
-            if response.status_code == 200:
-                img_data = response.content
-                img = Image.open(io.BytesIO(img_data)).convert('RGBA')
-                # 写入缓存
-                with open(cache_file, 'wb') as f:
-                    f.write(img_data)
-                return img
-            else:
-                logger.warning(f"下载图片失败 {url}: HTTP {response.status_code}")
+        client = get_http_registry().get_sync_client(url)
+        response = client.get(url)
+        if response.status_code == 200:
+            img_data = response.content
+            img = Image.open(io.BytesIO(img_data)).convert('RGBA')
+            # 写入缓存
+            with open(cache_file, 'wb') as f:
+                f.write(img_data)
+            return img
+        else:
+            logger.warning(f"下载图片失败 {url}: HTTP {response.status_code}")
     except Exception as e:
         logger.error(f"下载并缓存图片出现异常 {url}: {e}")
     
     return None
 
 
+# 背景图候选（按顺序使用第一个存在的）
+WAVES_BG_FILES = ['bg3.jpg', 'bg2.jpg', 'bg1.jpg']
+
+
 def get_waves_bg(size: Tuple[int, int] = (1900, 1900)) -> Image.Image:
     """获取鸣潮背景图片"""
     # 尝试加载原项目的背景
-    bg_files = ['bg3.jpg', 'bg2.jpg', 'bg1.jpg']
-    for bg_file in bg_files:
+    for bg_file in WAVES_BG_FILES:
         bg_path = BG_PATH / bg_file
         if bg_path.exists():
             try:
@@ -359,7 +319,7 @@ async def get_role_picture(role_pic_url: Optional[str] = None, role_id: Optional
     """获取角色立绘图片"""
     if not role_pic_url or not role_id:
         return None
-    cache_file = AVATAR_CACHE_PATH / f"role_{role_id}.png"
+    cache_file = get_icon_cache_file("role", role_id)
     return await _download_and_cache(role_pic_url, cache_file)
 
 
@@ -367,21 +327,21 @@ def get_role_picture_sync(role_pic_url: Optional[str] = None, role_id: Optional[
     """同步获取角色立绘图片"""
     if not role_pic_url or not role_id:
         return None
-    cache_file = AVATAR_CACHE_PATH / f"role_{role_id}.png"
+    cache_file = get_icon_cache_file("role", role_id)
     return _download_and_cache_sync(role_pic_url, cache_file)
 
 def get_avatar_sync(avatar_url: Optional[str], uid: Optional[str]) -> Optional[Image.Image]:
     """同步获取账号头像"""
     if not avatar_url or not uid:
         return None
-    cache_file = AVATAR_CACHE_PATH / f"avatar_{uid}.png"
+    cache_file = get_icon_cache_file("avatar", uid)
     return _download_and_cache_sync(avatar_url, cache_file)
 
 async def get_skill_icon_async(skill_id: int, icon_url: str) -> Optional[Image.Image]:
     """异步获取技能图标"""
     if not icon_url:
         return None
-    cache_file = SKILL_CACHE_PATH / f"skill_{skill_id}.png"
+    cache_file = get_icon_cache_file("skill", skill_id)
     return await _download_and_cache(icon_url, cache_file)
 
 
@@ -389,7 +349,7 @@ def get_skill_icon_sync(skill_id: int, icon_url: str) -> Optional[Image.Image]:
     """同步获取技能图标"""
     if not icon_url:
         return None
-    cache_file = SKILL_CACHE_PATH / f"skill_{skill_id}.png"
+    cache_file = get_icon_cache_file("skill", skill_id)
     return _download_and_cache_sync(icon_url, cache_file)
 
 
@@ -397,7 +357,7 @@ async def get_phantom_icon_async(phantom_id: int, icon_url: str) -> Optional[Ima
     """异步获取声骸图标"""
     if not icon_url:
         return None
-    cache_file = PHANTOM_CACHE_PATH / f"phantom_{phantom_id}.png"
+    cache_file = get_icon_cache_file("phantom", phantom_id)
     return await _download_and_cache(icon_url, cache_file)
 
 
@@ -405,7 +365,7 @@ def get_phantom_icon_sync(phantom_id: int, icon_url: str) -> Optional[Image.Imag
     """同步获取声骸图标"""
     if not icon_url:
         return None
-    cache_file = PHANTOM_CACHE_PATH / f"phantom_{phantom_id}.png"
+    cache_file = get_icon_cache_file("phantom", phantom_id)
     return _download_and_cache_sync(icon_url, cache_file)
 
 
@@ -413,7 +373,7 @@ async def get_chain_icon_async(chain_order: int, icon_url: str) -> Optional[Imag
     """异步获取命座图标"""
     if not icon_url:
         return None
-    cache_file = CHAIN_CACHE_PATH / f"chain_{chain_order}.png"
+    cache_file = get_icon_cache_file("chain", chain_order)
     return await _download_and_cache(icon_url, cache_file)
 
 
@@ -421,7 +381,7 @@ def get_chain_icon_sync(chain_order: int, icon_url: str) -> Optional[Image.Image
     """同步获取命座图标"""
     if not icon_url:
         return None
-    cache_file = CHAIN_CACHE_PATH / f"chain_{chain_order}.png"
+    cache_file = get_icon_cache_file("chain", chain_order)
     return _download_and_cache_sync(icon_url, cache_file)
 
 
@@ -429,7 +389,7 @@ async def get_weapon_icon_async(weapon_id: int, icon_url: str) -> Optional[Image
     """异步获取武器图标"""
     if not icon_url:
         return None
-    cache_file = WEAPON_CACHE_PATH / f"weapon_{weapon_id}.png"
+    cache_file = get_icon_cache_file("weapon", weapon_id)
     return await _download_and_cache(icon_url, cache_file)
 
 
@@ -437,5 +397,5 @@ def get_weapon_icon_sync(weapon_id: int, icon_url: str) -> Optional[Image.Image]
     """同步获取武器图标"""
     if not icon_url:
         return None
-    cache_file = WEAPON_CACHE_PATH / f"weapon_{weapon_id}.png"
+    cache_file = get_icon_cache_file("weapon", weapon_id)
     return _download_and_cache_sync(icon_url, cache_file)
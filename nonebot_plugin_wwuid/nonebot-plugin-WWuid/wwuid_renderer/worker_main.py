@@ -0,0 +1,34 @@
+# coding=utf-8
+"""
+渲染子进程的主模块
+spawn / forkserver 启动的子进程会先执行父进程的主模块（机器人的 bot.py，会再初始化一次 NoneBot），
+渲染进程池启动子进程期间把主模块换成本文件（见 executor.py）。
+子进程中本文件为插件包的各级上级包登记只含 __path__ 的空模块，
+之后反序列化任务时导入 render_worker 只会加载渲染相关的子包，不执行插件包的 __init__。
+本文件在子进程中按路径执行，只能使用标准库。
+"""
+import os
+import sys
+import types
+from pathlib import Path
+
+# 主进程通过环境变量告知渲染包的完整包名（如 nonebot_plugin_wwuid.wwuid_renderer）
+RENDER_PACKAGE_ENV = "WWUID_RENDER_PACKAGE"
+
+
+def register_parent_packages(package: str, package_dir: Path) -> None:
+    """为渲染包的各级上级包登记空模块，已导入的包保持不变"""
+    parents = package.split(".")[:-1]
+    directory = package_dir.parent
+    for depth in range(len(parents), 0, -1):
+        name = ".".join(parents[:depth])
+        if name not in sys.modules:
+            module = types.ModuleType(name)
+            module.__path__ = [str(directory)]
+            module.__package__ = name
+            sys.modules[name] = module
+        directory = directory.parent
+
+
+if __name__ == "__mp_main__":
+    register_parent_packages(os.environ.get(RENDER_PACKAGE_ENV, ""), Path(__file__).parent)